@@ -1,38 +1,374 @@
 import math
-from collections import defaultdict
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
 from datetime import datetime
 
+import numpy as np
+
+import IANIframe
+
+
+class ExpertiseMatrix:
+    """机器人能力矩阵：行为机器人、列为技能键的NumPy数组，并维护与行对齐的坐标数组"""
+    DEFAULT_SCORE = 5.0  # 未评分技能的基础分
+
+    def __init__(self, capacity=16, skill_capacity=8, default=DEFAULT_SCORE):
+        self.default = default  # 未写入单元的取值
+        self.robot_ids = []  # 行号 -> robot_id
+        self.rows = {}  # robot_id -> 行号
+        self.skill_keys = []  # 列号 -> 技能键
+        self.columns = {}  # 技能键 -> 列号
+        self.scores = np.full((capacity, skill_capacity), self.default)
+        self.positions = np.zeros((capacity, 2))
+
+    def _reserve(self, n_rows, n_cols):
+        """按需翻倍扩容"""
+        rows, cols = self.scores.shape
+        if n_rows <= rows and n_cols <= cols:
+            return
+        new_rows = rows * 2 if n_rows > rows else rows
+        new_cols = cols * 2 if n_cols > cols else cols
+        scores = np.full((new_rows, new_cols), self.default)
+        scores[:rows, :cols] = self.scores
+        positions = np.zeros((new_rows, 2))
+        positions[:rows] = self.positions
+        self.scores, self.positions = scores, positions
+
+    def add_robot(self, robot_id, skills=None):
+        """登记机器人（已存在则只更新给定技能）"""
+        if robot_id not in self.rows:
+            self._reserve(len(self.robot_ids) + 1, len(self.skill_keys))
+            self.rows[robot_id] = len(self.robot_ids)
+            self.robot_ids.append(robot_id)
+        for key, score in (skills or {}).items():
+            self.set(robot_id, key, score)
+        return self.rows[robot_id]
+
+    def column(self, key):
+        """技能键对应的列号（不存在则新建，填充默认值）"""
+        if key not in self.columns:
+            self._reserve(len(self.robot_ids), len(self.skill_keys) + 1)
+            self.columns[key] = len(self.skill_keys)
+            self.skill_keys.append(key)
+        return self.columns[key]
+
+    def get(self, robot_id, key, default=None):
+        row, col = self.rows.get(robot_id), self.columns.get(key)
+        if row is None or col is None:
+            return self.default if default is None else default
+        return float(self.scores[row, col])
+
+    def set(self, robot_id, key, score):
+        row, col = self.add_robot(robot_id), self.column(key)  # 先定位（可能扩容）再写入
+        self.scores[row, col] = score
+
+    def assign_block(self, robot_ids, keys, block):
+        """整块写入评分：block[i, j]为robot_ids[i]在keys[j]上的评分"""
+        rows = [self.add_robot(robot_id) for robot_id in robot_ids]
+        cols = [self.column(key) for key in keys]
+        if rows and cols:
+            self.scores[np.ix_(rows, cols)] = block
+
+    def row(self, robot_id):
+        """某机器人的全部技能评分（字典形式）"""
+        row = self.rows.get(robot_id)
+        if row is None:
+            return {}
+        return {key: float(self.scores[row, col]) for key, col in self.columns.items()}
+
+
+class ObstacleDensityMap:
+    """障碍物栅格计数的积分图（summed-area table），圆形范围计数O(1)"""
+    MAX_STRIPS = 9  # 圆形核近似所用的水平条带数上限（行数不超过该值时对整数栅格精确）
+    DENSITY_TOLERANCE = 0.06  # 条带近似相对逐点精确计数的密度误差上限（半径5米实测最大0.0509）
+
+    def __init__(self, padding=16):
+        self.padding = padding  # 扩容时额外留出的栅格数
+        self.origin = (0, 0)  # 栅格(0,0)对应的地图坐标
+        self.counts = np.zeros((0, 0), dtype=np.int32)  # counts[y, x]
+        self.sat = np.zeros((1, 1), dtype=np.int32)  # sat[i, j] = counts[:i, :j].sum()
+
+    def _fit(self, cx, cy):
+        """坐标超出当前栅格时扩容并重建积分图"""
+        ox, oy = self.origin
+        h, w = self.counts.shape
+        if ox <= cx < ox + w and oy <= cy < oy + h:
+            return
+        pad = max(self.padding, w // 2, h // 2)  # 按当前尺寸成比例扩容，摊还重建代价
+        x0 = min(ox, cx - pad) if w else cx - pad
+        y0 = min(oy, cy - pad) if h else cy - pad
+        x1 = max(ox + w, cx + pad + 1) if w else cx + pad + 1
+        y1 = max(oy + h, cy + pad + 1) if h else cy + pad + 1
+        counts = np.zeros((y1 - y0, x1 - x0), dtype=np.int32)
+        counts[oy - y0:oy - y0 + h, ox - x0:ox - x0 + w] = self.counts
+        self.origin, self.counts = (x0, y0), counts
+        self.sat = np.zeros((counts.shape[0] + 1, counts.shape[1] + 1), dtype=np.int32)
+        self.sat[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+
+    def add(self, x, y):
+        """在(x, y)所在栅格加入一个障碍物，增量更新积分图"""
+        cx, cy = int(round(x)), int(round(y))
+        self._fit(cx, cy)
+        gx, gy = cx - self.origin[0], cy - self.origin[1]
+        self.counts[gy, gx] += 1
+        self.sat[gy + 1:, gx + 1:] += 1
+
+    def rect_count(self, x0, y0, x1, y1):
+        """闭区间矩形[x0, x1] × [y0, y1]（栅格坐标）内的障碍物数"""
+        h, w = self.counts.shape
+        gx0, gx1 = max(x0 - self.origin[0], 0), min(x1 - self.origin[0], w - 1)
+        gy0, gy1 = max(y0 - self.origin[1], 0), min(y1 - self.origin[1], h - 1)
+        if gx0 > gx1 or gy0 > gy1:
+            return 0
+        sat = self.sat
+        return int(sat[gy1 + 1, gx1 + 1] - sat[gy0, gx1 + 1] - sat[gy1 + 1, gx0] + sat[gy0, gx0])
+
+    def disk_count(self, tx, ty, radius):
+        """以(tx, ty)为圆心、radius为半径的圆内障碍物数（用不超过MAX_STRIPS个矩形条带近似圆形核）"""
+        eps = 1e-9
+        row_min, row_max = math.ceil(ty - radius - eps), math.floor(ty + radius + eps)
+        if row_min > row_max:
+            return 0
+        n_rows = row_max - row_min + 1
+        n_strips = min(n_rows, self.MAX_STRIPS)
+        total = 0
+        for k in range(n_strips):
+            y0 = row_min + k * n_rows // n_strips
+            y1 = row_min + (k + 1) * n_rows // n_strips - 1
+            # 条带半宽取条带中线处的圆弦半长
+            dy = min(abs((y0 + y1) / 2 - ty), radius)
+            half = math.sqrt(max(0.0, radius ** 2 - dy ** 2))
+            total += self.rect_count(math.ceil(tx - half - eps), y0, math.floor(tx + half + eps), y1)
+        return total
+
+
+class PerformanceWindows:
+    """按（机器人, 任务类别）维护最近N次表现的定长窗口，均值写入矩阵供O(1)查询和向量化读取
+    任务类别与能力矩阵技能键一致：任务类型_物资或区域（如supply_cotton_swab）"""
+
+    def __init__(self, window=3):
+        self.window = window
+        self.windows = {}  # (robot_id, task_key) -> deque
+        self.sums = defaultdict(float)  # (robot_id, task_key) -> 窗口内得分和
+        self.means = ExpertiseMatrix(default=np.nan)  # 机器人 × 任务类别 的窗口均值，无记录为NaN
+
+    def record_batch(self, records):
+        """批量写入表现记录[(robot_id, task_key, score), ...]"""
+        for robot_id, task_key, score in records:
+            key = (robot_id, task_key)
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = deque(maxlen=self.window)
+            if len(window) == self.window:
+                self.sums[key] -= window[0]
+            window.append(score)
+            self.sums[key] += score
+            self.means.set(robot_id, task_key, self.sums[key] / len(window))
+
+    def mean(self, robot_id, task_key):
+        """窗口均值，无记录返回None"""
+        value = self.means.get(robot_id, task_key)
+        return None if np.isnan(value) else value
+
+
+class RobotLoadTracker:
+    """按机器人维护执行中/排队/近期完成任务计数，近期完成量随时间指数衰减"""
+
+    def __init__(self, capacity=10, half_life=600.0, clock=None):
+        self.capacity = capacity  # 满负载对应的任务数
+        self.half_life = half_life  # 近期完成计数的半衰期（秒）
+        self.clock = clock or (lambda: datetime.now().timestamp())  # 时间戳来源（仿真时注入虚拟时钟）
+        self.active = defaultdict(int)  # 执行中任务数
+        self.pending = defaultdict(int)  # 已指派、等待执行的任务数
+        self.recent = {}  # robot_id -> (衰减后的完成计数, 更新时刻)
+
+    def _recent_completed(self, robot_id, now):
+        count, updated = self.recent.get(robot_id, (0.0, now))
+        return count * 0.5 ** ((now - updated) / self.half_life)
+
+    def on_queued(self, robot_id):
+        """任务已指派给机器人但尚未开始"""
+        self.pending[robot_id] += 1
+
+    def on_started(self, robot_id):
+        """任务开始执行：由排队数转入执行数"""
+        if self.pending[robot_id] > 0:
+            self.pending[robot_id] -= 1
+        self.active[robot_id] += 1
+
+    def on_failed(self, robot_id):
+        """任务执行异常：执行数减一（不计入近期完成）"""
+        if self.active[robot_id] > 0:
+            self.active[robot_id] -= 1
+
+    def on_completed(self, robot_id, now=None):
+        """任务完成：执行数减一，近期完成计数加一"""
+        now = now if now is not None else self.clock()
+        if self.active[robot_id] > 0:
+            self.active[robot_id] -= 1
+        self.recent[robot_id] = (self._recent_completed(robot_id, now) + 1, now)
+
+    def load_factor(self, robot_id, now=None):
+        """负载系数（0-1），O(1)"""
+        now = now if now is not None else self.clock()
+        load = self.active[robot_id] + self.pending[robot_id] + self._recent_completed(robot_id, now)
+        return min(1.0, load / self.capacity)
+
+
 class AgentVerseScheduler:
     """基于AgentVerse的动态专家招募调度器，整合所有核心模块"""
-    def __init__(self, controller):
-        self.controller = controller  # 关联IANI控制器
-        self.robot_expertise = {  # 机器人能力矩阵
-            'bedside': defaultdict(dict),
-            'logistics': defaultdict(dict),
-            'disinfect': defaultdict(dict)
+    FEEDBACK_BATCH = 32  # 完成反馈累积到该数量时批量写入表现窗口
+    FEEDBACK_INTERVAL = 60.0  # 或距上次写入超过该秒数（运行时时钟）时写入
+    SNAPSHOT_VERSION = 2  # 能力矩阵快照格式版本（2：表现窗口按任务类别存储）
+    DEFAULT_EXPERTISE = {  # 各类机器人的初始能力评分（0-10）
+        'logistics': {
+            'supply_cotton_swab': 6.0,
+            'supply_tourniquet': 5.5,
+            'supply_sample': 7.0,
+            'env_adaptability': 6.5,  # 环境适应力
+            'time_sensitivity': 7.5   # 时间敏感任务匹配度
+        },
+        'disinfect': {
+            'disinfect_operation': 7.0,
+            'disinfect_robot': 6.8,
+            'env_adaptability': 7.2,
+            'coverage_stability': 8.0  # 消毒覆盖率稳定性
         }
-        self.task_performance = defaultdict(list)  # 任务历史表现
+    }
+
+    def __init__(self, controller, snapshot_path=None, snapshot_interval=300.0):
+        self.controller = controller  # 关联IANI控制器
+        self.snapshot_path = snapshot_path  # 能力矩阵快照文件（.npz），为None时不持久化
+        self.snapshot_interval = snapshot_interval  # 周期快照间隔（秒）
+        self._last_snapshot = controller.runtime.monotonic()
+        self._snapshot_writer = None  # 后台快照写入线程
+        self._snapshot_loaded = False  # 快照在首次使用能力矩阵时惰性加载
+        self._warm_start = {}  # 快照中的评分：robot_id -> {技能键: 评分}
+        self.robot_expertise = ExpertiseMatrix()  # 机器人能力矩阵（机器人 × 技能键）
+        self.load_tracker = RobotLoadTracker(clock=lambda: controller.runtime.now().timestamp())  # 机器人负载计数（收件箱/开始/完成/异常回调维护）
+        self.performance_windows = PerformanceWindows()  # （机器人, 任务类别）近期表现窗口
+        self.pending_feedback = []  # 待批量写入表现窗口的完成反馈
+        self._last_feedback_flush = controller.runtime.monotonic()
         self.init_robot_expertise()  # 初始化能力矩阵
 
     def init_robot_expertise(self):
         """初始化机器人能力矩阵（多维评分：0-10）"""
-        # 物流机器人初始化
-        for bot in self.controller.robots['logistics']:
-            self.robot_expertise['logistics'][bot.robot_id] = {
-                'supply_cotton_swab': 6.0,
-                'supply_tourniquet': 5.5,
-                'supply_sample': 7.0,
-                'env_adaptability': 6.5,  # 环境适应力
-                'time_sensitivity': 7.5   # 时间敏感任务匹配度
-            }
-        # 消毒机器人初始化
-        for bot in self.controller.robots['disinfect']:
-            self.robot_expertise['disinfect'][bot.robot_id] = {
-                'disinfect_operation': 7.0,
-                'disinfect_robot': 6.8,
-                'env_adaptability': 7.2,
-                'coverage_stability': 8.0  # 消毒覆盖率稳定性
-            }
+        for robot_type, bots in self.controller.robots.items():
+            for bot in bots:
+                self.register_robot(robot_type, bot)
+
+    def register_robot(self, robot_type, bot):
+        """登记机器人并写入初始能力评分（快照已加载时以快照评分覆盖）"""
+        self.robot_expertise.add_robot(bot.robot_id, self.DEFAULT_EXPERTISE.get(robot_type, {}))
+        if bot.robot_id in self._warm_start:
+            self.robot_expertise.add_robot(bot.robot_id, self._warm_start[bot.robot_id])
+
+    def save_snapshot(self, path=None):
+        """将能力矩阵与近期表现窗口同步写入版本化.npz快照（等待进行中的后台写入完成）"""
+        path = path or self.snapshot_path
+        if not path:
+            return False
+        self.wait_snapshot()
+        self._write_snapshot(path, self._snapshot_arrays())
+        self._last_snapshot = self.controller.runtime.monotonic()
+        return True
+
+    def _snapshot_arrays(self):
+        """复制快照数据（能力矩阵与表现窗口），写盘可移出调用线程"""
+        self._ensure_warm_start()
+        self.flush_feedback()
+        matrix = self.robot_expertise
+        n, m = len(matrix.robot_ids), len(matrix.skill_keys)
+        windows = self.performance_windows
+        keys = list(windows.windows)
+        window_scores = np.full((len(keys), windows.window), np.nan)
+        for i, key in enumerate(keys):
+            values = windows.windows[key]
+            window_scores[i, :len(values)] = values
+        return {
+            'version': np.array(self.SNAPSHOT_VERSION),
+            'robot_ids': np.array(matrix.robot_ids, dtype=str),
+            'skill_keys': np.array(matrix.skill_keys, dtype=str),
+            'scores': matrix.scores[:n, :m].copy(),
+            'window_robot_ids': np.array([k[0] for k in keys], dtype=str),
+            'window_task_keys': np.array([k[1] for k in keys], dtype=str),
+            'window_scores': window_scores
+        }
+
+    @staticmethod
+    def _write_snapshot(path, arrays):
+        """写入快照文件（临时文件 + fsync + 原子替换）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def wait_snapshot(self):
+        """等待后台快照写入完成"""
+        writer = self._snapshot_writer
+        if writer is not None:
+            writer.join()
+
+    def load_snapshot(self, path=None):
+        """加载快照：覆盖能力矩阵评分并恢复近期表现窗口，返回是否成功"""
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != self.SNAPSHOT_VERSION:
+                print(f"能力矩阵快照版本{int(data['version'])}与当前版本{self.SNAPSHOT_VERSION}不一致，忽略快照")
+                return False
+            robot_ids = data['robot_ids'].tolist()
+            skill_keys = data['skill_keys'].tolist()
+            scores = data['scores']
+            window_robot_ids = data['window_robot_ids'].tolist()
+            window_task_keys = data['window_task_keys'].tolist()
+            window_scores = data['window_scores']
+
+        self.robot_expertise.assign_block(robot_ids, skill_keys, scores)
+        self._warm_start.update(
+            (robot_id, dict(zip(skill_keys, scores[i].tolist()))) for i, robot_id in enumerate(robot_ids)
+        )
+        self.performance_windows.record_batch([
+            (robot_id, task_key, float(score))
+            for robot_id, task_key, row in zip(window_robot_ids, window_task_keys, window_scores)
+            for score in row if not np.isnan(score)
+        ])
+        return True
+
+    def _ensure_warm_start(self):
+        """首次使用能力矩阵时惰性加载快照"""
+        if not self._snapshot_loaded:
+            self._snapshot_loaded = True
+            self.load_snapshot()
+
+    def maybe_snapshot(self):
+        """
+        距上次快照超过间隔（运行时时钟）时复制快照数据，由后台线程写盘，fsync不占用任务完成回调；
+        上一次后台写入尚未完成时推迟到下次检查
+        """
+        now = self.controller.runtime.monotonic()
+        if not self.snapshot_path or now - self._last_snapshot < self.snapshot_interval:
+            return
+        if self._snapshot_writer is not None and self._snapshot_writer.is_alive():
+            return
+        self._last_snapshot = now
+        self._snapshot_writer = threading.Thread(
+            target=self._write_snapshot, args=(self.snapshot_path, self._snapshot_arrays()),
+            name='expertise-snapshot', daemon=True
+        )
+        self._snapshot_writer.start()
 
     def extract_task_features(self, task):
         """任务特征提取与量化（整合时间敏感度和环境复杂度）"""
@@ -40,6 +376,7 @@ class AgentVerseScheduler:
         obstacle_density = self.calculate_obstacle_density(task['target_pos'])
         
         return {
+            'type': task['type'],
             'priority': task['priority'],
             'priority_weight': priority_weights[task['priority']],
             'location': task['target_pos'],
@@ -49,91 +386,158 @@ class AgentVerseScheduler:
         }
 
     def calculate_obstacle_density(self, target_pos, radius=2.0):
-        """计算目标位置周围障碍物密度（半径2米内）"""
+        """计算目标位置周围障碍物密度（半径2米内），基于积分图O(1)查询"""
+        tx, ty = target_pos
+        obstacles_in_range = self.controller.obstacle_map.disk_count(tx, ty, radius)
+        # 归一化到0-1（假设每平方米最多1个障碍物）
+        return min(1.0, obstacles_in_range / (math.pi * radius**2))
+
+    def calculate_obstacle_density_exact(self, target_pos, radius=2.0):
+        """逐个障碍物计算距离的精确密度（用于校验积分图近似）"""
         tx, ty = target_pos
         obstacles_in_range = 0
         for (x, y) in self.controller.map_obstacles:
             if math.hypot(x - tx, y - ty) <= radius:
                 obstacles_in_range += 1
-        # 归一化到0-1（假设每平方米最多1个障碍物）
         return min(1.0, obstacles_in_range / (math.pi * radius**2))
 
-    def recruit_experts(self, task):
+    def recruit_experts(self, task, exclude_busy=False):
         """动态招募最佳机器人（整合负载均衡和任务依赖）"""
-        task_features = self.extract_task_features(task)
-        candidates = self._get_candidates(task)  # 获取候选机器人
-        
-        best_match = -1
-        best_robot = None
-        
-        for bot in candidates:
-            # 负载检查：跳过高负载机器人
-            if bot.is_busy and self.calculate_load_factor(bot) > 0.8:
+        return self.recruit_experts_batch([task], exclude_busy)[0]
+
+    def recruit_experts_batch(self, tasks, exclude_busy=False):
+        """批量招募：同一候选组的多个待分配任务一次向量化打分，返回与tasks对齐的机器人列表
+        exclude_busy为True时跳过所有忙碌机器人（并发执行子任务时使用）
+        """
+        self._ensure_warm_start()
+        self.maybe_flush_feedback()  # 积压反馈超过时间阈值时写入（不在每次打分前强制写入）
+        results = [None] * len(tasks)
+        groups = defaultdict(list)  # 候选组 -> 任务下标
+        for i, task in enumerate(tasks):
+            groups[self._candidate_group(task)].append(i)
+
+        for group, indices in groups.items():
+            candidates = self.controller.robots.get(group, []) if group else []
+            if not candidates:
                 continue
-            
-            # 计算多维匹配得分
-            distance = math.hypot(bot.x - task['target_pos'][0], bot.y - task['target_pos'][1])
-            bot_type = self._get_robot_type(bot.robot_id)
-            bot_expertise = self.robot_expertise[bot_type][bot.robot_id]
-            
-            # 专业度得分
-            expertise_score = self._calculate_expertise_score(bot.robot_id, task_features)
-            # 距离得分（归一化）
-            distance_score = max(0, 10 - distance)
-            # 环境适应力得分
-            env_score = bot_expertise.get('env_adaptability', 5) * task_features['obstacle_density']
-            # 时间敏感度得分
-            time_score = bot_expertise.get('time_sensitivity', 5) * task_features['priority_weight']
-            
-            # 综合得分（加权求和）
-            total_score = (
-                0.4 * expertise_score +
-                0.2 * distance_score +
-                0.2 * env_score +
-                0.2 * time_score
-            )
-            
-            if total_score > best_match:
-                best_match = total_score
-                best_robot = bot
-        
-        # 记录招募结果
-        if best_robot:
-            self.task_performance[best_robot.robot_id].append({
-                'task_type': task['type'],
-                'score': best_match,
-                'time': datetime.now()
-            })
-        return best_robot
+            scores = self._score_matrix([tasks[i] for i in indices], candidates, exclude_busy)
+            best = np.argmax(scores, axis=1)
+            for k, i in enumerate(indices):
+                best_match = scores[k, best[k]]
+                if not np.isfinite(best_match):
+                    continue  # 所有候选均高负载
+                best_robot = candidates[best[k]]
+                results[i] = best_robot
+        return results
+
+    def _score_matrix(self, tasks, candidates, exclude_busy=False):
+        """多维匹配得分矩阵（任务 × 候选机器人），高负载（或exclude_busy时所有忙碌）机器人记为-inf"""
+        task_features = [self.extract_task_features(task) for task in tasks]
+        matrix = self.robot_expertise
+
+        # 候选机器人行号与坐标（坐标写回与行对齐的数组）
+        rows = np.array([matrix.add_robot(bot.robot_id) for bot in candidates])
+        matrix.positions[rows] = [(bot.x, bot.y) for bot in candidates]
+        positions = matrix.positions[rows]
+
+        # 先确定所有列号（可能触发扩容），再取评分
+        task_keys = [f"{f['type']}_{f['task_subtype']}" for f in task_features]
+        task_cols = [matrix.column(key) for key in task_keys]
+        env_col = matrix.column('env_adaptability')
+        time_col = matrix.column('time_sensitivity')
+
+        locations = np.array([f['location'] for f in task_features], dtype=float)
+        density = np.array([f['obstacle_density'] for f in task_features])
+        priority_weight = np.array([f['priority_weight'] for f in task_features])
+
+        # 专业度得分：有近期表现则取近期均值，否则取能力矩阵基础分
+        expertise_score = matrix.scores[np.ix_(rows, task_cols)].T
+        recent = self._recent_performance(candidates, task_keys)
+        expertise_score = np.where(np.isnan(recent), expertise_score, recent)
+        # 距离得分（归一化）：取控制器距离缓存给出的绕障路径长度（不可达为inf，得分0）；
+        # 路径长度不小于直线距离，直线已超过10米的组合得分必为0，只对其余组合做10米内的有界查询
+        distance = np.hypot(positions[None, :, 0] - locations[:, None, 0],
+                            positions[None, :, 1] - locations[:, None, 1])
+        route_length = self.controller.route_length
+        for i, j in zip(*np.nonzero(distance < 10)):
+            distance[i, j] = route_length(candidates[j].x, candidates[j].y, *locations[i], limit=10)
+        distance_score = np.maximum(0, 10 - distance)
+        # 环境适应力得分、时间敏感度得分
+        env_score = matrix.scores[rows, env_col][None, :] * density[:, None]
+        time_score = matrix.scores[rows, time_col][None, :] * priority_weight[:, None]
+
+        # 综合得分（加权求和）
+        total_score = (
+            0.4 * expertise_score +
+            0.2 * distance_score +
+            0.2 * env_score +
+            0.2 * time_score
+        )
+
+        # 负载检查：跳过高负载机器人
+        overloaded = np.array([bot.is_busy and (exclude_busy or self.calculate_load_factor(bot) > 0.8)
+                               for bot in candidates])
+        total_score[:, overloaded] = -np.inf
+        return total_score
+
+    def _recent_performance(self, candidates, task_keys):
+        """候选机器人在各任务类别上的近期表现均值（任务 × 候选，无历史为NaN）"""
+        means = self.performance_windows.means
+        rows = np.array([means.add_robot(bot.robot_id) for bot in candidates])
+        cols = [means.column(task_key) for task_key in task_keys]
+        return means.scores[np.ix_(rows, cols)].T
 
     def calculate_load_factor(self, bot):
-        """计算机器人当前负载系数（0-1）"""
-        completed_tasks = len(bot.task_history)
-        pending_tasks = sum(1 for t in self.controller.task_queue 
-                          if t[1].get('target_robot') == bot.robot_id)
-        return min(1.0, (completed_tasks + pending_tasks) / 10)  # 最大承载10个任务
+        """计算机器人当前负载系数（0-1）：执行中 + 排队 + 近期完成（衰减），最大承载10个任务"""
+        return self.load_tracker.load_factor(bot.robot_id)
 
     def update_expertise_after_completion(self, robot_id, task, success=True, delay=0):
         """任务完成后更新能力矩阵（反馈学习）"""
-        robot_type = self._get_robot_type(robot_id)
-        task_type = f"{task['type']}_{task['content'].get('item','')}"
-        current_score = self.robot_expertise[robot_type][robot_id].get(task_type, 5.0)
+        self._ensure_warm_start()
+        # 与打分时的技能键一致：任务类型_子类型（物资名或消毒区域）
+        task_key = f"{task['type']}_{task['content'].get('item', task['content'].get('area'))}"
+        current_score = self.robot_expertise.get(robot_id, task_key)
         
         # 基于执行结果调整得分
         score_delta = 0.3 if success else -0.5
         score_delta -= min(0.2, delay / 60)  # 延迟惩罚
         new_score = max(0, min(10, current_score + score_delta))
         
-        self.robot_expertise[robot_type][robot_id][task_type] = new_score
+        self.robot_expertise.set(robot_id, task_key, new_score)
+        
+        # 完成后的能力评分作为（机器人, 任务类别）的近期表现，按批写入窗口
+        self.pending_feedback.append((robot_id, task_key, new_score))
+        self.maybe_flush_feedback()
+        self.maybe_snapshot()
+
+    def maybe_flush_feedback(self):
+        """积压反馈达到FEEDBACK_BATCH条或距上次写入超过FEEDBACK_INTERVAL秒时批量写入"""
+        if not self.pending_feedback:
+            return
+        if (len(self.pending_feedback) >= self.FEEDBACK_BATCH
+                or self.controller.runtime.monotonic() - self._last_feedback_flush >= self.FEEDBACK_INTERVAL):
+            self.flush_feedback()
+
+    def flush_feedback(self):
+        """将积压的完成反馈批量写入表现窗口"""
+        self._last_feedback_flush = self.controller.runtime.monotonic()
+        if self.pending_feedback:
+            self.performance_windows.record_batch(self.pending_feedback)
+            self.pending_feedback = []
 
     # 内部辅助方法
-    def _get_candidates(self, task):
-        """根据任务类型筛选候选机器人"""
+    def _candidate_group(self, task):
+        """任务对应的候选机器人组"""
         if task['type'] == 'supply':
-            return self.controller.robots['logistics']
+            return 'logistics'
         elif task['type'] == 'disinfect':
-            return self.controller.robots['disinfect']
-        return []
+            return 'disinfect'
+        return None
+
+    def _get_candidates(self, task):
+        """根据任务类型筛选候选机器人"""
+        group = self._candidate_group(task)
+        return self.controller.robots[group] if group else []
 
     def _get_robot_type(self, robot_id):
         """根据ID判断机器人类型（A=床头, B=物流, C=消毒）"""
@@ -142,41 +546,219 @@ class AgentVerseScheduler:
 
     def _calculate_expertise_score(self, robot_id, task_features):
         """计算专业度匹配得分"""
-        robot_type = self._get_robot_type(robot_id)
         task_key = f"{task_features['type']}_{task_features['task_subtype']}"
-        expertise = self.robot_expertise[robot_type].get(robot_id, {})
         
-        # 历史表现加权
-        recent_tasks = [t for t in self.task_performance[robot_id] 
-                       if t['task_type'] == task_features['type']][-3:]
-        if recent_tasks:
-            return sum(t['score'] for t in recent_tasks) / len(recent_tasks)
-        return expertise.get(task_key, 5.0)  # 无历史则返回基础分
+        # 历史表现加权（近期窗口均值，O(1)）
+        self._ensure_warm_start()
+        recent = self.performance_windows.mean(robot_id, task_key)
+        if recent is not None:
+            return recent
+        return self.robot_expertise.get(robot_id, task_key)  # 无历史则返回基础分
+
+
+class SubtaskExecutor:
+    """依赖感知的子任务执行器：无依赖子任务跨机器人并发执行，依赖子任务在前驱完成事件后才启动
+    子任务以subtype标识；depend_on为前驱subtype或其列表；same_robot_as表示沿用该前驱的执行机器人（隐含依赖）
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.lock = controller.lock  # 与控制器共用：串行化招募、调度器状态与机器人忙碌状态
+
+    @staticmethod
+    def _dependencies(subtask):
+        """子任务的前驱阶段列表"""
+        deps = subtask.get('depend_on') or []
+        deps = [deps] if isinstance(deps, str) else list(deps)
+        carrier = subtask.get('same_robot_as')
+        if carrier and carrier not in deps:
+            deps.append(carrier)
+        return deps
+
+    def _plan(self, subtasks):
+        """校验依赖图，返回（阶段 -> 子任务，阶段 -> 未完成前驱数，阶段 -> 后继列表）"""
+        stages = {subtask['subtype']: subtask for subtask in subtasks}
+        if len(stages) != len(subtasks):
+            raise ValueError("子任务subtype重复")
+        pending = {}
+        dependents = defaultdict(list)
+        for name, subtask in stages.items():
+            deps = self._dependencies(subtask)
+            for dep in deps:
+                if dep not in stages:
+                    raise ValueError(f"子任务{name}依赖未知阶段{dep}")
+                dependents[dep].append(name)
+            pending[name] = len(deps)
+
+        # 拓扑排序检查环
+        indegree = dict(pending)
+        ready = [name for name, count in indegree.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if visited != len(stages):
+            raise ValueError("子任务依赖存在环")
+        return stages, pending, dependents
+
+    def submit(self, subtasks):
+        """提交一组子任务并立即返回整体完成的Future（结果为 阶段 -> 执行机器人ID）"""
+        stages, pending, dependents = self._plan(subtasks)
+        job = Future()
+        job_lock = threading.Lock()
+        robots_by_stage = {}
+        state = {'left': len(stages), 'failed': False}
+
+        def start(name):
+            # 招募后投递到机器人收件箱，完成事件由机器人运行时回调
+            try:
+                future = self._start(stages[name], robots_by_stage)
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f: finished(name, f))
+
+        def finished(name, future):
+            # 完成事件：释放入度归零的后继；任一阶段失败则整体失败且不再启动后继
+            error = future.exception()
+            ready = []
+            with job_lock:
+                if state['failed']:
+                    return
+                if error is not None:
+                    state['failed'] = True
+                else:
+                    state['left'] -= 1
+                    for child in dependents[name]:
+                        pending[child] -= 1
+                        if pending[child] == 0:
+                            ready.append(child)
+                done = state['left'] == 0
+            if error is not None:
+                job.set_exception(error)
+                return
+            for child in ready:
+                start(child)
+            if done:
+                job.set_result({stage: bot.robot_id for stage, bot in robots_by_stage.items()})
+
+        roots = [name for name, count in pending.items() if count == 0]
+        if not roots:
+            job.set_result({})
+        for name in roots:
+            start(name)
+        return job
+
+    def _start(self, subtask, robots_by_stage):
+        """招募（或沿用）机器人并投递子任务，返回其完成Future"""
+        robot = self.assign(subtask, robots_by_stage, exclude_busy=True)
+        if robot is None:
+            raise RuntimeError(f"子任务{subtask['subtype']}无可用机器人")
+        return robot.receive_task(subtask)
+
+    def assign(self, task, robots_by_stage=None, exclude_busy=False):
+        """招募机器人（负载由收件箱/开始/完成回调登记）；exclude_busy时优先空闲机器人，全部忙碌则退回常规招募"""
+        scheduler = self.controller.agent_verse
+        with self.lock:
+            carrier = task.get('same_robot_as')
+            if carrier and robots_by_stage is not None and carrier in robots_by_stage:
+                robot = robots_by_stage[carrier]
+            else:
+                robot = scheduler.recruit_experts(task, exclude_busy)
+                if robot is None and exclude_busy:
+                    robot = scheduler.recruit_experts(task)
+            if robot is None:
+                return None
+            task['target_robot'] = robot.robot_id
+            if robots_by_stage is not None and 'subtype' in task:
+                robots_by_stage[task['subtype']] = robot
+            if exclude_busy:
+                robot.is_busy = True  # 立即占用，避免并发招募选中同一机器人
+        return robot
 
 
 # 与IANI框架集成（包含任务拆分功能）
-class IANI_Controller:
-    def __init__(self):
-        self.robots = {'bedside': [], 'logistics': [], 'disinfect': []}
-        self.task_queue = []
-        self.map_obstacles = set()
-        self.agent_verse = AgentVerseScheduler(self)  # 集成调度器
+class IANI_Controller(IANIframe.IANI_Controller):
+    def __init__(self, expertise_snapshot=None, runtime=None):
+        super().__init__(runtime=runtime)
+        self.obstacle_map = ObstacleDensityMap()  # 障碍物积分图
+        self.agent_verse = AgentVerseScheduler(self, snapshot_path=expertise_snapshot)  # 集成调度器（可从能力矩阵快照热启动）
+        self.executor = SubtaskExecutor(self)  # 依赖感知的子任务执行器
+        self.concurrent_subtasks = True  # False时按拆分顺序逐个执行（事件循环线程外调用时阻塞等待，用于对比）
+
+    def stop(self):
+        """停止控制器：关闭机器人运行时后写入最终能力矩阵快照"""
+        super().stop()
+        with self.lock:
+            self.agent_verse.save_snapshot()
 
     def dispatch_task(self, task):
-        """任务调度主入口（支持复杂任务拆分）"""
+        """任务调度主入口（支持复杂任务拆分）
+        复杂任务交由执行器按依赖执行，返回整体完成的Future；
+        简单任务走基类路径（合并窗口、优先队列与老化），由_assign_task招募专家
+        """
+        if not self._is_complex_task(task):
+            return super().dispatch_task(task)
         # 复杂任务拆分（如样本运输=取样本+送检验）
-        if self._is_complex_task(task):
-            subtasks = self.split_complex_task(task)
-            for subtask in subtasks:
-                target_robot = self.agent_verse.recruit_experts(subtask)
-                if target_robot:
-                    subtask['target_robot'] = target_robot.robot_id
-                    target_robot.receive_task(subtask)
+        subtasks = self.split_complex_task(task)
+        if self.concurrent_subtasks:
+            return self.executor.submit(subtasks)
+        # 逐个执行：每个子任务依赖前一个；在事件循环线程内（如机器人协程中派发）不能阻塞，只返回Future
+        job = self.executor.submit(self._chain(subtasks))
+        if not self.runtime.in_loop_thread():
+            job.result()
+        return job
+
+    @staticmethod
+    def _chain(subtasks):
+        """将子任务串成顺序依赖链"""
+        chained = []
+        for previous, subtask in zip([None] + subtasks[:-1], subtasks):
+            subtask = dict(subtask)
+            deps = SubtaskExecutor._dependencies(subtask)
+            if previous is not None and previous['subtype'] not in deps:
+                deps.append(previous['subtype'])
+            subtask['depend_on'] = deps
+            chained.append(subtask)
+        return chained
+
+    def _assign_task(self, task):
+        """分配队列任务：物资任务在空闲物流机器人中招募专家，消毒任务沿用责任区索引选择
+        无空闲机器人时返回False，任务留在队列中等待"""
+        if task['type'] == 'disinfect':
+            robot = self._select_disinfect_robot(*task['target_pos'])
         else:
-            target_robot = self.agent_verse.recruit_experts(task)
-            if target_robot:
-                task['target_robot'] = target_robot.robot_id
-                target_robot.receive_task(task)
+            robot = self.agent_verse.recruit_experts(task, exclude_busy=True)
+        if robot is None:
+            return False
+        task['target_robot'] = robot.robot_id
+        robot.receive_task(task)
+        return True
+
+    def on_task_queued(self, robot, task):
+        """任务进入收件箱：计入排队数"""
+        self.agent_verse.load_tracker.on_queued(robot.robot_id)
+
+    def on_task_started(self, robot, task):
+        """任务开始执行：由排队数转入执行数"""
+        self.agent_verse.load_tracker.on_started(robot.robot_id)
+
+    def on_task_failed(self, robot, task, error):
+        """任务执行异常：释放执行数并分配等待任务"""
+        self.agent_verse.load_tracker.on_failed(robot.robot_id)
+        super().on_task_failed(robot, task, error)
+
+    def on_task_completed(self, robot, task):
+        """任务完成回调：更新负载计数，对招募派发的任务做反馈学习，再分配等待任务"""
+        with self.lock:
+            self.agent_verse.load_tracker.on_completed(robot.robot_id)
+            if task.get('target_robot') == robot.robot_id:
+                self.agent_verse.update_expertise_after_completion(robot.robot_id, task)
+            super().on_task_completed(robot, task)
 
     def _is_complex_task(self, task):
         """判断是否为复杂任务"""
@@ -202,6 +784,7 @@ class IANI_Controller:
                 'target_pos': task['content']['destination'],
                 'content': {'item': 'sample', 'quantity': task['content']['quantity']},
                 'depend_on': 'pick_sample',
+                'same_robot_as': 'pick_sample',  # 样本随车，由取样机器人送达
                 'sender': task['sender']
             }
         ]
@@ -209,8 +792,122 @@ class IANI_Controller:
     # 其他原有方法（注册机器人、添加障碍物等）
     def register_robot(self, robot_type, robot):
         if robot_type in self.robots:
-            self.robots[robot_type].append(robot)
-            robot.controller = self
+            super().register_robot(robot_type, robot)
+            self.agent_verse.register_robot(robot_type, robot)
 
     def add_obstacle(self, x, y):
-        self.map_obstacles.add((x, y))
\ No newline at end of file
+        if (x, y) not in self.map_obstacles:
+            super().add_obstacle(x, y)
+            self.obstacle_map.add(x, y)
+
+
+def benchmark_recruitment(n_robots=1000, n_tasks=500, n_obstacles=200, seed=0):
+    """招募吞吐量微基准：逐任务招募与批量向量化招募（n_robots台机器人）"""
+    from IANIframe import LogisticsRobot, DisinfectRobot
+
+    rng = np.random.default_rng(seed)
+    controller = IANI_Controller()
+    for i in range(n_robots):
+        x, y = (float(v) for v in rng.uniform(0, 100, 2))
+        if i % 2 == 0:
+            controller.register_robot('logistics', LogisticsRobot(f"B{i}", x, y))
+        else:
+            controller.register_robot('disinfect', DisinfectRobot(f"C{i}", x, y, (x - 5, x + 5)))
+    for x, y in rng.integers(0, 100, (n_obstacles, 2)):
+        controller.add_obstacle(int(x), int(y))
+
+    items = ['cotton_swab', 'tourniquet', 'sample']
+    tasks = []
+    for i in range(n_tasks):
+        target_pos = tuple(float(v) for v in rng.uniform(0, 100, 2))
+        if i % 2 == 0:
+            tasks.append({'type': 'supply', 'priority': 'P1', 'target_pos': target_pos,
+                          'content': {'item': items[i % 3], 'quantity': 5}})
+        else:
+            tasks.append({'type': 'disinfect', 'priority': 'P2', 'target_pos': target_pos,
+                          'content': {'area': 'operation', 'radius': 1.5}})
+
+    scheduler = controller.agent_verse
+    start = time.perf_counter()
+    for task in tasks:
+        scheduler.recruit_experts(task)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scheduler.recruit_experts_batch(tasks)
+    batched = time.perf_counter() - start
+
+    print(f"招募基准：{n_robots}台机器人，{n_tasks}个任务")
+    print(f"逐任务招募：{n_tasks / single:.0f} 任务/秒")
+    print(f"批量招募：{n_tasks / batched:.0f} 任务/秒")
+    controller.stop()
+    return {'single_tasks_per_sec': n_tasks / single, 'batched_tasks_per_sec': n_tasks / batched}
+
+
+def benchmark_obstacle_density(n_obstacles=2000, n_queries=2000, radii=(2.0, 5.0), seed=0,
+                               tolerance=ObstacleDensityMap.DENSITY_TOLERANCE):
+    """积分图障碍物密度与逐点精确计算的误差及耗时对比，误差超过tolerance时抛出AssertionError"""
+    rng = np.random.default_rng(seed)
+    controller = IANI_Controller()
+    for x, y in rng.integers(0, 100, (n_obstacles, 2)):
+        controller.add_obstacle(int(x), int(y))
+    scheduler = controller.agent_verse
+    queries = [tuple(float(v) for v in p) for p in rng.uniform(0, 100, (n_queries, 2))]
+
+    results = {}
+    for radius in radii:
+        start = time.perf_counter()
+        approx = [scheduler.calculate_obstacle_density(p, radius) for p in queries]
+        sat_time = time.perf_counter() - start
+        start = time.perf_counter()
+        exact = [scheduler.calculate_obstacle_density_exact(p, radius) for p in queries]
+        exact_time = time.perf_counter() - start
+        errors = np.abs(np.array(approx) - np.array(exact))
+        results[radius] = {'max_error': float(errors.max()), 'exact_ratio': float(np.mean(errors < 1e-12)),
+                           'speedup': exact_time / sat_time}
+        print(f"半径{radius}：最大误差{errors.max():.4f}（容差{tolerance}），精确一致比例{np.mean(errors < 1e-12):.1%}，"
+              f"加速{exact_time / sat_time:.1f}倍")
+        if errors.max() > tolerance:
+            raise AssertionError(f"半径{radius}时积分图密度最大误差{errors.max():.4f}超过容差{tolerance}")
+    controller.stop()
+    return results
+
+
+def benchmark_sample_transport(n_requests=3):
+    """样本传送链端到端延迟：拆分子任务逐个同步执行与依赖感知并发执行对比（移动耗时按1/100加速模拟）"""
+    results = {}
+    for concurrent in (False, True):
+        controller = IANI_Controller()
+        controller.concurrent_subtasks = concurrent
+        for x, y in [(10, 9), (15, 9), (12, 7), (18, 7)]:
+            controller.add_obstacle(x, y)
+        for i in range(n_requests):
+            controller.register_robot('logistics', IANIframe.LogisticsRobot(f"B{i + 1}", 5 + 5 * i, 10))
+        senders = [IANIframe.BedsideRobot(f"A{i + 1}", 10 + 5 * i, 5) for i in range(n_requests)]
+        for bot in senders:
+            controller.register_robot('bedside', bot)
+
+        start = time.perf_counter()
+        jobs = [controller.dispatch_task({
+            'type': 'supply',
+            'sender': bot,
+            'target_pos': (bot.x, bot.y),
+            'priority': 'P1',
+            'content': {'item': 'sample', 'quantity': 3, 'destination': (25, 10)}
+        }) for bot in senders]
+        for job in jobs:
+            if job is not None:
+                job.result()
+        results['concurrent' if concurrent else 'sequential'] = time.perf_counter() - start
+        controller.stop()
+
+    print(f"样本传送基准：{n_requests}条取样-送检链")
+    print(f"逐个同步执行：{results['sequential']:.2f}秒")
+    print(f"依赖感知并发执行：{results['concurrent']:.2f}秒")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_recruitment()
+    benchmark_obstacle_density()
+    benchmark_sample_transport()
\ No newline at end of file
@@ -1,62 +1,841 @@
 import time
 import math
-from datetime import datetime, timedelta
+import heapq
+import asyncio
+import itertools
+import threading
+import concurrent.futures
+from collections import deque
+from datetime import datetime
+
+from SimKernel import EventSimulator
+
+# ------------------------------
+# 任务优先队列
+# ------------------------------
+class TaskQueue:
+    """
+    基于二叉堆的任务优先队列：入队/出队O(log n)，按任务删除（惰性标记），同优先级先进先出
+    按车道（任务类型，对应一类执行机器人）分堆：某类机器人全部忙碌时，分配循环整条车道跳过，不逐个出入堆
+    老化：P1/P2每等待aging_interval秒有效优先级提升一级。所有任务老化速率相同，
+    有效优先级的先后等价于按 (优先级 + 入队时间/aging_interval) 排序，堆键入队后无需更新；
+    P0不参与老化且始终排在P1/P2之前（等待再久的P2也不会越过新到的紧急任务）
+    """
+    PRIORITY_MAP = {'P0': 0, 'P1': 1, 'P2': 2}  # 数字越小优先级越高
+
+    def __init__(self, aging_interval=60.0, clock=time.monotonic):
+        self.aging_interval = aging_interval  # None表示不老化
+        self.clock = clock
+        self.heaps = {}  # 车道 -> 堆，元素[(档位, 排序键), 序号, 任务, 入队时间]，任务为None表示已删除
+        self.entries = {}  # id(任务) -> 堆条目
+        self.arrivals = deque()  # 按入队顺序的条目（惰性跳过已出队/删除的），队首即等待最久的任务
+        self.counter = itertools.count()  # 入队序号（同键先进先出）
+        self.length_by_priority = dict.fromkeys(self.PRIORITY_MAP, 0)
+        self.wait_stats = {p: [0, 0.0, 0.0] for p in self.PRIORITY_MAP}  # 优先级 -> [出队数, 总等待, 最大等待]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, task):
+        return id(task) in self.entries
+
+    @staticmethod
+    def lane(task):
+        """任务所属车道"""
+        return task['type']
+
+    def _key(self, priority, enqueued_at):
+        level = self.PRIORITY_MAP[priority]
+        if level == 0:
+            return (0, 0.0)  # P0独占第一档，档内按入队序号先进先出
+        if self.aging_interval is None:
+            return (1, level)
+        return (1, level + enqueued_at / self.aging_interval)
+
+    def push(self, task):
+        """任务入队"""
+        if id(task) in self.entries:
+            return
+        now = self.clock()
+        entry = [self._key(task['priority'], now), next(self.counter), task, now]
+        self.entries[id(task)] = entry
+        self.arrivals.append(entry)
+        if len(self.arrivals) > 2 * len(self.entries) + 64:
+            # 已出队条目过多时按入队序号重建
+            self.arrivals = deque(sorted(self.entries.values(), key=lambda e: e[1]))
+        self.length_by_priority[task['priority']] += 1
+        heapq.heappush(self.heaps.setdefault(self.lane(task), []), entry)
+
+    def _live(self, entry):
+        task = entry[2]
+        return task is not None and self.entries.get(id(task)) is entry
+
+    def _head(self, heap):
+        """丢弃堆顶已删除条目，返回堆顶有效条目"""
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _pop_entry(self, heap):
+        """弹出车道中有效优先级最高的条目（跳过已删除条目）"""
+        entry = self._head(heap)
+        if entry is None:
+            return None
+        heapq.heappop(heap)
+        task = entry[2]
+        del self.entries[id(task)]
+        self.length_by_priority[task['priority']] -= 1
+        return entry
+
+    def _restore(self, entry):
+        """放回未能分配的条目，保留原排序键、序号与入队时间（仍在arrivals中）"""
+        task = entry[2]
+        self.entries[id(task)] = entry
+        self.length_by_priority[task['priority']] += 1
+        heapq.heappush(self.heaps[self.lane(task)], entry)
+
+    def _record_wait(self, entry):
+        stats = self.wait_stats[entry[2]['priority']]
+        wait = self.clock() - entry[3]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+
+    def _front(self):
+        """各车道堆顶中有效优先级最高的堆"""
+        heads = [(head, heap) for heap in self.heaps.values() for head in [self._head(heap)] if head is not None]
+        return min(heads, key=lambda h: h[0][:2])[1] if heads else None
+
+    def pop(self):
+        """弹出有效优先级最高的任务，队列为空返回None"""
+        heap = self._front()
+        if heap is None:
+            return None
+        entry = self._pop_entry(heap)
+        self._record_wait(entry)
+        return entry[2]
+
+    def peek(self):
+        """查看队首任务（不出队）"""
+        heap = self._front()
+        return heap[0][2] if heap else None
+
+    def remove(self, task):
+        """删除指定任务（惰性标记，O(1)），返回是否在队列中"""
+        entry = self.entries.pop(id(task), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self.length_by_priority[task['priority']] -= 1
+        return True
+
+    def drain(self, assign, ready=None):
+        """
+        按车道依次按优先级尝试分配：assign(task)返回True则出队，否则保留原位置，返回分配数量
+        ready(车道)返回False（该类机器人全部忙碌）时跳过或停止该车道，不再逐个出堆
+        """
+        assigned = 0
+        for lane, heap in self.heaps.items():
+            deferred = []
+            while ready is None or ready(lane):
+                entry = self._pop_entry(heap)
+                if entry is None:
+                    break
+                if assign(entry[2]):
+                    self._record_wait(entry)
+                    assigned += 1
+                else:
+                    deferred.append(entry)
+            for entry in deferred:
+                self._restore(entry)
+        return assigned
+
+    def metrics(self):
+        """队列长度与各优先级等待时间统计（秒）"""
+        now = self.clock()
+        while self.arrivals and not self._live(self.arrivals[0]):
+            self.arrivals.popleft()
+        return {
+            'length': len(self.entries),
+            'length_by_priority': dict(self.length_by_priority),
+            'oldest_wait': now - self.arrivals[0][3] if self.arrivals else 0.0,
+            'wait': {
+                p: {'count': count, 'mean': total / count if count else 0.0, 'max': longest}
+                for p, (count, total, longest) in self.wait_stats.items()
+            }
+        }
+
+# ------------------------------
+# 异步机器人运行时
+# ------------------------------
+class RobotRuntime:
+    """
+    asyncio机器人运行时：事件循环在后台线程运行，每个机器人一个收件箱和一个执行协程
+    投递任务立即返回，各机器人并行执行；操作耗时以await等待（按time_scale加速），不阻塞其他机器人
+    """
+    def __init__(self, time_scale=0.01):
+        self.time_scale = time_scale  # 模拟耗时(秒) -> 实际等待(秒)，默认加速100倍
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='robot-runtime', daemon=True)
+        self.robots = {}  # robot_id -> 机器人
+        self.workers = {}  # robot_id -> 执行协程的Future
+        self.pending_timers = 0  # 未触发的定时回调数（计入wait_idle）
+        self.backlogs = []  # [(调度队列, 补派回调)]，wait_idle时计入未分配任务
+
+    def attach(self, robot):
+        """为机器人创建收件箱并启动其执行协程"""
+        if robot.robot_id in self.robots:
+            return
+        if not self.thread.is_alive():
+            self.thread.start()
+        robot.inbox = asyncio.Queue()
+        self.robots[robot.robot_id] = robot
+        self.workers[robot.robot_id] = asyncio.run_coroutine_threadsafe(self._worker(robot), self.loop)
+
+    def submit(self, robot, task):
+        """投递任务到机器人收件箱（线程安全，立即返回），返回任务完成的Future"""
+        done = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(robot.inbox.put_nowait, (task, done))
+        return done
+
+    async def _worker(self, robot):
+        """机器人执行协程：依次执行收件箱中的任务"""
+        while True:
+            task, done = await robot.inbox.get()
+            try:
+                robot.start_task(task)
+                await robot.execute_task(task)
+            except Exception as e:
+                robot.abort_task(task, e)
+                done.set_exception(e)
+            else:
+                done.set_result(task)
+            finally:
+                robot.inbox.task_done()
+
+    async def sleep(self, seconds):
+        """等待模拟耗时"""
+        await asyncio.sleep(seconds * self.time_scale)
+
+    def call_later(self, delay, callback, *args):
+        """模拟耗时delay秒后在事件循环线程执行回调（线程安全）"""
+        def fire():
+            try:
+                callback(*args)
+            finally:
+                self.pending_timers -= 1
+
+        def arm():
+            self.pending_timers += 1
+            self.loop.call_later(delay * self.time_scale, fire)
+
+        if not self.thread.is_alive():
+            self.thread.start()
+        self.loop.call_soon_threadsafe(arm)
+
+    def now(self):
+        """当前时间（系统时间）"""
+        return datetime.now()
+
+    def in_loop_thread(self):
+        """当前是否在事件循环线程中（此时不能阻塞等待任务Future）"""
+        return threading.current_thread() is self.thread
+
+    def monotonic(self):
+        """单调时钟（秒），用于等待时间统计"""
+        return time.monotonic()
+
+    def watch_queue(self, queue, dispatch):
+        """登记调度队列：wait_idle在队列清空（或剩余任务无机器人可执行）前不返回"""
+        self.backlogs.append((queue, dispatch))
+
+    def _busy(self):
+        return self.pending_timers or any(bot.queued for bot in self.robots.values())
+
+    async def _join(self):
+        # 执行中可能派发新任务，直到所有机器人都没有未完成任务、没有待触发的定时回调且调度队列已清空
+        while True:
+            while self._busy():
+                await asyncio.gather(*(bot.inbox.join() for bot in self.robots.values()))
+                await asyncio.sleep(0.001)  # 让跨线程投递的任务入队
+            if not any(len(queue) for queue, _ in self.backlogs):
+                return
+            for _, dispatch in self.backlogs:
+                dispatch()  # 机器人均已空闲，补派队列中的等待任务
+            if not self._busy():
+                return  # 剩余任务暂无可执行的机器人
+
+    def wait_idle(self, timeout=None):
+        """阻塞等待所有机器人空闲且调度队列清空（需在事件循环线程外调用）"""
+        asyncio.run_coroutine_threadsafe(self._join(), self.loop).result(timeout)
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """取消所有执行协程并关闭事件循环（需在事件循环线程外调用）"""
+        if not self.thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+# ------------------------------
+# 离散事件仿真运行时
+# ------------------------------
+class _SimDelay:
+    """仿真等待：协程让出等待秒数，由SimulatedRuntime登记唤醒事件"""
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __await__(self):
+        yield self.seconds
+
+
+class SimulatedRuntime(EventSimulator):
+    """
+    离散事件仿真运行时：接口与RobotRuntime一致，但不启动线程、不真实等待
+    事件内核（虚拟时钟 + 事件堆，schedule/cancel/step/run）复用EventSimulator：机器人协程的每次等待
+    （移动、操作、消毒）登记为虚拟时刻上的唤醒事件，同一时刻的事件按登记顺序执行，结果可复现
+    """
+    def __init__(self, start=None):
+        super().__init__(start)
+        self.robots = {}  # robot_id -> 机器人
+        self.running = set()  # 正在执行任务的机器人ID
+        self.pending_timers = 0  # 未触发的定时回调数（计入wait_idle）
+        self.backlogs = []  # [(调度队列, 补派回调)]，wait_idle时计入未分配任务
+
+    def monotonic(self):
+        return self.time
+
+    def in_loop_thread(self):
+        """仿真单线程推进事件，任务Future只能随事件完成，始终不能阻塞等待"""
+        return True
+
+    def call_later(self, delay, callback, *args):
+        """delay秒后执行回调（与RobotRuntime.call_later一致，计入wait_idle）"""
+        def fire():
+            self.pending_timers -= 1
+            callback(*args)
+
+        self.pending_timers += 1
+        return self.schedule(delay, fire)
+
+    def attach(self, robot):
+        """为机器人创建收件箱"""
+        if robot.robot_id in self.robots:
+            return
+        robot.inbox = deque()
+        self.robots[robot.robot_id] = robot
+
+    def submit(self, robot, task):
+        """投递任务到机器人收件箱，空闲机器人在当前时刻开始执行，返回任务完成的Future"""
+        done = concurrent.futures.Future()
+        robot.inbox.append((task, done))
+        if robot.robot_id not in self.running:
+            self.running.add(robot.robot_id)
+            self.schedule(0, self._next, robot)
+        return done
+
+    def sleep(self, seconds):
+        return _SimDelay(seconds)
+
+    def _next(self, robot):
+        """开始执行收件箱中的下一个任务"""
+        if not robot.inbox:
+            self.running.discard(robot.robot_id)
+            return
+        task, done = robot.inbox.popleft()
+        robot.start_task(task)
+        self._resume(robot, robot.execute_task(task), task, done)
+
+    def _resume(self, robot, coro, task, done):
+        """推进机器人协程到下一次等待，或在其结束后执行下一个任务"""
+        try:
+            delay = coro.send(None)
+        except StopIteration:
+            done.set_result(task)
+        except Exception as e:
+            robot.abort_task(task, e)
+            done.set_exception(e)
+        else:
+            self.schedule(delay, self._resume, robot, coro, task, done)
+            return
+        self._next(robot)
+
+    def watch_queue(self, queue, dispatch):
+        """登记调度队列：wait_idle在队列清空（或剩余任务无机器人可执行）前不返回"""
+        self.backlogs.append((queue, dispatch))
+
+    def wait_idle(self, timeout=None):
+        """推进仿真直到所有机器人空闲、定时回调均已触发且调度队列清空（timeout为虚拟秒数）"""
+        deadline = None if timeout is None else self.time + timeout
+        while True:
+            while (self.running or self.pending_timers) and self.events:
+                if deadline is not None and self.events[0][0] > deadline:
+                    return
+                self.step()
+            if not any(len(queue) for queue, _ in self.backlogs):
+                return
+            for _, dispatch in self.backlogs:
+                dispatch()  # 机器人均已空闲，补派队列中的等待任务
+            if not (self.running or self.pending_timers):
+                return  # 剩余任务暂无可执行的机器人
+
+    def stop(self):
+        """丢弃所有未执行事件"""
+        self.events.clear()
+        self.running.clear()
+        self.pending_timers = 0
+
+# ------------------------------
+# 栅格路径规划
+# ------------------------------
+class GridPlanner:
+    """
+    1米栅格上的8邻接A*路径规划（octile启发式，斜向移动不得穿过障碍角），障碍物为整数坐标集合
+    距离预言机按（起点栅格, 终点栅格, 地图版本）缓存路径长度，查询时不构建完整路径
+    """
+    SQRT2 = math.sqrt(2)
+    MARGIN = 3  # 搜索范围：起终点与障碍物包围盒外扩的栅格数
+    NEIGHBORS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+    def __init__(self, obstacles, cache_size=4096):
+        self.obstacles = obstacles  # 与控制器共享的障碍物集合
+        self.version = 0  # 地图版本，障碍物变化时递增
+        self.cache = {}  # (起点栅格, 终点栅格, 地图版本) -> 栅格路径长度（None表示不可达）
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._bounds = None  # 障碍物包围盒（随版本惰性计算）
+
+    def invalidate(self):
+        """地图变化：版本递增并清空距离缓存"""
+        self.version += 1
+        self.cache.clear()
+        self._bounds = None
+
+    @staticmethod
+    def cell(x, y):
+        return (int(round(x)), int(round(y)))
+
+    def _search_bounds(self, start, goal):
+        if self._bounds is None and self.obstacles:
+            xs = [x for x, _ in self.obstacles]
+            ys = [y for _, y in self.obstacles]
+            self._bounds = (min(xs), min(ys), max(xs), max(ys))
+        x0, y0 = min(start[0], goal[0]), min(start[1], goal[1])
+        x1, y1 = max(start[0], goal[0]), max(start[1], goal[1])
+        if self._bounds is not None:
+            x0, y0 = min(x0, self._bounds[0]), min(y0, self._bounds[1])
+            x1, y1 = max(x1, self._bounds[2]), max(y1, self._bounds[3])
+        return x0 - self.MARGIN, y0 - self.MARGIN, x1 + self.MARGIN, y1 + self.MARGIN
+
+    def _heuristic(self, a, b):
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return (dx + dy) + (self.SQRT2 - 2) * min(dx, dy)
+
+    def _box_clear(self, start, goal):
+        """起终点栅格的包围盒内是否没有障碍（按盒面积与障碍数取较小者枚举）"""
+        x0, x1 = sorted((start[0], goal[0]))
+        y0, y1 = sorted((start[1], goal[1]))
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self.obstacles):
+            return not any((x, y) in self.obstacles for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        return not any(x0 <= x <= x1 and y0 <= y <= y1 for x, y in self.obstacles)
+
+    def _search(self, start, goal, want_path, limit=math.inf):
+        """A*搜索，返回（栅格路径长度, 栅格序列或None）；不可达或长度超过limit返回(None, None)"""
+        if start == goal:
+            return 0.0, [start]
+        if not want_path and self._box_clear(start, goal):
+            length = self._heuristic(start, goal)  # 起终点包围盒内无障碍：octile距离即最短路长度
+            return (length, None) if length <= limit else (None, None)
+        x0, y0, x1, y1 = self._search_bounds(start, goal)
+        blocked = self.obstacles
+        g_cost = {start: 0.0}
+        parent = {}
+        closed = set()
+        heap = [(self._heuristic(start, goal), 0.0, start)]
+        while heap:
+            f, g, current = heapq.heappop(heap)
+            if f > limit:
+                return None, None  # 启发式可采纳，剩余路径均长于limit
+            if current == goal:
+                if not want_path:
+                    return g, None
+                cells = [current]
+                while current in parent:
+                    current = parent[current]
+                    cells.append(current)
+                return g, cells[::-1]
+            if current in closed:
+                continue
+            closed.add(current)
+            cx, cy = current
+            for dx, dy in self.NEIGHBORS:
+                nxt = (cx + dx, cy + dy)
+                if not (x0 <= nxt[0] <= x1 and y0 <= nxt[1] <= y1) or nxt in closed:
+                    continue
+                if nxt in blocked and nxt != goal:
+                    continue
+                if dx and dy and ((cx + dx, cy) in blocked or (cx, cy + dy) in blocked):
+                    continue  # 不斜穿障碍角
+                new_g = g + (self.SQRT2 if dx and dy else 1.0)
+                if new_g < g_cost.get(nxt, float('inf')):
+                    g_cost[nxt] = new_g
+                    parent[nxt] = current
+                    heapq.heappush(heap, (new_g + self._heuristic(nxt, goal), new_g, nxt))
+        return None, None
+
+    def path(self, start_x, start_y, target_x, target_y):
+        """规划路径：[(起点), 途经栅格..., (终点)]；不可达时返回None"""
+        start, goal = self.cell(start_x, start_y), self.cell(target_x, target_y)
+        length, cells = self._search(start, goal, want_path=True)
+        self._remember(start, goal, length)
+        if cells is None:
+            return None
+        return [(start_x, start_y)] + cells[1:-1] + [(target_x, target_y)]
+
+    def _remember(self, start, goal, length):
+        key = (min(start, goal), max(start, goal), self.version)  # 无向栅格，起终点对称
+        if key not in self.cache:
+            if len(self.cache) >= self.cache_size:
+                self.cache.pop(next(iter(self.cache)))  # 淘汰最早写入的条目
+            self.cache[key] = length
+        return key
+
+    def distance(self, start_x, start_y, target_x, target_y, limit=math.inf):
+        """
+        路径长度（米），命中缓存时O(1)；不可达时返回math.inf
+        给定limit时只搜索栅格长度不超过limit的路径，超出返回math.inf且不写入缓存
+        """
+        start, goal = self.cell(start_x, start_y), self.cell(target_x, target_y)
+        key = (min(start, goal), max(start, goal), self.version)
+        if key in self.cache:
+            self.hits += 1
+            length = self.cache[key]
+        else:
+            self.misses += 1
+            length, _ = self._search(start, goal, want_path=False, limit=limit)
+            if length is None and limit < math.inf:
+                return math.inf  # 超出limit与不可达无法区分，不缓存
+            self._remember(start, goal, length)
+        if length is None:
+            return math.inf
+        # 栅格路径长度 + 起终点到所在栅格中心的偏移；path()的折线直接连到相邻栅格，
+        # 由三角不等式其长度不超过此值，起终点恰在栅格中心时两者相等
+        return (length + math.hypot(start[0] - start_x, start[1] - start_y)
+                + math.hypot(target_x - goal[0], target_y - goal[1]))
+
+# ------------------------------
+# 责任区空间索引
+# ------------------------------
+class AreaIndex:
+    """
+    责任区二维索引：STR（Sort-Tile-Recursive）打包的静态R树，插入后在下次查询时惰性重建
+    支持点查询（包含该点的责任区）与按距离由近到远遍历责任区
+    """
+    NODE_SIZE = 8  # 每个节点的最大子项数
+
+    def __init__(self):
+        self.items = []  # (矩形(x_min, y_min, x_max, y_max), 值)
+        self.root = None  # 节点：(矩形, 子节点列表, 值)，叶子项的子节点列表为None
+
+    @staticmethod
+    def box(area):
+        """责任区转为矩形：(x_min, x_max)表示整列（y不限），(x_min, x_max, y_min, y_max)为矩形"""
+        if len(area) == 2:
+            return (area[0], -math.inf, area[1], math.inf)
+        return (area[0], area[2], area[1], area[3])
+
+    def insert(self, area, value):
+        self.items.append((self.box(area), value))
+        self.root = None
+
+    @staticmethod
+    def _union(entries):
+        return (min(e[0][0] for e in entries), min(e[0][1] for e in entries),
+                max(e[0][2] for e in entries), max(e[0][3] for e in entries))
+
+    @staticmethod
+    def _center(box, axis):
+        low, high = box[axis], box[axis + 2]
+        # 无界方向以有限端点代替中心
+        if math.isinf(low) or math.isinf(high):
+            return 0.0 if math.isinf(low) and math.isinf(high) else (high if math.isinf(low) else low)
+        return (low + high) / 2
+
+    def _pack(self, entries):
+        """按x分条、条内按y排序后每NODE_SIZE项打包为一个节点"""
+        size = self.NODE_SIZE
+        slices = math.ceil(math.sqrt(math.ceil(len(entries) / size)))
+        entries = sorted(entries, key=lambda e: self._center(e[0], 0))
+        step = slices * size
+        nodes = []
+        for i in range(0, len(entries), step):
+            strip = sorted(entries[i:i + step], key=lambda e: self._center(e[0], 1))
+            for j in range(0, len(strip), size):
+                chunk = strip[j:j + size]
+                nodes.append((self._union(chunk), chunk, None))
+        return nodes
+
+    def _build(self):
+        level = [(box, None, value) for box, value in self.items]
+        while len(level) > self.NODE_SIZE:
+            level = self._pack(level)
+        self.root = (self._union(level), level, None) if level else None
+
+    def query(self, x, y):
+        """返回包含点(x,y)的所有责任区对应的值"""
+        if self.root is None:
+            self._build()
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            box, children, value = stack.pop()
+            if not (box[0] <= x <= box[2] and box[1] <= y <= box[3]):
+                continue
+            if children is None:
+                result.append(value)
+            else:
+                stack.extend(children)
+        return result
+
+    @staticmethod
+    def _distance(box, x, y):
+        dx = max(box[0] - x, 0, x - box[2])
+        dy = max(box[1] - y, 0, y - box[3])
+        return math.hypot(dx, dy)
+
+    def nearest(self, x, y):
+        """按点到责任区的距离由近到远逐个产出(距离, 值)（最佳优先搜索，按需展开）"""
+        if self.root is None:
+            self._build()
+        if self.root is None:
+            return
+        counter = itertools.count()
+        heap = [(self._distance(self.root[0], x, y), next(counter), self.root)]
+        while heap:
+            distance, _, (box, children, value) = heapq.heappop(heap)
+            if children is None:
+                yield distance, value
+                continue
+            for child in children:
+                heapq.heappush(heap, (self._distance(child[0], x, y), next(counter), child))
+
+# ------------------------------
+# 物资请求合并（多站点配送）
+# ------------------------------
+class SupplyConsolidator:
+    """
+    物资补给请求合并：非P0请求先在窗口期内暂存，窗口结束时按物资种类与距离聚类为站点，
+    再以Clarke-Wright节约算法（受单次载量约束）规划从物资库出发的多站点配送路线
+    """
+    def __init__(self, controller, window=30.0, capacity=60, cluster_radius=5.0):
+        self.controller = controller
+        self.window = window  # 暂存窗口(秒)
+        self.capacity = capacity  # 单条路线最多运载的物资件数
+        self.cluster_radius = cluster_radius  # 同一站点内各投放点离簇首的最大路径距离(米)
+        self.pending = []  # 窗口内暂存的请求
+        self.armed = False  # 窗口定时是否已启动
+        self.stats = {'requests': 0, 'batches': 0, 'tours': 0}
+
+    def discard(self, task):
+        """从暂存窗口中撤回请求，返回是否找到"""
+        for i, pending in enumerate(self.pending):
+            if pending is task:
+                del self.pending[i]
+                return True
+        return False
+
+    def add(self, task):
+        """暂存请求，窗口内首个请求启动定时"""
+        self.pending.append(task)
+        self.stats['requests'] += 1
+        if not self.armed:
+            self.armed = True
+            self.controller.runtime.call_later(self.window, self.flush)
+
+    def flush(self):
+        """窗口结束：规划配送路线并作为任务送入调度队列（定时回调在事件循环线程执行，持控制器锁）"""
+        with self.controller.lock:
+            self.armed = False
+            tasks, self.pending = self.pending, []
+            if not tasks:
+                return []
+            tours = self.plan_tours(tasks)
+            self.stats['batches'] += 1
+            self.stats['tours'] += len(tours)
+            for tour in tours:
+                self.controller.task_queue.push(tour)
+            self.controller.dispatch_pending()
+            return tours
+
+    def _stops(self, tasks):
+        """
+        按物资与距离聚类：同种物资、离簇首床位不超过cluster_radius米且合计不超过单次载量的请求归为一个站点，
+        站点内同一床位的请求合并为一个投放点；站点以簇首床位的位置参与节约算法
+        """
+        distance = self.controller.route_length
+        stops = []
+        for task in tasks:
+            item, quantity = task['content']['item'], task['content']['quantity']
+            stop = next((s for s in stops
+                         if s['item'] == item and s['quantity'] + quantity <= self.capacity
+                         and distance(*s['target_pos'], *task['target_pos']) <= self.cluster_radius), None)
+            if stop is None:
+                stop = {'item': item, 'target_pos': task['target_pos'], 'quantity': 0, 'drops': [], 'tasks': []}
+                stops.append(stop)
+            drop = next((d for d in stop['drops'] if d['sender'] is task['sender']), None)
+            if drop is None:
+                drop = {'sender': task['sender'], 'target_pos': task['target_pos'], 'quantity': 0, 'tasks': []}
+                stop['drops'].append(drop)
+            drop['quantity'] += quantity
+            drop['tasks'].append(task)
+            stop['quantity'] += quantity
+            stop['tasks'].append(task)
+        return stops
+
+    def plan_tours(self, tasks):
+        """节约算法：初始每个站点一条往返路线，按节约值从大到小在路线端点处合并"""
+        depot = LogisticsRobot.SUPPLY_ROOM
+        distance = self.controller.route_length
+        stops = self._stops(tasks)
+        n = len(stops)
+        from_depot = [distance(*depot, *stop['target_pos']) for stop in stops]
+        routes = {i: [i] for i in range(n)}
+        route_of = list(range(n))
+        load = {i: stops[i]['quantity'] for i in range(n)}
+        savings = sorted(
+            ((from_depot[i] + from_depot[j] - distance(*stops[i]['target_pos'], *stops[j]['target_pos']), i, j)
+             for i in range(n) for j in range(i + 1, n)
+             if math.isfinite(from_depot[i] + from_depot[j])),  # 补给间不可达的站点保持单独往返
+            reverse=True
+        )
+        for saving, i, j in savings:
+            if saving <= 0:
+                break
+            ri, rj = route_of[i], route_of[j]
+            if ri == rj or load[ri] + load[rj] > self.capacity:
+                continue
+            a, b = routes[ri], routes[rj]
+            if a[-1] == i and b[0] == j:
+                merged = a + b
+            elif a[0] == i and b[-1] == j:
+                merged = b + a
+            elif a[-1] == i and b[-1] == j:
+                merged = a + b[::-1]
+            elif a[0] == i and b[0] == j:
+                merged = a[::-1] + b
+            else:
+                continue  # 只能在路线端点处连接
+            routes[ri] = merged
+            load[ri] += load.pop(rj)
+            del routes[rj]
+            for k in b:
+                route_of[k] = ri
+
+        tours = []
+        for ri, route in routes.items():
+            route_stops = [stops[k] for k in route]
+            senders = []
+            for stop in route_stops:
+                for drop in stop['drops']:
+                    if all(drop['sender'] is not s for s in senders):
+                        senders.append(drop['sender'])
+            tours.append({
+                'type': 'supply',
+                'subtype': 'tour',
+                'priority': min(t['priority'] for stop in route_stops for t in stop['tasks']),
+                'target_pos': depot,  # 路线从物资库出发，就近派发物流机器人
+                'content': {'item': 'tour', 'quantity': load[ri], 'stops': route_stops},
+                'senders': senders  # 路线上所有请求方（按首次投放顺序）
+            })
+        return tours
 
 # ------------------------------
 # IANI框架核心控制类
 # ------------------------------
 class IANI_Controller:
     """IANI框架中央控制器，负责任务调度、路径规划与数据交互"""
-    def __init__(self):
+    TASK_ROBOTS = {'supply': 'logistics', 'disinfect': 'disinfect'}  # 任务类型（队列车道） -> 执行机器人类型
+
+    def __init__(self, aging_interval=60.0, time_scale=0.01, runtime=None, supply_window=30.0):
         self.robots = {  # 存储所有机器人实例
             'bedside': [],    # 床头护理机器人
             'logistics': [],  # 物流机器人
             'disinfect': []   # 消毒机器人
         }
-        self.task_queue = []  # 任务队列[(优先级, 任务信息, 时间戳)]
+        # 机器人运行时：默认异步实时运行（按time_scale加速），传入SimulatedRuntime则以虚拟时钟仿真
+        self.runtime = runtime if runtime is not None else RobotRuntime(time_scale)
+        self.task_queue = TaskQueue(aging_interval, clock=self.runtime.monotonic)  # 待分配任务优先队列（P2等待aging_interval秒升一级）
+        self.runtime.watch_queue(self.task_queue, self.dispatch_pending)
+        # 调用方线程与事件循环线程共用：保护任务队列、合并窗口暂存与机器人忙碌状态
+        self.lock = threading.RLock()
+        self._draining = False  # 正在分配队列任务（防止同线程重入）
+        self._redrain = False  # 分配过程中有新任务或空出的机器人，需再分配一轮
         self.map_obstacles = set()  # 障碍物坐标集合
+        self.planner = GridPlanner(self.map_obstacles)  # 栅格A*规划与路径长度缓存
+        self.disinfect_zones = AreaIndex()  # 消毒机器人责任区索引
+        self.fallback_zones = 3  # 本区无空闲机器人时最多考虑的相邻责任区数
+        self.disinfect_inbox = 2  # 消毒机器人收件箱最多容纳的任务数（含执行中），候选均已满时任务留在调度队列
+        # 物资补给合并窗口（秒），None表示逐个派发
+        self.consolidator = SupplyConsolidator(self, supply_window) if supply_window else None
+        self.verbose = True  # 是否打印机器人动作日志
 
     def register_robot(self, robot_type, robot):
         """注册机器人到系统"""
         if robot_type in self.robots:
             self.robots[robot_type].append(robot)
             robot.controller = self  # 绑定控制器引用
+            self.runtime.attach(robot)
+            if robot_type == 'disinfect':
+                self.disinfect_zones.insert(robot.responsible_area, robot)
 
     def add_obstacle(self, x, y):
-        """添加障碍物坐标"""
-        self.map_obstacles.add((x, y))
+        """添加障碍物坐标（地图变化使路径长度缓存失效）"""
+        if (x, y) not in self.map_obstacles:
+            self.map_obstacles.add((x, y))
+            self.planner.invalidate()
+
+    def on_task_queued(self, robot, task):
+        """任务进入机器人收件箱回调（持控制器锁调用，供子类维护负载统计）"""
+
+    def on_task_started(self, robot, task):
+        """任务开始执行回调（持控制器锁调用，供子类维护负载统计）"""
+
+    def on_task_completed(self, robot, task):
+        """任务完成回调（由机器人在任务结束时调用）：用空出的机器人分配等待任务"""
+        self.dispatch_pending()
+
+    def on_task_failed(self, robot, task, error):
+        """任务执行异常回调：机器人同样空出，分配等待任务"""
+        self.dispatch_pending()
+
+    def stop(self):
+        """停止控制器：关闭机器人运行时（需在事件循环线程外调用）"""
+        self.runtime.stop()
+
+    def queue_metrics(self):
+        """任务队列长度与等待时间指标"""
+        return self.task_queue.metrics()
 
     def calculate_path(self, start_x, start_y, target_x, target_y):
         """
-        基于Neural A*启发式算法的路径规划
+        基于栅格A*的路径规划（绕开map_obstacles中的障碍栅格）
         返回：路径坐标列表[(x1,y1), (x2,y2)...]
         """
-        # 简化实现：直线优先，遇障碍物绕行
-        path = [(start_x, start_y)]
-        current_x, current_y = start_x, start_y
-        step = 0.5  # 步长0.5米
-        
-        # 计算方向向量
-        dx = target_x - start_x
-        dy = target_y - start_y
-        distance = math.hypot(dx, dy)
-        steps = int(distance / step)
-        
-        for i in range(steps):
-            next_x = current_x + dx * step / distance
-            next_y = current_y + dy * step / distance
-            # 检查是否为障碍物
-            if (round(next_x), round(next_y)) not in self.map_obstacles:
-                path.append((round(next_x, 1), round(next_y, 1)))
-                current_x, current_y = next_x, next_y
-            else:
-                # 简单绕行逻辑：沿x轴偏移0.5米
-                offset_x = 0.5 if next_x < target_x else -0.5
-                path.append((round(next_x + offset_x, 1), round(next_y, 1)))
-                current_x, current_y = next_x + offset_x, next_y
-        
-        path.append((target_x, target_y))
-        return path
+        return self.planner.path(start_x, start_y, target_x, target_y)
+
+    def route_length(self, start_x, start_y, target_x, target_y, limit=math.inf):
+        """两点间路径长度（米），走距离缓存，不构建完整路径；超过limit的返回math.inf"""
+        return self.planner.distance(start_x, start_y, target_x, target_y, limit)
 
     def dispatch_task(self, task):
         """
@@ -69,36 +848,92 @@ class IANI_Controller:
             'content': 任务内容
         }
         """
-        # 优先级映射：P0→0, P1→1, P2→2（数字越小优先级越高）
-        priority_map = {'P0':0, 'P1':1, 'P2':2}
-        task_priority = priority_map[task['priority']]
-        self.task_queue.append((task_priority, task, datetime.now()))
-        
-        # 按优先级排序任务队列
-        self.task_queue.sort(key=lambda x: x[0])
-        
-        # 分配任务给最合适的机器人
+        if task['type'] not in self.TASK_ROBOTS:
+            return  # 无对应执行机器人的任务类型不入队
+        with self.lock:
+            task.setdefault('created_at', self.runtime.monotonic())
+            # 非P0物资补给进入合并窗口（P0与样本传送直接派发）
+            if (self.consolidator and task['type'] == 'supply' and task['priority'] != 'P0'
+                    and 'subtype' not in task and task['content'].get('item') != 'sample'):
+                self.consolidator.add(task)
+                return
+            # 入队后按优先级（含老化）分配，暂无可用机器人的任务留在队列中等待
+            self.task_queue.push(task)
+            self.dispatch_pending()
+
+    def dispatch_pending(self):
+        """按优先级分配队列中的等待任务（其他线程持锁等待，同线程重入时由外层循环再分配一轮）"""
+        with self.lock:
+            if self._draining:
+                self._redrain = True
+                return
+            self._draining = True
+            try:
+                while True:
+                    self._redrain = False
+                    self.task_queue.drain(self._assign_task, self._lane_ready)
+                    if not self._redrain:
+                        break
+            finally:
+                self._draining = False
+
+    def _lane_ready(self, lane):
+        """该车道（任务类型）是否还有可接收任务的机器人；全部占满时分配循环跳过整条车道"""
+        if lane == 'disinfect':
+            return any(bot.queued < self.disinfect_inbox for bot in self.robots['disinfect'])
+        return any(not bot.is_busy for bot in self.robots[self.TASK_ROBOTS[lane]])
+
+    def cancel_task(self, task):
+        """取消尚未分配的任务（调度队列或合并窗口中），返回是否取消；已投递给机器人的任务不受影响"""
+        with self.lock:
+            if self.task_queue.remove(task):
+                return True
+            return self.consolidator is not None and self.consolidator.discard(task)
+
+    def _assign_task(self, task):
+        """分配任务给最合适的机器人，返回是否分配成功"""
         if task['type'] == 'supply':
-            # 选择距离最近的物流机器人
+            # 选择路径距离最近的物流机器人
             min_distance = float('inf')
             target_robot = None
             for bot in self.robots['logistics']:
-                distance = math.hypot(
-                    bot.x - task['target_pos'][0],
-                    bot.y - task['target_pos'][1]
-                )
-                if distance < min_distance and not bot.is_busy:
+                if bot.is_busy:
+                    continue
+                distance = self.route_length(bot.x, bot.y, *task['target_pos'])
+                if distance < min_distance:
                     min_distance = distance
                     target_robot = bot
             if target_robot:
                 target_robot.receive_task(task)
+                return True
                 
         elif task['type'] == 'disinfect':
-            # 选择负责该区域的消毒机器人
-            for bot in self.robots['disinfect']:
-                if bot.responsible_area[0] <= task['target_pos'][0] <= bot.responsible_area[1]:
-                    bot.receive_task(task)
+            target_robot = self._select_disinfect_robot(*task['target_pos'])
+            if target_robot:
+                target_robot.receive_task(task)
+                return True
+        return False
+
+    def _select_disinfect_robot(self, x, y):
+        """
+        选择消毒机器人：优先负责该点且空闲、余量充足的机器人；否则在本区与最近的fallback_zones个相邻责任区中
+        按（待执行任务数, 消毒剂余量从多到少, 距离）择优（余量不足的机器人需先返回补充，排在后面）
+        候选收件箱均已达disinfect_inbox时返回None，任务留在队列中等待（随老化提升优先级）
+        """
+        candidates = []
+        neighbours = 0
+        for distance, bot in self.disinfect_zones.nearest(x, y):
+            if distance > 0:
+                neighbours += 1
+                if neighbours > self.fallback_zones:
                     break
+            if distance == 0 and not bot.is_busy and bot.disinfectant >= bot.DOSE:
+                return bot
+            if bot.queued < self.disinfect_inbox:
+                candidates.append((bot.queued, -bot.disinfectant, distance, bot))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: c[:3])[3]
 
 # ------------------------------
 # 机器人基类
@@ -113,36 +948,82 @@ class Robot:
         self.is_busy = False  # 是否忙碌
         self.controller = None  # 控制器引用
         self.task_history = []  # 任务历史记录
+        self.inbox = None  # 任务收件箱（注册时由运行时创建）
+        self.queued = 0  # 已接收未完成的任务数
+        self.distance_travelled = 0.0  # 累计行驶距离(米)
+
+    async def wait(self, seconds):
+        """等待模拟耗时（不阻塞其他机器人）"""
+        await self.controller.runtime.sleep(seconds)
 
-    def move_to(self, target_x, target_y):
+    def now(self):
+        """当前时间（取自控制器运行时的时钟）"""
+        return self.controller.runtime.now() if self.controller else datetime.now()
+
+    def log(self, message):
+        """打印带时间戳的动作日志"""
+        if self.controller is None or self.controller.verbose:
+            print(f"[{self.now()}] {message}")
+
+    async def move_to(self, target_x, target_y):
         """移动到目标坐标，返回耗时(秒)"""
         if not self.controller:
             raise Exception("未绑定控制器")
             
-        path = self.controller.calculate_path(self.x, self.y, target_x, target_y)
-        total_distance = 0
-        
-        # 计算总距离
-        for i in range(1, len(path)):
-            x1, y1 = path[i-1]
-            x2, y2 = path[i]
-            total_distance += math.hypot(x2-x1, y2-y1)
+        # 路径长度取自控制器的距离缓存，无需构建完整路径
+        total_distance = self.controller.route_length(self.x, self.y, target_x, target_y)
+        if math.isinf(total_distance):
+            raise Exception(f"{self.robot_id}无法到达({target_x}, {target_y})：路径被障碍物阻断")
+        self.distance_travelled += total_distance
             
-        # 更新当前位置
-        self.x, self.y = target_x, target_y
+        # 行驶后更新当前位置
         time_cost = total_distance / self.speed
+        await self.wait(time_cost)
+        self.x, self.y = target_x, target_y
         return round(time_cost, 1)
 
     def receive_task(self, task):
-        """接收任务并执行"""
-        self.is_busy = True
-        start_time = datetime.now()
-        self.task_history.append({
-            'task': task,
-            'start_time': start_time,
-            'status': 'executing'
-        })
-        self.execute_task(task)
+        """接收任务：放入收件箱后立即返回，返回任务完成的Future"""
+        with self.controller.lock:
+            self.is_busy = True
+            self.queued += 1
+            self.task_history.append({
+                'task': task,
+                'start_time': self.now(),
+                'status': 'queued'
+            })
+            self.controller.on_task_queued(self, task)
+            return self.controller.runtime.submit(self, task)
+
+    def _update_history(self, task, old_status, new_status, time_key):
+        for t in self.task_history:
+            if t['task'] is task and t['status'] == old_status:
+                t[time_key] = self.now()
+                t['status'] = new_status
+                break
+
+    def start_task(self, task):
+        """任务开始执行（由运行时调用）"""
+        with self.controller.lock:
+            self._update_history(task, 'queued', 'executing', 'start_time')
+            self.controller.on_task_started(self, task)
+
+    def finish_task(self, task):
+        """任务完成：更新历史记录与忙碌状态，并通知控制器"""
+        with self.controller.lock:
+            self._update_history(task, 'executing', 'completed', 'end_time')
+            self.queued -= 1
+            self.is_busy = self.queued > 0
+            self.controller.on_task_completed(self, task)
+
+    def abort_task(self, task, error):
+        """任务执行异常（由运行时调用）：更新状态并通知控制器"""
+        with self.controller.lock:
+            self._update_history(task, 'executing', 'failed', 'end_time')
+            self.queued -= 1
+            self.is_busy = self.queued > 0
+            self.controller.on_task_failed(self, task, error)
+        self.log(f"{self.robot_id}任务执行失败：{error}")
 
 # ------------------------------
 # 床头护理机器人类
@@ -158,7 +1039,7 @@ class BedsideRobot(Robot):
         }
         self.work_count = 0  # 作业次数计数器
 
-    def execute_task(self, task):
+    async def execute_task(self, task):
         """执行护理任务"""
         if task['type'] == 'self_operate':
             # 执行预编程医疗操作
@@ -170,9 +1051,9 @@ class BedsideRobot(Robot):
             }[operation]
             
             # 模拟操作耗时
-            time.sleep(op_time / 100)  # 加速模拟，实际需乘以100
+            await self.wait(op_time)
             self.work_count += 1
-            print(f"[{datetime.now()}] {self.robot_id}完成{operation}，位置({self.x},{self.y})")
+            self.log(f"{self.robot_id}完成{operation}，位置({self.x},{self.y})")
             
             # 消耗物资
             if operation == 'throat_swab':
@@ -189,23 +1070,19 @@ class BedsideRobot(Robot):
                 self.request_transport()
 
         # 任务完成后更新状态
-        for t in self.task_history:
-            if t['status'] == 'executing':
-                t['end_time'] = datetime.now()
-                t['status'] = 'completed'
-        self.is_busy = False
+        self.finish_task(task)
 
-    def request_supply(self, item, quantity):
-        """向物流机器人请求物资"""
+    def request_supply(self, item, quantity, priority='P1'):
+        """向物流机器人请求物资（P0紧急请求不进入合并窗口）"""
         task = {
             'type': 'supply',
             'sender': self,
             'target_pos': (self.x, self.y),
-            'priority': 'P1',
+            'priority': priority,
             'content': {'item': item, 'quantity': quantity}
         }
         self.controller.dispatch_task(task)
-        print(f"[{datetime.now()}] {self.robot_id}请求{quantity}个{item}")
+        self.log(f"{self.robot_id}请求{quantity}个{item}")
 
     def request_disinfect(self):
         """请求消毒"""
@@ -234,77 +1111,362 @@ class BedsideRobot(Robot):
 # ------------------------------
 class LogisticsRobot(Robot):
     """物流机器人：负责物资运输"""
+    SUPPLY_ROOM = (5, 10)  # 物资库坐标
+
     def __init__(self, robot_id, x, y):
         super().__init__(robot_id, x, y)
         self.cargo = {}  # 运载的物资
+        self.supply_trips = 0  # 往返物资库次数
+        self.delivered_items = 0  # 已交付物资件数
+        self.delivery_latencies = []  # 各请求从发出到交付的耗时(秒)
+
+    def _record_delivery(self, tasks, quantity):
+        now = self.controller.runtime.monotonic()
+        self.delivered_items += quantity
+        self.delivery_latencies.extend(now - t['created_at'] for t in tasks if 'created_at' in t)
 
-    def execute_task(self, task):
+    async def _run_tour(self, task):
+        """多站点配送：物资库一次取齐，按路线顺序逐站交付"""
+        stops = task['content']['stops']
+        await self.move_to(*self.SUPPLY_ROOM)
+        self.supply_trips += 1
+        for stop in stops:
+            self.cargo[stop['item']] = self.cargo.get(stop['item'], 0) + stop['quantity']
+        self.log(f"{self.robot_id}从物资库取货{task['content']['quantity']}件，配送{len(stops)}个站点")
+        for stop in stops:
+            item = stop['item']
+            for drop in stop['drops']:
+                move_time = await self.move_to(*drop['target_pos'])
+                sender = drop['sender']
+                sender.supplies[item] = sender.supplies.get(item, 0) + drop['quantity']
+                self.cargo[item] -= drop['quantity']
+                if not self.cargo[item]:
+                    del self.cargo[item]
+                self._record_delivery(drop['tasks'], drop['quantity'])
+                self.log(f"{self.robot_id}向{sender.robot_id}交付{drop['quantity']}个{item}，耗时{move_time}秒")
+
+    async def execute_task(self, task):
         """执行物流任务"""
+        if task.get('subtype') == 'tour':
+            await self._run_tour(task)
+            self.finish_task(task)
+            return
+
         # 前往目标位置
         target_x, target_y = task['target_pos']
-        move_time = self.move_to(target_x, target_y)
-        print(f"[{datetime.now()}] {self.robot_id}抵达({target_x},{target_y})，耗时{move_time}秒")
+        move_time = await self.move_to(target_x, target_y)
+        self.log(f"{self.robot_id}抵达({target_x},{target_y})，耗时{move_time}秒")
         
         # 处理物资
-        if task['content']['item'] != 'sample':
+        subtype = task.get('subtype')
+        if subtype == 'pick_sample':
+            # 拆分子任务：取样本后随车，由后续deliver_sample子任务送达
+            self.cargo['sample'] = task['content']['quantity']
+            self.log(f"{self.robot_id}取得{task['content']['quantity']}份样本")
+
+        elif subtype == 'deliver_sample':
+            # 拆分子任务：已抵达目的地，交付样本
+            self.cargo.pop('sample', None)
+            self.log(f"{self.robot_id}将样本送达检验科，耗时{move_time}秒")
+
+        elif task['content']['item'] != 'sample':
             # 运送物资：先去物资库取货
             if not self.cargo.get(task['content']['item']):
-                self.move_to(5, 10)  # 物资库坐标
+                await self.move_to(*self.SUPPLY_ROOM)
+                self.supply_trips += 1
                 self.cargo[task['content']['item']] = task['content']['quantity']
-                print(f"[{datetime.now()}] {self.robot_id}从物资库取货{task['content']['quantity']}个{task['content']['item']}")
-                self.move_to(target_x, target_y)  # 再次前往目标位置
+                self.log(f"{self.robot_id}从物资库取货{task['content']['quantity']}个{task['content']['item']}")
+                await self.move_to(target_x, target_y)  # 再次前往目标位置
             
             # 交付物资
             task['sender'].supplies[task['content']['item']] += task['content']['quantity']
             del self.cargo[task['content']['item']]
-            print(f"[{datetime.now()}] {self.robot_id}完成{task['content']['quantity']}个{task['content']['item']}交付")
+            self._record_delivery([task], task['content']['quantity'])
+            self.log(f"{self.robot_id}完成{task['content']['quantity']}个{task['content']['item']}交付")
         
         else:
             # 传送样本
             self.cargo['sample'] = task['content']['quantity']
             dest_x, dest_y = task['content']['destination']
-            move_time = self.move_to(dest_x, dest_y)
-            print(f"[{datetime.now()}] {self.robot_id}将样本送达检验科，耗时{move_time}秒")
+            move_time = await self.move_to(dest_x, dest_y)
+            self.log(f"{self.robot_id}将样本送达检验科，耗时{move_time}秒")
             del self.cargo['sample']
 
         # 任务完成
-        for t in self.task_history:
-            if t['status'] == 'executing':
-                t['end_time'] = datetime.now()
-                t['status'] = 'completed'
-        self.is_busy = False
+        self.finish_task(task)
 
 # ------------------------------
 # 消毒机器人类
 # ------------------------------
 class DisinfectRobot(Robot):
     """消毒机器人：负责环境与设备消毒"""
+    DOSE = 5  # 单次消毒消耗的消毒剂(%)
+    REFILL_TIME = 60  # 补充消毒剂耗时(秒)
+
     def __init__(self, robot_id, x, y, responsible_area):
         super().__init__(robot_id, x, y)
-        self.responsible_area = responsible_area  # 负责区域(x_min, x_max)
+        self.responsible_area = responsible_area  # 负责区域(x_min, x_max)或(x_min, x_max, y_min, y_max)
         self.disinfectant = 100  # 消毒剂余量(%)
+        self.refills = 0  # 补充消毒剂次数
 
-    def execute_task(self, task):
+    async def execute_task(self, task):
         """执行消毒任务"""
+        # 余量不足一次用量时先回物资库补充
+        if self.disinfectant < self.DOSE:
+            await self.move_to(*LogisticsRobot.SUPPLY_ROOM)
+            await self.wait(self.REFILL_TIME)
+            self.disinfectant = 100
+            self.refills += 1
+            self.log(f"{self.robot_id}补充消毒剂至100%")
+
         # 前往目标位置
         target_x, target_y = task['target_pos']
-        move_time = self.move_to(target_x, target_y)
-        print(f"[{datetime.now()}] {self.robot_id}抵达消毒点({target_x},{target_y})，耗时{move_time}秒")
+        move_time = await self.move_to(target_x, target_y)
+        self.log(f"{self.robot_id}抵达消毒点({target_x},{target_y})，耗时{move_time}秒")
         
         # 执行消毒
         radius = task['content']['radius']
         disinfect_time = 45  # 固定消毒耗时(秒)
-        time.sleep(disinfect_time / 100)  # 加速模拟
-        self.disinfectant -= 5  # 消耗消毒剂
+        await self.wait(disinfect_time)
+        self.disinfectant -= self.DOSE  # 消耗消毒剂
         coverage = 98  # 消毒覆盖率(%)
-        print(f"[{datetime.now()}] {self.robot_id}完成{radius}米范围消毒，覆盖率{coverage}%，耗时{disinfect_time}秒")
+        self.log(f"{self.robot_id}完成{radius}米范围消毒，覆盖率{coverage}%，耗时{disinfect_time}秒")
         
         # 任务完成
-        for t in self.task_history:
-            if t['status'] == 'executing':
-                t['end_time'] = datetime.now()
-                t['status'] = 'completed'
-        self.is_busy = False
+        self.finish_task(task)
+
+# ------------------------------
+# 并行执行基准
+# ------------------------------
+def benchmark_parallel_runtime(time_scale=0.01):
+    """九台机器人同时派发作业：总耗时应接近单台机器人最长作业时间，而非所有作业耗时之和"""
+    iani = IANI_Controller(time_scale=time_scale)
+    bedside_bots = [BedsideRobot(f"A{i + 1}", 10 + 5 * i, 5) for i in range(3)]
+    logistics_bots = [LogisticsRobot(f"B{i + 1}", 5 + 5 * i, 10) for i in range(3)]
+    disinfect_bots = [DisinfectRobot(f"C{i + 1}", 10 + 5 * i, 8, (5 + 7 * i, 12 + 7 * i)) for i in range(3)]
+    for robot_type, bots in [('bedside', bedside_bots), ('logistics', logistics_bots), ('disinfect', disinfect_bots)]:
+        for bot in bots:
+            iani.register_robot(robot_type, bot)
+
+    start = time.perf_counter()
+    for bot, operation in zip(bedside_bots, ['throat_swab', 'blood_draw', 'blood_pressure']):
+        bot.receive_task({'type': 'self_operate', 'content': {'operation': operation},
+                          'priority': 'P1', 'target_pos': (bot.x, bot.y), 'sender': bot})
+    for bot, logistics in zip(bedside_bots, logistics_bots):
+        logistics.receive_task({'type': 'supply', 'sender': bot, 'target_pos': (bot.x, bot.y),
+                                'priority': 'P1', 'content': {'item': 'blood_tube', 'quantity': 5}})
+    for bot, disinfect in zip(bedside_bots, disinfect_bots):
+        disinfect.receive_task({'type': 'disinfect', 'sender': bot, 'target_pos': (bot.x + 1, bot.y),
+                                'priority': 'P2', 'content': {'area': 'operation', 'radius': 1.5}})
+    iani.runtime.wait_idle()
+    elapsed = time.perf_counter() - start
+    iani.stop()
+
+    # 各机器人忙碌时间（含执行中派发的消毒任务）
+    busy = {}
+    for bot in bedside_bots + logistics_bots + disinfect_bots:
+        busy[bot.robot_id] = sum((t['end_time'] - t['start_time']).total_seconds()
+                                 for t in bot.task_history if t['status'] == 'completed')
+    print(f"并行基准：9台机器人，总耗时{elapsed:.2f}秒，"
+          f"单台最长{max(busy.values()):.2f}秒，各作业之和{sum(busy.values()):.2f}秒")
+    return {'elapsed': elapsed, 'longest': max(busy.values()), 'total': sum(busy.values())}
+
+def benchmark_path_planning(n_stations=20, n_queries=5000, seed=0):
+    """
+    路径规划基准：带门洞的走廊墙体 + 随机障碍物地图上，统计直线穿越障碍物的比例、
+    A*路径是否全部避开障碍，以及距离预言机冷/热查询耗时（机器人在若干站点间往返）
+    """
+    import random
+    rng = random.Random(seed)
+    iani = IANI_Controller(runtime=SimulatedRuntime())
+    for x in range(0, 60):
+        if x % 15 not in (7, 8):  # 每15米一个2米宽门洞
+            iani.add_obstacle(x, 20)
+    while len(iani.map_obstacles) < 300:
+        iani.add_obstacle(rng.randint(0, 59), rng.randint(0, 40))
+    free = [(x, y) for x in range(60) for y in range(41) if (x, y) not in iani.map_obstacles]
+    stations = rng.sample(free, n_stations)
+    queries = [(rng.choice(stations), rng.choice(stations)) for _ in range(n_queries)]
+
+    def crosses(a, b):
+        steps = max(1, int(math.hypot(b[0] - a[0], b[1] - a[1]) / 0.25))
+        return any((round(a[0] + (b[0] - a[0]) * i / steps), round(a[1] + (b[1] - a[1]) * i / steps))
+                   in iani.map_obstacles for i in range(steps + 1))
+
+    straight_blocked = sum(crosses(a, b) for a, b in queries) / n_queries
+    start = time.perf_counter()
+    paths = [iani.calculate_path(*a, *b) for a, b in queries[:200]]
+    path_time = (time.perf_counter() - start) / 200
+    unreachable = sum(p is None for p in paths)
+    collision_free = all(not crosses(p[i], p[i + 1]) for p in paths if p is not None for i in range(len(p) - 1))
+
+    start = time.perf_counter()
+    for a, b in queries:
+        iani.route_length(*a, *b)
+    oracle_time = (time.perf_counter() - start) / n_queries
+    planner = iani.planner
+    print(f"路径规划基准：{len(iani.map_obstacles)}个障碍栅格，{n_stations}个站点，{n_queries}次查询")
+    print(f"直线穿越障碍比例{straight_blocked:.1%}，A*路径全部避障：{collision_free}，不可达{unreachable}条")
+    print(f"完整路径规划平均{path_time * 1000:.2f}毫秒，距离查询平均{oracle_time * 1e6:.1f}微秒"
+          f"（缓存命中率{planner.hits / max(1, planner.hits + planner.misses):.1%}）")
+    return {'straight_blocked': straight_blocked, 'collision_free': collision_free, 'unreachable': unreachable,
+            'path_ms': path_time * 1000, 'oracle_us': oracle_time * 1e6}
+
+def benchmark_zone_lookup(grid=20, zone_size=5, n_queries=5000, burst=8, seed=0):
+    """
+    责任区查询基准：grid×grid个矩形责任区（每区一台消毒机器人），对比线性扫描与R树点查询耗时；
+    并在同一责任区突发burst个消毒请求，对比全部排给本区机器人与按负载与消毒剂余量回退到相邻责任区的完工时间（虚拟时钟）
+    """
+    import random
+    rng = random.Random(seed)
+
+    def build():
+        iani = IANI_Controller(runtime=SimulatedRuntime())
+        iani.verbose = False
+        for i in range(grid * grid):
+            gx, gy = i % grid * zone_size, i // grid * zone_size
+            iani.register_robot('disinfect', DisinfectRobot(
+                f"C{i + 1}", gx + zone_size / 2, gy + zone_size / 2, (gx, gx + zone_size, gy, gy + zone_size)))
+        return iani
+
+    iani = build()
+    extent = grid * zone_size
+    points = [(rng.uniform(0, extent), rng.uniform(0, extent)) for _ in range(n_queries)]
+
+    def scan(bots, x, y):
+        return [bot for bot in bots
+                if bot.responsible_area[0] <= x <= bot.responsible_area[1]
+                and bot.responsible_area[2] <= y <= bot.responsible_area[3]]
+
+    start = time.perf_counter()
+    expected = [scan(iani.robots['disinfect'], x, y) for x, y in points]
+    scan_time = (time.perf_counter() - start) / n_queries
+    iani.disinfect_zones.query(0, 0)  # 预先构建索引
+    start = time.perf_counter()
+    found = [iani.disinfect_zones.query(x, y) for x, y in points]
+    index_time = (time.perf_counter() - start) / n_queries
+    consistent = all(set(map(id, a)) == set(map(id, b)) for a, b in zip(expected, found))
+
+    center = (extent / 2 + 1, extent / 2 + 1)
+    makespan = {}
+    for label in ('本区机器人排队', '按负载回退相邻区'):
+        iani = build()
+        owner = scan(iani.robots['disinfect'], *center)[0] if label == '本区机器人排队' else None
+        for _ in range(burst):
+            task = {'type': 'disinfect', 'sender': None, 'target_pos': center, 'priority': 'P2',
+                    'content': {'area': 'operation', 'radius': 1.5}}
+            if owner:
+                owner.receive_task(task)
+            else:
+                iani.dispatch_task(task)
+        iani.runtime.wait_idle()
+        makespan[label] = iani.runtime.monotonic()
+
+    print(f"责任区查询基准：{grid * grid}个责任区，{n_queries}次点查询，结果一致：{consistent}")
+    print(f"线性扫描平均{scan_time * 1e6:.1f}微秒，R树查询平均{index_time * 1e6:.1f}微秒"
+          f"（{scan_time / index_time:.0f}倍）")
+    print("同一责任区突发{}个消毒请求完工时间：".format(burst)
+          + "，".join(f"{label}{t:.0f}秒" for label, t in makespan.items()))
+    return {'consistent': consistent, 'scan_us': scan_time * 1e6, 'index_us': index_time * 1e6,
+            'makespan': makespan}
+
+def benchmark_supply_consolidation(n_requests=200, mean_interval=20.0, window=120.0, p0_share=0.05, seed=0):
+    """
+    物资合并基准：同一串随机补给请求（泊松到达）分别逐个派发与按窗口合并派发，
+    比较往返物资库次数、每件物资的行驶距离与请求交付耗时（虚拟时钟）
+    """
+    import random
+    items = ['cotton_swab', 'tourniquet', 'blood_tube']
+    rng = random.Random(seed)
+    arrivals, at = [], 0.0
+    for _ in range(n_requests):
+        at += rng.expovariate(1 / mean_interval)
+        arrivals.append((at, rng.randrange(12), rng.choice(items), rng.randint(2, 10),
+                         'P0' if rng.random() < p0_share else 'P1'))
+
+    results = {}
+    for label, supply_window in [('逐个派发', None), (f'{window:.0f}秒合并', window)]:
+        runtime = SimulatedRuntime()
+        iani = IANI_Controller(runtime=runtime, supply_window=supply_window)
+        iani.verbose = False
+        for x, y in [(10, 9), (15, 9), (12, 7), (18, 7)]:
+            iani.add_obstacle(x, y)
+        beds = [BedsideRobot(f"A{i + 1}", 10 + 5 * (i % 6), 5 if i < 6 else 15) for i in range(12)]
+        couriers = [LogisticsRobot(f"B{i + 1}", 5 + 5 * i, 10) for i in range(3)]
+        for bot in beds:
+            bot.supplies = dict.fromkeys(items, 0)
+            iani.register_robot('bedside', bot)
+        for bot in couriers:
+            iani.register_robot('logistics', bot)
+        for at, bed, item, quantity, priority in arrivals:
+            runtime.schedule(at, beds[bed].request_supply, item, quantity, priority)
+        runtime.run()
+
+        delivered = sum(bot.delivered_items for bot in couriers)
+        latencies = sorted(lat for bot in couriers for lat in bot.delivery_latencies)
+        results[label] = {
+            'delivered': delivered,
+            'supply_trips': sum(bot.supply_trips for bot in couriers),
+            'distance_per_item': sum(bot.distance_travelled for bot in couriers) / max(1, delivered),
+            'mean_latency': sum(latencies) / max(1, len(latencies)),
+            'p95_latency': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+        }
+
+    print(f"物资合并基准：{n_requests}个补给请求，平均间隔{mean_interval:.0f}秒，P0占比{p0_share:.0%}")
+    for label, r in results.items():
+        print(f"{label}：交付{r['delivered']}件，往返物资库{r['supply_trips']}次，"
+              f"每件行驶{r['distance_per_item']:.2f}米，平均交付耗时{r['mean_latency']:.0f}秒"
+              f"（P95 {r['p95_latency']:.0f}秒）")
+    return results
+
+def simulate_ward_shift(hours=8.0, op_interval=(300, 900), seed=0):
+    """
+    容量规划仿真：离散事件运行时驱动一个病区班次（虚拟时钟，不真实等待）
+    床头机器人每隔op_interval秒随机执行一次护理操作，由此触发的补给、消毒、样本传送按原调度逻辑执行
+    """
+    import random
+    rng = random.Random(seed)
+    runtime = SimulatedRuntime()
+    iani = IANI_Controller(runtime=runtime)
+    iani.verbose = False
+    for x, y in [(10, 9), (15, 9), (12, 7), (18, 7)]:
+        iani.add_obstacle(x, y)
+    bedside_bots = [BedsideRobot(f"A{i + 1}", 10 + 5 * i, 5) for i in range(3)]
+    logistics_bots = [LogisticsRobot(f"B{i + 1}", 5 + 5 * i, 10) for i in range(3)]
+    disinfect_bots = [DisinfectRobot("C1", 10, 8, (5, 12)), DisinfectRobot("C2", 15, 8, (12, 18)),
+                      DisinfectRobot("C3", 20, 8, (18, 25))]
+    for robot_type, bots in [('bedside', bedside_bots), ('logistics', logistics_bots), ('disinfect', disinfect_bots)]:
+        for bot in bots:
+            iani.register_robot(robot_type, bot)
+
+    def operate(bot):
+        # 周期护理操作（咽喉试纸消耗棉签，库存不足时自动请求补给）
+        bot.receive_task({'type': 'self_operate', 'priority': 'P1', 'target_pos': (bot.x, bot.y), 'sender': bot,
+                          'content': {'operation': rng.choice(['throat_swab', 'blood_draw', 'blood_pressure'])}})
+        runtime.schedule(rng.uniform(*op_interval), operate, bot)
+
+    for bot in bedside_bots:
+        runtime.schedule(rng.uniform(*op_interval), operate, bot)
+    start = time.perf_counter()
+    runtime.run(until=hours * 3600)
+    elapsed = time.perf_counter() - start
+
+    utilization = {}
+    for bot in bedside_bots + logistics_bots + disinfect_bots:
+        busy = sum((t['end_time'] - t['start_time']).total_seconds()
+                   for t in bot.task_history if t['status'] == 'completed')
+        utilization[bot.robot_id] = busy / (hours * 3600)
+    completed = sum(t['status'] == 'completed' for bot in bedside_bots + logistics_bots + disinfect_bots
+                    for t in bot.task_history)
+    metrics = iani.queue_metrics()
+    days_per_minute = (hours / 24) / (elapsed / 60) if elapsed else float('inf')
+    print(f"班次仿真：{hours}小时（至{runtime.now()}），事件{runtime.processed}个，完成任务{completed}个")
+    print("机器人利用率：" + "，".join(f"{rid} {u:.1%}" for rid, u in utilization.items()))
+    print(f"队列等待：" + "，".join(f"{p}平均{w['mean']:.1f}秒/最长{w['max']:.1f}秒"
+                                 for p, w in metrics['wait'].items() if w['count']))
+    print(f"墙钟耗时{elapsed:.2f}秒，约每分钟仿真{days_per_minute:.0f}天")
+    return {'events': runtime.processed, 'completed': completed, 'utilization': utilization,
+            'queue': metrics, 'wall_seconds': elapsed, 'simulated_days_per_minute': days_per_minute}
 
 # ------------------------------
 # 场景测试代码
@@ -350,8 +1512,8 @@ if __name__ == "__main__":
         'content': {'operation': 'throat_swab'}
     })
     
-    # 等待任务完成（实际环境中由控制器异步调度）
-    time.sleep(2)  # 模拟时间流逝
+    # 等待任务完成（由运行时异步调度）
+    iani.runtime.wait_idle()
     
     # 模拟场景3：A3突发止血带短缺
     print("\n====== 场景3：突发物资短缺 ======")
@@ -359,4 +1521,5 @@ if __name__ == "__main__":
     a3.supplies['tourniquet'] = 0  # 手动设置为0
     a3.request_supply('tourniquet', 5)  # 主动请求
     
-    time.sleep(3)  # 模拟时间流逝
\ No newline at end of file
+    iani.runtime.wait_idle()
+    iani.stop()
\ No newline at end of file
@@ -0,0 +1,95 @@
+# 离散事件仿真内核：IANIvic包（work1模块）与独立运行的IANIframe.py共用，仅依赖标准库
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import heapq
+import itertools
+from contextlib import contextmanager
+
+
+# 可注入时钟：各模块通过clock.now()取当前时间，默认系统时间，仿真时切换为虚拟时钟
+class Clock:
+    def __init__(self):
+        self.source = None  # 提供now()的时间源，None表示系统时间
+    
+    def now(self) -> datetime:
+        return self.source.now() if self.source is not None else datetime.now()
+    
+    def use(self, source=None):
+        # 切换时间源（传None恢复系统时间）
+        self.source = source
+    
+    @contextmanager
+    def using(self, source):
+        # 临时切换时间源，退出（含异常）时恢复之前的时间源
+        previous = self.source
+        self.source = source
+        try:
+            yield source
+        finally:
+            self.source = previous
+
+clock = Clock()
+
+# 离散事件仿真内核：虚拟时钟 + 事件堆（IANIframe.SimulatedRuntime亦基于此内核）
+# 事件按(触发时刻, 序号)顺序执行，同一时刻先登记先执行；时钟直接跳到下一事件，不做真实等待
+# 仅在step/run执行事件期间将全局clock切换为本仿真器，返回后恢复原时间源
+class EventSimulator:
+    def __init__(self, start: Optional[datetime] = None):
+        self.start = start if start else datetime(2024, 1, 1, 8, 0, 0)  # 仿真起点（默认早班8点）
+        self.time = 0.0  # 已仿真秒数
+        self.events = []  # 堆元素：[触发时刻, 序号, 回调, 参数]，回调为None表示已取消
+        self.counter = itertools.count()
+        self.processed = 0  # 已执行事件数
+    
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.time)
+    
+    def schedule(self, delay: float, callback: Callable, *args) -> list:
+        # 登记delay秒后执行的事件，返回可用于cancel的句柄
+        event = [self.time + max(0.0, delay), next(self.counter), callback, args]
+        heapq.heappush(self.events, event)
+        return event
+    
+    def cancel(self, event: list):
+        event[2] = None
+    
+    def every(self, interval: float, callback: Callable, *args, delay: float = 0.0) -> list:
+        # 周期事件（如通信节拍）；返回的句柄cancel后停止后续周期
+        handle = [None, None, callback, args]
+        def tick():
+            if handle[2] is None:
+                return
+            callback(*args)
+            if handle[2] is not None:
+                self.schedule(interval, tick)
+        self.schedule(delay, tick)
+        return handle
+    
+    def step(self) -> bool:
+        # 执行下一个事件（执行期间clock切换为虚拟时钟），无事件返回False
+        with clock.using(self):
+            return self._step()
+    
+    def _step(self) -> bool:
+        while self.events:
+            event_time, _, callback, args = heapq.heappop(self.events)
+            if callback is None:
+                continue
+            self.time = event_time
+            callback(*args)
+            self.processed += 1
+            return True
+        return False
+    
+    def run(self, until: Optional[float] = None) -> int:
+        # 运行至事件耗尽或仿真时刻until（秒），返回本次执行的事件数
+        processed = self.processed
+        with clock.using(self):
+            while self.events:
+                if until is not None and self.events[0][0] > until:
+                    break
+                if not self._step():
+                    break
+        if until is not None:
+            self.time = max(self.time, until)
+        return self.processed - processed
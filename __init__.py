@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import random
 from typing import List, Dict, Tuple, Optional, Set, Any
 import json
+from collections import defaultdict
 
 # 任务优先级枚举
 class TaskPriority:
@@ -17,6 +18,10 @@ class RobotType:
     T_CELL = "T-Cell Bot"  # 快响应机器人
     B_CELL = "B-Cell Bot"  # 可容错机器人
 
+# 可注入时钟与离散事件仿真内核（与IANIframe.py共用）
+from .SimKernel import Clock, clock, EventSimulator
+
+
 # 任务类
 class Task:
     def __init__(self, task_id: str, description: str, priority: TaskPriority, 
@@ -59,7 +64,7 @@ class Robot:
         self.battery_level = 100.0  # 百分比
         self.status = "idle"  # idle, busy, charging, error
         self.communication_quality = 1.0  # 1.0表示最佳
-        self.last_comm_time = datetime.now()
+        self.last_comm_time = clock.now()
         self.path = []  # 当前规划路径
     
     def update_position(self, new_position: Tuple[float, float]):
@@ -184,4 +189,126 @@ class LLMInterface:
             "status": "moving" if last_seen < 30 else "possibly_stuck",
             "estimated_battery": max(0, robot.battery_level - last_seen * 0.01)
         }
-#_all_=["TaskPriority","RobotType","Task","Robot","HospitalEnv","LLMInterface"]
\ No newline at end of file
+# 任务历史存储：定长列式环形缓冲区 + 滚动聚合统计
+class TaskHistoryStore:
+    OUTCOME_FAILED = 0
+    OUTCOME_COMPLETED = 1
+    
+    def __init__(self, capacity: int = 4096, spill_path: Optional[str] = None):
+        self.capacity = capacity
+        self.spill_path = spill_path  # 被覆盖的旧记录追加写入该文件（JSON Lines），为None时直接丢弃
+        self._spill_file = None
+        # 列式环形缓冲区
+        self.task_ids = np.empty(capacity, dtype=object)
+        self.task_types = np.zeros(capacity, dtype=np.int32)
+        self.robots = np.zeros(capacity, dtype=np.int32)
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.outcomes = np.zeros(capacity, dtype=np.int8)
+        self.end_times = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # 下一条写入位置
+        self.count = 0
+        # 字符串驻留表：名称 <-> 编号
+        self.type_names, self.type_codes = [], {}
+        self.robot_names, self.robot_codes = [], {}
+        # 窗口内的滚动聚合：编号 -> [记录数, 成功数, 总耗时]
+        self.robot_stats = defaultdict(lambda: [0, 0, 0.0])
+        self.type_stats = defaultdict(lambda: [0, 0, 0.0])
+    
+    def _intern(self, name: str, names: List[str], codes: Dict[str, int]) -> int:
+        if name not in codes:
+            codes[name] = len(names)
+            names.append(name)
+        return codes[name]
+    
+    def append(self, task_id: str, task_type: str, robot_id: Optional[str], duration: float,
+               completed: bool, end_time: Optional[datetime] = None):
+        # 写入一条记录，缓冲区满时覆盖最旧记录并从聚合中扣除
+        slot = self.head
+        if self.count == self.capacity:
+            self._evict(slot)
+        else:
+            self.count += 1
+        type_code = self._intern(task_type, self.type_names, self.type_codes)
+        robot_code = self._intern(robot_id or "", self.robot_names, self.robot_codes)
+        outcome = self.OUTCOME_COMPLETED if completed else self.OUTCOME_FAILED
+        self.task_ids[slot] = task_id
+        self.task_types[slot] = type_code
+        self.robots[slot] = robot_code
+        self.durations[slot] = duration
+        self.outcomes[slot] = outcome
+        self.end_times[slot] = (end_time or clock.now()).timestamp()
+        for stats in (self.robot_stats[robot_code], self.type_stats[type_code]):
+            stats[0] += 1
+            stats[1] += outcome
+            stats[2] += duration
+        self.head = (slot + 1) % self.capacity
+    
+    def append_task(self, task: Task, task_type: str):
+        # 从Task对象写入一条完成/失败记录
+        duration = (task.end_time - task.start_time).total_seconds() if task.start_time and task.end_time else 0.0
+        self.append(task.task_id, task_type, task.assigned_robot, duration,
+                    task.status == "completed", task.end_time)
+    
+    def _evict(self, slot: int):
+        # 旧记录离开窗口：扣除聚合，按需落盘
+        record = self._record(slot)
+        for stats in (self.robot_stats[int(self.robots[slot])], self.type_stats[int(self.task_types[slot])]):
+            stats[0] -= 1
+            stats[1] -= int(self.outcomes[slot])
+            stats[2] -= float(self.durations[slot])
+        if self.spill_path:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+            self._spill_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def _record(self, slot: int) -> Dict:
+        return {
+            "task_id": self.task_ids[slot],
+            "task_type": self.type_names[self.task_types[slot]],
+            "robot_id": self.robot_names[self.robots[slot]] or None,
+            "duration": float(self.durations[slot]),
+            "status": "completed" if self.outcomes[slot] == self.OUTCOME_COMPLETED else "failed",
+            "end_time": float(self.end_times[slot])
+        }
+    
+    def _summary(self, stats: List) -> Dict:
+        count, succeeded, total_duration = stats
+        return {
+            "count": count,
+            "success_rate": succeeded / count if count else 0.0,
+            "mean_duration": total_duration / count if count else 0.0
+        }
+    
+    def robot_summary(self, robot_id: str) -> Dict:
+        # 某机器人在窗口内的统计（O(1)）
+        code = self.robot_codes.get(robot_id)
+        return self._summary(self.robot_stats[code] if code is not None else [0, 0, 0.0])
+    
+    def task_type_summary(self, task_type: str) -> Dict:
+        # 某任务类型在窗口内的统计（O(1)）
+        code = self.type_codes.get(task_type)
+        return self._summary(self.type_stats[code] if code is not None else [0, 0, 0.0])
+    
+    def recent(self, n: int) -> List[Dict]:
+        # 最近n条记录（从旧到新）
+        n = min(n, self.count)
+        return [self._record((self.head - n + i) % self.capacity) for i in range(n)]
+    
+    def flush(self):
+        if self._spill_file is not None:
+            self._spill_file.flush()
+    
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def __len__(self):
+        return self.count
+#_all_=["TaskPriority","RobotType","Clock","clock","EventSimulator","Task","Robot","HospitalEnv","LLMInterface","TaskHistoryStore"]
\ No newline at end of file
@@ -3,9 +3,9 @@ from datetime import datetime
 
 # 假设已导入前文定义的所有类（Robot, BedsideRobot等）
 
-def main():
-    # 1. 初始化IANI控制器
-    iani_controller = IANI_Controller()
+def main(runtime=None):
+    # 1. 初始化IANI控制器（传入SimulatedRuntime时以虚拟时钟运行）
+    iani_controller = IANI_Controller(runtime=runtime)
     
     # 2. 添加环境障碍物（坐标参考定量化场景）
     obstacles = [(10,9), (15,9), (12,7), (18,7)]
@@ -56,14 +56,14 @@ def main():
         'target_pos': (10, 5),
         'sender': a1
     })
-    time.sleep(2)  # 模拟任务执行时间
+    iani_controller.runtime.wait_idle()  # 等待任务执行完毕
 
     # 场景2：A3突发止血带短缺（P0优先级）
     print("\n【场景2】A3突发止血带短缺")
     a3 = bedside_bots[2]
     a3.supplies['tourniquet'] = 0  # 手动清空库存
-    a3.request_supply('tourniquet', 5)  # 发送紧急请求
-    time.sleep(3)  # 模拟任务执行时间
+    a3.request_supply('tourniquet', 5, priority='P0')  # 发送紧急请求
+    iani_controller.runtime.wait_idle()  # 等待任务执行完毕
 
     # 场景3：A2完成5次作业后请求样本传送
     print("\n【场景3】A2请求样本传送")
@@ -77,7 +77,7 @@ def main():
         'target_pos': (15, 5),
         'sender': a2
     })
-    time.sleep(3)  # 模拟任务执行时间
+    iani_controller.runtime.wait_idle()  # 等待任务执行完毕
 
     # 5. 输出任务执行结果
     print("\n====== 任务执行结果 ======")
@@ -88,5 +88,7 @@ def main():
             end = task['end_time'].strftime("%H:%M:%S") if 'end_time' in task else "未完成"
             print(f"- 任务类型：{task['task']['type']}，状态：{task['status']}，时间：{start}->{end}")
 
+    iani_controller.stop()  # 关闭机器人运行时（写入最终能力矩阵快照）
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
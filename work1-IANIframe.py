@@ -1,6 +1,6 @@
-from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface
+from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface,EventSimulator,clock
 class IANIFramework:
-    def __init__(self, env: HospitalEnv):
+    def __init__(self, env: HospitalEnv, telemetry: Optional[TelemetryLog] = None):
         self.llm = LLMInterface()
         #大模型接口
         self.data_module = DataTransmissionModule(self.llm)
@@ -15,11 +15,14 @@ class IANIFramework:
         #医院环境实例（保存医院环境信息）
         self.robots = []
         #管理机器人的列表 后面通过add_robot添加到系统
-        self.current_time = datetime.now()
+        self.current_time = clock.now()
         #当前时间  用于处理任务超时，状态更新等情况
+        self.telemetry = telemetry
+        #遥测日志（可选）：记录每步的机器人状态、任务状态、状态包、调度与动作结果；close()时随框架关闭
     def add_robot(self, robot: Robot):
         # 添加机器人到系统
         self.robots.append(robot)
+        self.scheduling_module.eligibility_index.add_robot(robot)
     
     def process_human_command(self, command: str, context: Dict = None) -> Dict:
         # 处理人类指令
@@ -48,7 +51,7 @@ class IANIFramework:
         # 记录交互历史（方便追溯，提高可解释性）
         #将时间戳，总指令，指令分解，任务编号 记录到列表中
         self.hri_module.interaction_history.append({
-            "timestamp": datetime.now(), 
+            "timestamp": clock.now(), 
             "command": command,
             "parsed": parsed_command,
             "task_id": task_id
@@ -65,7 +68,7 @@ class IANIFramework:
     def step(self, human_positions: Dict[str, Tuple[float, float]] = None) -> Dict:
         # 系统运行一步
         #初始化当前时间和人类位置
-        self.current_time = datetime.now()
+        self.current_time = clock.now()
         human_positions = human_positions if human_positions else {}
         
         # 更新环境状态   关注人类流动情况
@@ -74,12 +77,8 @@ class IANIFramework:
         # 调整通信策略
         self.data_module.adjust_communication_strategy(self.env)
         
-        # 检查机器人连接状态
-        #处理失联机器人
-        for robot in self.robots:
-            if not self.data_module.check_robot_connection(robot, self.current_time):
-                # 处理失联机器人
-                self.data_module.handle_disconnected_robot(robot, self.robots, self.current_time)
+        # 检查机器人连接状态（全队一次判定），处理失联机器人
+        self.data_module.handle_disconnections(self.robots, self.current_time)
         
         # 调度任务
         scheduling_results = self.scheduling_module.schedule_tasks(self.robots, self.env)
@@ -130,6 +129,8 @@ class IANIFramework:
                         # 消耗电池
                         distance = self.path_module._distance(robot.position, next_pos)
                         robot.update_battery(distance * 0.5)  # 每单位距离消耗0.5%电池
+                        # 电量变化：刷新该机器人的招募资格索引行（任务开始/完成由调度模块刷新）
+                        self.scheduling_module.eligibility_index.update(robot)
                         
                         # 发送状态更新
                         #不同类型传输内容不同
@@ -181,8 +182,11 @@ class IANIFramework:
                         }
                         self.scheduling_module.process_task_feedback(robot.robot_id, feedback)
         
-        # 返回本步结果
-        return {
+        # 上行链路以二进制批次发送本步写入通道的状态消息，中央端接收后重建状态缓存
+        received = self.data_module.receive_uplink(self.data_module.encode_uplink(self.current_time))
+        
+        # 本步结果（启用遥测日志时一并记录）
+        result = {
             "timestamp": self.current_time,
             "scheduling_results": scheduling_results,
             "path_updates": path_updates,
@@ -190,6 +194,22 @@ class IANIFramework:
             "robot_statuses": [r.to_dict() for r in self.robots],
             "task_statuses": [t.to_dict() for t in self.scheduling_module.tasks.values()]
         }
+        if self.telemetry is not None:
+            self.telemetry.record_step(result, received)
+        return result
+    
+    def close(self):
+        # 关闭时释放持有的文件（任务历史溢出文件）；遥测日志由框架接管，一并写入缓冲记录并关闭
+        self.scheduling_module.task_history.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+    
+    def schedule_ticks(self, simulator: EventSimulator, interval: float = 1.0,
+                       human_positions: Dict[str, Tuple[float, float]] = None) -> list:
+        # 离散事件仿真：以周期事件（通信节拍）驱动step，返回可取消的周期句柄
+        # 虚拟时钟只在仿真器执行事件期间生效，不改动全局时间源
+        self.current_time = simulator.now()
+        return simulator.every(interval, self.step, human_positions)
     
     def get_system_status(self) -> Dict:
         # 获取系统状态
@@ -200,6 +220,9 @@ class IANIFramework:
             "completed_tasks": sum(1 for t in self.scheduling_module.tasks.values() if t.status == "completed"),
             "pending_tasks": sum(1 for t in self.scheduling_module.tasks.values() if t.status == "pending"),
             "robot_statuses": [r.to_dict() for r in self.robots],
+            # 中央端缓存的最近上报状态（已过期为None）
+            "reported_statuses": self.data_module.get_many([r.robot_id for r in self.robots], self.current_time),
+            "status_cache": self.data_module.bot_status_cache.stats(),
             "communication_status": self.env.communication_status,
             "human_positions": getattr(self.hri_module, 'human_positions', {})
         }
\ No newline at end of file
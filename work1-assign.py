@@ -1,18 +1,172 @@
-from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface
+from collections import deque
+from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface,clock,TaskHistoryStore
+
+#机器人招募资格索引：按能力、状态、类型、电量档位维护布尔列
+#状态变化时逐行更新，招募时只做几次向量化掩码求交，再对幸存者排序
+class RobotEligibilityIndex:
+    STATUS_CODES = {"idle": 0, "busy": 1, "charging": 2, "error": 3}
+    BATTERY_BANDS = [30.0, 60.0]  # 电量档位分界：0档<30%，1档30-60%，2档>=60%
+    
+    def __init__(self, t_timeout: float = 5.0, b_timeout: float = 15.0, capacity: int = 16):
+        self.t_timeout = t_timeout  # 与check_robot_connection一致的超时阈值
+        self.b_timeout = b_timeout
+        self.robots = []  # 行号 -> 机器人实例
+        self.slots = {}  # robot_id -> 行号
+        self.capability_masks = {}  # 能力 -> bool列
+        self.status_codes = np.full(capacity, -1, dtype=np.int8)
+        self.is_t_cell = np.zeros(capacity, dtype=bool)
+        self.battery_band = np.zeros(capacity, dtype=np.int8)
+        self.last_comm = np.zeros(capacity)  # 最后通信时间（POSIX秒）
+    
+    def _grow(self):
+        # 容量翻倍（摊还O(1)）
+        capacity = len(self.status_codes) * 2
+        def grown(column, fill):
+            new_column = np.full(capacity, fill, dtype=column.dtype)
+            new_column[:len(column)] = column
+            return new_column
+        self.status_codes = grown(self.status_codes, -1)
+        self.is_t_cell = grown(self.is_t_cell, False)
+        self.battery_band = grown(self.battery_band, 0)
+        self.last_comm = grown(self.last_comm, 0.0)
+        for capability, mask in self.capability_masks.items():
+            self.capability_masks[capability] = grown(mask, False)
+    
+    def add_robot(self, robot: Robot):
+        # 登记机器人并写入各列；同ID的新实例替换原实例（能力列重写）
+        slot = self.slots.get(robot.robot_id)
+        if slot is not None and self.robots[slot] is robot:
+            self.update(robot)
+            return
+        if slot is None:
+            if len(self.robots) == len(self.status_codes):
+                self._grow()
+            slot = len(self.robots)
+            self.robots.append(robot)
+            self.slots[robot.robot_id] = slot
+        else:
+            self.robots[slot] = robot
+            for mask in self.capability_masks.values():
+                mask[slot] = False
+        for capability in robot.capabilities:
+            if capability not in self.capability_masks:
+                self.capability_masks[capability] = np.zeros(len(self.status_codes), dtype=bool)
+            self.capability_masks[capability][slot] = True
+        self.is_t_cell[slot] = robot.robot_type == RobotType.T_CELL
+        self.update(robot)
+    
+    def update(self, robot: Robot):
+        # 状态迁移时刷新该机器人的一行（状态、电量档位、通信时间）
+        slot = self.slots.get(robot.robot_id)
+        if slot is None:
+            self.add_robot(robot)
+            return
+        self.status_codes[slot] = self.STATUS_CODES.get(robot.status, -1)
+        self.battery_band[slot] = np.searchsorted(self.BATTERY_BANDS, robot.battery_level, side="right")
+        self.last_comm[slot] = robot.last_comm_time.timestamp()
+    
+    def sync(self, robots: List[Robot]):
+        # 按robot_id同步候选机器人（未登记的登记，实例变化的替换）
+        for robot in robots:
+            slot = self.slots.get(robot.robot_id)
+            if slot is None or self.robots[slot] is not robot:
+                self.add_robot(robot)
+    
+    def query(self, capability: Optional[str], current_time: datetime, min_battery_band: int = 1,
+              statuses: Tuple[str, ...] = ("idle", "error"), candidates: Optional[List[Robot]] = None) -> List[Robot]:
+        # 掩码求交：状态匹配（默认空闲/错误） ∧ 具备能力 ∧ 电量达标 ∧ 通信未超时 [∧ 属于候选机器人]
+        n = len(self.robots)
+        mask = np.isin(self.status_codes[:n], [self.STATUS_CODES[s] for s in statuses])
+        if candidates is not None:
+            members = np.zeros(n, dtype=bool)
+            members[[self.slots[r.robot_id] for r in candidates if r.robot_id in self.slots]] = True
+            mask &= members
+        if capability is not None:
+            if capability not in self.capability_masks:
+                return []
+            mask &= self.capability_masks[capability][:n]
+        mask &= self.battery_band[:n] >= min_battery_band
+        timeouts = np.where(self.is_t_cell[:n], self.t_timeout, self.b_timeout)
+        mask &= (current_time.timestamp() - self.last_comm[:n]) < timeouts
+        return [self.robots[i] for i in np.flatnonzero(mask)]
+
+
 class TaskSchedulingModule:
-    def __init__(self, llm: LLMInterface, data_module: DataTransmissionModule):
+    # 任务类型 -> 所需能力
+    REQUIRED_CAPABILITY = {
+        "disinfection": "消毒",
+        "patient_care": "护理",
+        "emergency": "急救"
+    }
+    DURATION_UNIT = 60.0  # estimated_duration的单位（秒）：LLM估计的任务时长以分钟计
+    
+    def __init__(self, llm: LLMInterface, data_module: DataTransmissionModule, lookahead: bool = False):
         self.llm = llm
         self.data_module = data_module
         self.tasks = {}  # task_id: Task
         self.task_dag = nx.DiGraph()
-        self.task_history = []  # 历史任务执行记录
+        self.task_history = TaskHistoryStore()  # 历史任务执行记录（定长环形缓冲区）
         self.robot_expertise = {}  # robot_id: 擅长的任务类型
+        self.eligibility_index = RobotEligibilityIndex()  # 招募资格索引
+        self.lookahead = lookahead  # 关键路径前瞻调度：就绪任务中优先分配零松弛任务
+        self.task_timing = {}  # task_id: {"es","ef","ls","lf","slack"}（相对当前时刻的剩余工作量）
+        self.makespan_estimate = 0.0  # 剩余总工期估计
+        # 紧急任务抢占：无空闲机器人时中断代价最小的B类机器人的常规任务
+        self.preemption_work_weight = 1.0  # 代价 = 距离 + 权重 × 被中断任务剩余工作量
+        self.critical_submit_times = {}  # 待分配紧急任务的提交时间，用于统计派发延迟
+        self.preemption_log = deque(maxlen=256)  # 最近的抢占事件
+        self.preemption_stats = {
+            "preemptions": 0,
+            "critical_dispatches": 0,
+            "total_critical_latency": 0.0,
+            "max_critical_latency": 0.0
+        }
     
     def add_task(self, task: Task):
         # 添加新任务
         self.tasks[task.task_id] = task
         # 更新任务依赖图
         self.task_dag = self.llm.generate_task_dag(list(self.tasks.values()))
+        # 增量更新关键路径
+        self._update_critical_path([task.task_id])
+        if task.priority == TaskPriority.CRITICAL:
+            self.critical_submit_times[task.task_id] = clock.now()
+    
+    def _remaining_duration(self, task_id: str) -> float:
+        # 已完成任务不再占用工期
+        task = self.tasks.get(task_id)
+        if task is None or task.status == "completed":
+            return 0.0
+        return task.estimated_duration
+    
+    def _update_critical_path(self, changed_ids: List[str]):
+        # 正向传播：只重算变化节点及其后继的最早开始/完成时间
+        affected = set(changed_ids)
+        for task_id in changed_ids:
+            affected |= nx.descendants(self.task_dag, task_id)
+        for task_id in nx.topological_sort(self.task_dag.subgraph(affected)):
+            es = max((self.task_timing[p]["ef"] for p in self.task_dag.predecessors(task_id)
+                      if p in self.task_timing), default=0.0)
+            timing = self.task_timing.setdefault(task_id, {"ls": 0.0, "lf": 0.0, "slack": 0.0})
+            timing["es"] = es
+            timing["ef"] = es + self._remaining_duration(task_id)
+        
+        # 反向传播：总工期变化时全图重算，否则只重算受影响节点及变化节点的前驱
+        makespan = max((t["ef"] for t in self.task_timing.values()), default=0.0)
+        if makespan != self.makespan_estimate:
+            self.makespan_estimate = makespan
+            backward = set(self.task_timing)
+        else:
+            backward = set(affected)
+            for task_id in changed_ids:
+                backward |= nx.ancestors(self.task_dag, task_id)
+            backward &= set(self.task_timing)
+        for task_id in reversed(list(nx.topological_sort(self.task_dag.subgraph(backward)))):
+            timing = self.task_timing[task_id]
+            timing["lf"] = min((self.task_timing[s]["ls"] for s in self.task_dag.successors(task_id)
+                                if s in self.task_timing), default=self.makespan_estimate)
+            timing["ls"] = timing["lf"] - self._remaining_duration(task_id)
+            timing["slack"] = timing["ls"] - timing["es"]
     
     def parse_and_create_task(self, natural_language: str, task_id: str, 
                              location: Tuple[float, float], dependencies: List[str] = None) -> Task:
@@ -31,32 +185,13 @@ class TaskSchedulingModule:
     
     def recruit_robots(self, task: Task, robots: List[Robot], env: HospitalEnv) -> List[Robot]:
         # 招募适合的机器人（AgentVerse的动态专家招募机制）
-        suitable_robots = []
+        # 按robot_id同步资格索引（正常由add_robot登记，状态迁移时逐行更新）
+        self.eligibility_index.sync(robots)
         
-        # 根据任务类型和优先级筛选
-        for robot in robots:
-            # 检查机器人是否空闲
-            if robot.status != "idle" and robot.status != "error":
-                continue
-                
-            # 检查机器人能力是否匹配任务需求
-            task_type = self.llm.parse_task_description(task.description)["task_type"]
-            if task_type == "disinfection" and "消毒" not in robot.capabilities:
-                continue
-            if task_type == "patient_care" and "护理" not in robot.capabilities:
-                continue
-            if task_type == "emergency" and "急救" not in robot.capabilities:
-                continue
-                
-            # 检查电池是否充足
-            if robot.battery_level < 30:  # 电池低于30%不分配新任务
-                continue
-                
-            # 检查通信状态
-            if not self.data_module.check_robot_connection(robot, datetime.now()):
-                continue
-                
-            suitable_robots.append(robot)
+        # 通过资格索引一次性筛选：状态、能力、电量（低于30%不分配新任务）、通信状态，只在传入的机器人中选
+        task_type = self.llm.parse_task_description(task.description)["task_type"]
+        suitable_robots = self.eligibility_index.query(self.REQUIRED_CAPABILITY.get(task_type), clock.now(),
+                                                       candidates=robots)
         
         # 根据任务优先级和机器人类型排序
         if task.priority in [TaskPriority.CRITICAL, TaskPriority.HIGH]:
@@ -82,6 +217,13 @@ class TaskSchedulingModule:
         # 招募适合的机器人
         suitable_robots = self.recruit_robots(task, robots, env)
         
+        # 紧急任务无空闲机器人时，抢占代价最小的B类机器人
+        if not suitable_robots and task.priority == TaskPriority.CRITICAL:
+            victim = self._select_preemption_victim(task)
+            if victim:
+                self._preempt(victim, task)
+                suitable_robots = [victim]
+        
         if not suitable_robots:
             return False  # 没有合适的机器人
         
@@ -91,10 +233,11 @@ class TaskSchedulingModule:
         # 分配任务
         task.assigned_robot = best_robot.robot_id
         task.status = "assigned"
-        task.start_time = datetime.now()
+        task.start_time = clock.now()
         
         best_robot.current_task = task
         best_robot.status = "busy"
+        self.eligibility_index.update(best_robot)
         
         # 更新机器人专长记录
         task_type = self.llm.parse_task_description(task.description)["task_type"]
@@ -104,8 +247,79 @@ class TaskSchedulingModule:
             self.robot_expertise[best_robot.robot_id][task_type] = 0
         self.robot_expertise[best_robot.robot_id][task_type] += 1
         
+        # 统计紧急任务派发延迟
+        submit_time = self.critical_submit_times.pop(task.task_id, None)
+        if submit_time:
+            latency = (task.start_time - submit_time).total_seconds()
+            self.preemption_stats["critical_dispatches"] += 1
+            self.preemption_stats["total_critical_latency"] += latency
+            self.preemption_stats["max_critical_latency"] = max(self.preemption_stats["max_critical_latency"], latency)
+        
         return True
     
+    def _select_preemption_victim(self, task: Task) -> Optional[Robot]:
+        # 在忙碌的B类机器人中选出中断代价最小者（仅中断非紧急任务）
+        task_type = self.llm.parse_task_description(task.description)["task_type"]
+        busy_robots = self.eligibility_index.query(self.REQUIRED_CAPABILITY.get(task_type), clock.now(),
+                                                   statuses=("busy",))
+        best_robot, best_cost = None, float("inf")
+        for robot in busy_robots:
+            running = robot.current_task
+            if robot.robot_type != RobotType.B_CELL or running is None or running.priority >= TaskPriority.CRITICAL:
+                continue
+            remaining = running.estimated_duration * (1 - self._task_progress(running, clock.now()) / 100)
+            cost = self._distance(robot.position, task.location) + self.preemption_work_weight * remaining
+            if cost < best_cost:
+                best_robot, best_cost = robot, cost
+        return best_robot
+    
+    def _task_progress(self, task: Task, now: datetime) -> float:
+        # 按开始时间到现在的已执行时长估算进度（百分比）
+        if task.start_time is None or task.estimated_duration <= 0:
+            return 0.0
+        elapsed = (now - task.start_time).total_seconds() / self.DURATION_UNIT
+        return min(100.0, 100 * elapsed / task.estimated_duration)
+    
+    def _preempt(self, robot: Robot, task: Task):
+        # 中断机器人当前任务：保存检查点并放回待分配队列
+        interrupted = robot.current_task
+        now = clock.now()
+        interrupted.checkpoint = {
+            "robot_id": robot.robot_id,
+            "progress": self._task_progress(interrupted, now),
+            "position": robot.position,
+            "preempted_at": now
+        }
+        interrupted.status = "pending"
+        interrupted.assigned_robot = None
+        interrupted.start_time = None
+        
+        robot.current_task = None
+        robot.path = [robot.position]  # 停在原地（路径冲突检测按非空路径比较）
+        robot.status = "idle"
+        self.eligibility_index.update(robot)
+        
+        self.preemption_stats["preemptions"] += 1
+        self.preemption_log.append({
+            "time": now,
+            "robot_id": robot.robot_id,
+            "preempted_task_id": interrupted.task_id,
+            "critical_task_id": task.task_id,
+            "distance": self._distance(robot.position, task.location)
+        })
+    
+    def get_preemption_metrics(self) -> Dict:
+        # 抢占与紧急任务派发延迟指标
+        dispatches = self.preemption_stats["critical_dispatches"]
+        return {
+            "preemptions": self.preemption_stats["preemptions"],
+            "critical_dispatches": dispatches,
+            "mean_critical_latency": self.preemption_stats["total_critical_latency"] / dispatches if dispatches else 0.0,
+            "max_critical_latency": self.preemption_stats["max_critical_latency"],
+            "pending_critical": len(self.critical_submit_times),
+            "recent_preemptions": list(self.preemption_log)
+        }
+    
     def process_task_feedback(self, robot_id: str, feedback: Dict):
         # 处理任务反馈并更新系统状态
         task_id = feedback.get("task_id")
@@ -117,18 +331,20 @@ class TaskSchedulingModule:
         
         if status == "completed":
             task.status = "completed"
-            task.end_time = datetime.now()
-            self.task_history.append(task.to_dict())
+            task.end_time = clock.now()
+            self._update_critical_path([task_id])
+            self.task_history.append_task(task, self.llm.parse_task_description(task.description)["task_type"])
             
             # 更新机器人状态
             for robot in [r for r in feedback.get("robots", []) if r.robot_id == robot_id]:
                 robot.current_task = None
                 robot.status = "idle"
+                self.eligibility_index.update(robot)
                 
         elif status == "failed":
             task.status = "failed"
-            task.end_time = datetime.now()
-            self.task_history.append(task.to_dict())
+            task.end_time = clock.now()
+            self.task_history.append_task(task, self.llm.parse_task_description(task.description)["task_type"])
             
             # 记录失败原因，用于未来调度优化
             failure_reason = feedback.get("reason", "")
@@ -137,6 +353,7 @@ class TaskSchedulingModule:
             for robot in [r for r in feedback.get("robots", []) if r.robot_id == robot_id]:
                 robot.current_task = None
                 robot.status = "idle" if feedback.get("recoverable", True) else "error"
+                self.eligibility_index.update(robot)
                 
             # 重新分配失败的任务
             task.status = "pending"
@@ -151,6 +368,7 @@ class TaskSchedulingModule:
     def schedule_tasks(self, robots: List[Robot], env: HospitalEnv) -> List[Dict]:
         # 调度所有任务
         results = []
+        ready_tasks = []
         
         # 先处理有依赖的任务
         for task_id in nx.topological_sort(self.task_dag):
@@ -168,14 +386,25 @@ class TaskSchedulingModule:
             
             if not dependencies_met:
                 continue
-                
+            
+            ready_tasks.append(task)
+        
+        # 前瞻模式：紧急任务优先，其余按关键路径松弛从小到大（零松弛任务优先）
+        if self.lookahead:
+            ready_tasks.sort(key=lambda t: (
+                t.priority != TaskPriority.CRITICAL,
+                self.task_timing[t.task_id]["slack"],
+                -t.priority
+            ))
+        
+        for task in ready_tasks:
             # 尝试分配任务
             success = self.assign_task(task, robots, env)
             results.append({
                 "task_id": task.task_id,
                 "assigned": success,
                 "robot_id": task.assigned_robot,
-                "time": datetime.now()
+                "time": clock.now()
             })
             
         return results
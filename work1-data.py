@@ -1,10 +1,1365 @@
-from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface
+import asyncio
+import mmap
+import os
+import socket
+import struct
+import time
+from collections import deque
+from typing import Iterator
+from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface,clock
+# 定长环形通道：消息按递增序号写入定长槽位，各消费者持有自己的读游标
+# 所有消费者都已读过的槽位即被释放，通道内存与运行时长无关
+# 丢弃策略：
+#   "never"    —— 不丢消息：最慢消费者未读的消息不会被覆盖，通道满时拒绝写入（背压，put返回False）
+#   "coalesce" —— 按键合并：每个键（机器人）只保留最新一条未读消息，通道满时覆盖最旧消息
+class RingChannel:
+    POLICIES = ("never", "coalesce")
+    
+    def __init__(self, capacity: int = 1024, drop_policy: str = "never"):
+        if drop_policy not in self.POLICIES:
+            raise ValueError(f"未知丢弃策略: {drop_policy}")
+        self.capacity = capacity
+        self.drop_policy = drop_policy
+        self.slots: List[Optional[Tuple[Any, Dict]]] = [None] * capacity  # (键, 消息)，None为空槽或已合并
+        self.head = 0  # 下一条消息的序号
+        self.tail = 0  # 最旧未释放槽位的序号
+        self.cursors: Dict[str, int] = {}  # 消费者 -> 下一条待读序号
+        self.latest: Dict[Any, int] = {}  # 键 -> 该键最新消息的序号（合并用）
+        self.occupancy = 0  # 通道内有效消息数
+        self.published = 0  # 写入成功数
+        self.coalesced = 0  # 被同键新消息替换的未读消息数
+        self.dropped = 0  # 通道满时被覆盖的未读消息数
+        self.rejected = 0  # 通道满时被拒绝的写入数（背压）
+    
+    def subscribe(self, consumer: str):
+        # 注册消费者，从当前最新位置开始读
+        self.cursors.setdefault(consumer, self.head)
+    
+    def unsubscribe(self, consumer: str):
+        self.cursors.pop(consumer, None)
+        self._release()
+    
+    def _clear(self, seq: int):
+        slot = seq % self.capacity
+        entry = self.slots[slot]
+        if entry is None:
+            return False
+        key = entry[0]
+        if key is not None and self.latest.get(key) == seq:
+            del self.latest[key]
+        self.slots[slot] = None
+        self.occupancy -= 1
+        return True
+    
+    def _release(self):
+        # 释放所有消费者都已读过的槽位（无消费者时消息无人接收，直接释放）
+        floor = min(self.cursors.values()) if self.cursors else self.head
+        while self.tail < floor:
+            self._clear(self.tail)
+            self.tail += 1
+    
+    def put(self, message: Dict, key: Any = None) -> bool:
+        # 写入一条消息，按丢弃策略处理满通道，返回是否写入
+        if key is not None and self.drop_policy == "coalesce":
+            previous = self.latest.get(key)
+            # 同键旧消息尚无消费者读过：原位替换，不占用新槽位
+            if previous is not None and previous >= max(self.cursors.values(), default=self.head):
+                self.slots[previous % self.capacity] = (key, message)
+                self.coalesced += 1
+                self.published += 1
+                return True
+        if self.head - self.tail == self.capacity:
+            self._release()
+        if self.head - self.tail == self.capacity:
+            if self.drop_policy == "never":
+                self.rejected += 1
+                return False
+            # 覆盖最旧消息，落后的消费者游标随之前移
+            if self._clear(self.tail):
+                self.dropped += 1
+            self.tail += 1
+            for consumer, cursor in self.cursors.items():
+                if cursor < self.tail:
+                    self.cursors[consumer] = self.tail
+        if key is not None and self.drop_policy == "coalesce":
+            previous = self.latest.get(key)
+            if previous is not None and self._clear(previous):
+                self.coalesced += 1
+            self.latest[key] = self.head
+        self.slots[self.head % self.capacity] = (key, message)
+        self.head += 1
+        self.occupancy += 1
+        self.published += 1
+        return True
+    
+    def read(self, consumer: str, max_items: Optional[int] = None) -> List[Dict]:
+        # 按序读取消费者未读的消息并推进其游标
+        cursor = self.cursors[consumer]
+        messages = []
+        while cursor < self.head and (max_items is None or len(messages) < max_items):
+            entry = self.slots[cursor % self.capacity]
+            cursor += 1
+            if entry is not None:
+                messages.append(entry[1])
+        self.cursors[consumer] = cursor
+        self._release()
+        return messages
+    
+    def lag(self, consumer: str) -> int:
+        # 消费者落后的序号数（含已合并的空槽）
+        return self.head - self.cursors[consumer]
+    
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "occupancy": self.occupancy,
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "max_lag": max((self.lag(c) for c in self.cursors), default=0)
+        }
+    
+    def __len__(self):
+        return self.occupancy
+
+# 状态包二进制编码（模式版本VERSION）：定宽struct字段，字符串（机器人ID、任务ID、状态、错误、传感器名）驻留为uint16编号
+# 批量格式：批头(版本, 新增字符串数, 包数) + 新增字符串(uint16长度 + UTF-8) + 逐个状态包
+# 新增字符串随所在批次下发，解码端按相同顺序驻留，两端编号一致；编码与解码两端各用一个实例
+# 包类型：T类完整状态、B类完整状态、增量（相对基线的变化字段，见DeltaEncoder）
+# 精度：坐标与进度为float32，电量保留0.1%，时间戳为float64秒（增量包为相对基线的毫秒数）
+# 增量包中与同名状态字段取值相同的传感器（如battery、position）以FIELD_REF引用编码，接收端取重建后的字段值
+class StatusCodec:
+    VERSION = 2
+    KIND_T, KIND_B, KIND_DELTA = 1, 2, 3
+    NONE = 0xFFFF  # 空值编号
+    BATCH = struct.Struct("<BHI")  # 版本, 新增字符串数, 包数
+    HEADER = struct.Struct("<BHHdff")  # 包类型, 机器人, 序号, 时间戳, x, y
+    T_BODY = struct.Struct("<HHfBB")  # 电量×10, 任务, 进度, 优先级, 错误数
+    B_BODY = struct.Struct("<HHHHB")  # 电量×10, 状态, 已完成任务数, 待处理任务数, 传感器数
+    DELTA = struct.Struct("<BHHBHH")  # 包类型, 机器人, 序号, 基线落后的序号数, 距基线毫秒数, 字段掩码
+    SENSOR = struct.Struct("<HB")  # 传感器名, 数值个数（REF_COUNT表示引用同名字段）
+    REF_COUNT = 0xFF
+    FIELD_REF = object()  # 增量包中“传感器值同同名字段”的标记
+    U8, U16, F32 = struct.Struct("<B"), struct.Struct("<H"), struct.Struct("<f")
+    POSITION_DELTA = struct.Struct("<hh")  # 量化坐标增量
+    # 增量包字段（掩码位序）与编码方式
+    DELTA_FIELDS = (("position", "delta"), ("battery", "battery"), ("task_id", "string"), ("task_progress", "f32"),
+                    ("errors", "strings"), ("priority", "u8"), ("status", "string"), ("completed_tasks", "strings"),
+                    ("pending_tasks", "strings"), ("environment_sensors", "sensors"))
+    
+    def __init__(self):
+        self.strings: List[str] = []  # 编号 -> 字符串
+        self.codes: Dict[str, int] = {}  # 字符串 -> 编号
+        self.unsent: List[str] = []  # 编码端新增、尚未随批次下发的字符串
+        self._arrays: Dict[Tuple[str, int], struct.Struct] = {}
+    
+    def _array(self, code: str, count: int) -> struct.Struct:
+        key = (code, count)
+        if key not in self._arrays:
+            self._arrays[key] = struct.Struct(f"<{count}{code}")
+        return self._arrays[key]
+    
+    def _learn(self, value: str) -> int:
+        if len(self.strings) >= self.NONE:
+            raise OverflowError("字符串驻留表已满")
+        code = self.codes[value] = len(self.strings)
+        self.strings.append(value)
+        return code
+    
+    def _intern(self, value: Any) -> int:
+        if value is None:
+            return self.NONE
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self._learn(value)
+            self.unsent.append(value)
+        return code
+    
+    def _string(self, code: int) -> Optional[str]:
+        return None if code == self.NONE else self.strings[code]
+    
+    def _codes(self, segments: List, values: List):
+        codes = [self._intern(v) for v in values]
+        if codes:
+            segments.append((self._array("H", len(codes)), codes))
+    
+    def _sensors(self, segments: List, sensors: Dict):
+        for name, value in sensors.items():
+            if value is self.FIELD_REF:
+                segments.append((self.SENSOR, (self._intern(name), self.REF_COUNT)))
+                continue
+            values = tuple(value) if isinstance(value, (tuple, list)) else (value,)
+            segments.append((self.SENSOR, (self._intern(name), len(values))))
+            segments.append((self._array("f", len(values)), values))
+    
+    def _prepare(self, packet: Dict) -> List[Tuple[struct.Struct, Any]]:
+        # 第一遍：驻留字符串，把包拆成(定宽结构, 字段值)片段
+        if "changes" in packet:
+            return self._prepare_delta(packet)
+        x, y = packet["position"]
+        kind = self.KIND_T if "task_progress" in packet else self.KIND_B
+        segments = [(self.HEADER, (kind, self._intern(packet["robot_id"]), packet.get("seq", 0),
+                                   packet["timestamp"].timestamp(), x, y))]
+        battery = int(round(packet["battery"] * 10))
+        if kind == self.KIND_T:
+            segments.append((self.T_BODY, (battery, self._intern(packet["task_id"]), packet["task_progress"],
+                                           int(packet["priority"]), len(packet["errors"]))))
+            self._codes(segments, packet["errors"])
+        else:
+            segments.append((self.B_BODY, (battery, self._intern(packet["status"]), len(packet["completed_tasks"]),
+                                           len(packet["pending_tasks"]), len(packet["environment_sensors"]))))
+            self._codes(segments, list(packet["completed_tasks"]) + list(packet["pending_tasks"]))
+            self._sensors(segments, packet["environment_sensors"])
+        return segments
+    
+    def _prepare_delta(self, packet: Dict) -> List[Tuple[struct.Struct, Any]]:
+        changes = packet["changes"]
+        mask = 0
+        body = []
+        for bit, (field, encoding) in enumerate(self.DELTA_FIELDS):
+            if field not in changes:
+                continue
+            mask |= 1 << bit
+            value = changes[field]
+            if encoding == "delta":
+                body.append((self.POSITION_DELTA, value))
+            elif encoding == "battery":
+                body.append((self.U16, (int(round(value * 10)),)))
+            elif encoding == "string":
+                body.append((self.U16, (self._intern(value),)))
+            elif encoding == "f32":
+                body.append((self.F32, (value,)))
+            elif encoding == "u8":
+                body.append((self.U8, (int(value),)))
+            elif encoding == "strings":
+                body.append((self.U16, (len(value),)))
+                self._codes(body, value)
+            else:
+                body.append((self.U8, (len(value),)))
+                self._sensors(body, value)
+        header = (self.DELTA, (self.KIND_DELTA, self._intern(packet["robot_id"]), packet["seq"],
+                               (packet["seq"] - packet["base_seq"]) & 0xFFFF, packet["dt_ms"], mask))
+        return [header] + body
+    
+    def encode_batch(self, packets: List[Dict]) -> bytearray:
+        # 批量编码状态包到一块预分配缓冲区（按字段定位写入，无中间bytes拼接）
+        prepared = [segment for packet in packets for segment in self._prepare(packet)]
+        new_strings = [s.encode("utf-8") for s in self.unsent]
+        self.unsent = []
+        size = (self.BATCH.size + sum(self.U16.size + len(s) for s in new_strings)
+                + sum(layout.size for layout, _ in prepared))
+        
+        buffer = bytearray(size)
+        self.BATCH.pack_into(buffer, 0, self.VERSION, len(new_strings), len(packets))
+        offset = self.BATCH.size
+        for s in new_strings:
+            self.U16.pack_into(buffer, offset, len(s))
+            offset += self.U16.size
+            buffer[offset:offset + len(s)] = s
+            offset += len(s)
+        for layout, values in prepared:
+            layout.pack_into(buffer, offset, *values)
+            offset += layout.size
+        return buffer
+    
+    def _read_codes(self, view: memoryview, offset: int, count: int) -> Tuple[List[str], int]:
+        codes = self._array("H", count).unpack_from(view, offset) if count else ()
+        return [self.strings[c] for c in codes], offset + 2 * count
+    
+    def _read_sensors(self, view: memoryview, offset: int, count: int) -> Tuple[Dict, int]:
+        sensors = {}
+        for _ in range(count):
+            name, n = self.SENSOR.unpack_from(view, offset)
+            offset += self.SENSOR.size
+            if n == self.REF_COUNT:
+                sensors[self.strings[name]] = self.FIELD_REF
+                continue
+            values = self._array("f", n).unpack_from(view, offset)
+            offset += 4 * n
+            sensors[self.strings[name]] = values[0] if n == 1 else values
+        return sensors, offset
+    
+    def decode_batch(self, buffer) -> List[Dict]:
+        # 批量解码：在memoryview上按偏移读取字段，不切片复制缓冲区
+        view = memoryview(buffer)
+        version, n_strings, n_packets = self.BATCH.unpack_from(view, 0)
+        if version != self.VERSION:
+            raise ValueError(f"不支持的状态包版本: {version}")
+        offset = self.BATCH.size
+        for _ in range(n_strings):
+            length, = self.U16.unpack_from(view, offset)
+            offset += self.U16.size
+            self._learn(str(view[offset:offset + length], "utf-8"))
+            offset += length
+        
+        packets = []
+        for _ in range(n_packets):
+            kind = view[offset]
+            if kind == self.KIND_DELTA:
+                packet, offset = self._decode_delta(view, offset)
+                packets.append(packet)
+                continue
+            kind, robot, seq, timestamp, x, y = self.HEADER.unpack_from(view, offset)
+            offset += self.HEADER.size
+            packet = {"robot_id": self.strings[robot], "seq": seq, "timestamp": datetime.fromtimestamp(timestamp),
+                      "position": (x, y)}
+            if kind == self.KIND_T:
+                battery, task, progress, priority, n_errors = self.T_BODY.unpack_from(view, offset)
+                errors, offset = self._read_codes(view, offset + self.T_BODY.size, n_errors)
+                packet.update({
+                    "battery": battery / 10,
+                    "task_id": self._string(task),
+                    "task_progress": progress,
+                    "errors": errors,
+                    "priority": priority
+                })
+            elif kind == self.KIND_B:
+                battery, status, n_completed, n_pending, n_sensors = self.B_BODY.unpack_from(view, offset)
+                tasks, offset = self._read_codes(view, offset + self.B_BODY.size, n_completed + n_pending)
+                sensors, offset = self._read_sensors(view, offset, n_sensors)
+                packet.update({
+                    "battery": battery / 10,
+                    "status": self._string(status),
+                    "completed_tasks": tasks[:n_completed],
+                    "pending_tasks": tasks[n_completed:],
+                    "environment_sensors": sensors
+                })
+            else:
+                raise ValueError(f"未知状态包类型: {kind}")
+            packets.append(packet)
+        return packets
+    
+    def _decode_delta(self, view: memoryview, offset: int) -> Tuple[Dict, int]:
+        _, robot, seq, back, dt_ms, mask = self.DELTA.unpack_from(view, offset)
+        offset += self.DELTA.size
+        changes = {}
+        for bit, (field, encoding) in enumerate(self.DELTA_FIELDS):
+            if not mask & (1 << bit):
+                continue
+            if encoding == "delta":
+                value = self.POSITION_DELTA.unpack_from(view, offset)
+                offset += self.POSITION_DELTA.size
+            elif encoding == "battery":
+                value = self.U16.unpack_from(view, offset)[0] / 10
+                offset += self.U16.size
+            elif encoding == "string":
+                value = self._string(self.U16.unpack_from(view, offset)[0])
+                offset += self.U16.size
+            elif encoding == "f32":
+                value, = self.F32.unpack_from(view, offset)
+                offset += self.F32.size
+            elif encoding == "u8":
+                value = view[offset]
+                offset += self.U8.size
+            elif encoding == "strings":
+                count, = self.U16.unpack_from(view, offset)
+                value, offset = self._read_codes(view, offset + self.U16.size, count)
+            else:
+                value, offset = self._read_sensors(view, offset + self.U8.size, view[offset])
+            changes[field] = value
+        return {"robot_id": self.strings[robot], "seq": seq, "base_seq": (seq - back) & 0xFFFF, "dt_ms": dt_ms,
+                "changes": changes}, offset
+
+# 增量状态发送端：每台机器人保存接收端最近确认的状态（基线），更新只携带与基线不同的字段
+# 坐标增量按QUANTUM量化为int16，基线取接收端重建出的值，量化误差不随增量链累积
+# 以下情况发送关键帧（完整状态）：尚无确认基线、距上次关键帧满keyframe_interval次、
+# 接收端报告基线丢失、未确认的更新达max_unacked（链路丢包）、增量超出编码范围或字段集合变化
+class DeltaEncoder:
+    QUANTUM = 0.1  # 坐标量化步长
+    
+    def __init__(self, keyframe_interval: int = 50, max_unacked: int = 8):
+        self.keyframe_interval = keyframe_interval
+        self.max_unacked = max_unacked
+        self.next_seq: Dict[str, int] = defaultdict(int)
+        self.acked: Dict[str, Tuple[int, Dict]] = {}  # 机器人 -> (序号, 接收端已确认的状态)
+        self.sent: Dict[str, Dict[int, Dict]] = defaultdict(dict)  # 机器人 -> {序号: 已发送未确认的状态}
+        self.since_keyframe: Dict[str, int] = defaultdict(int)
+        self.force_keyframe: Set[str] = set()
+        self.keyframes = 0
+        self.deltas = 0
+    
+    def encode(self, packet: Dict) -> Dict:
+        # 把完整状态转为待发送的关键帧或增量包
+        robot_id = packet["robot_id"]
+        seq = self.next_seq[robot_id]
+        self.next_seq[robot_id] = (seq + 1) & 0xFFFF
+        frame, state = None, None
+        base = self.acked.get(robot_id)
+        if (base is not None and robot_id not in self.force_keyframe
+                and self.since_keyframe[robot_id] < self.keyframe_interval
+                and len(self.sent[robot_id]) < self.max_unacked):
+            frame, state = self._delta(packet, seq, *base)
+        if frame is None:
+            frame, state = dict(packet, seq=seq), dict(packet)
+            self.force_keyframe.discard(robot_id)
+            self.since_keyframe[robot_id] = 0
+            self.keyframes += 1
+        else:
+            self.since_keyframe[robot_id] += 1
+            self.deltas += 1
+        sent = self.sent[robot_id]
+        sent[seq] = state
+        while len(sent) > self.max_unacked:
+            del sent[next(iter(sent))]
+        return frame
+    
+    def _delta(self, packet: Dict, seq: int, base_seq: int, base: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+        if packet.keys() != base.keys() or (seq - base_seq) & 0xFFFF > 0xFF:
+            return None, None
+        dt_ms = round((packet["timestamp"] - base["timestamp"]).total_seconds() * 1000)
+        if not 0 <= dt_ms <= 0xFFFF:
+            return None, None
+        state = dict(packet, timestamp=base["timestamp"] + timedelta(milliseconds=dt_ms))
+        changes = {}
+        for field, _ in StatusCodec.DELTA_FIELDS:
+            if field not in packet:
+                continue
+            value, old = packet[field], base[field]
+            if field == "position":
+                step = (round((value[0] - old[0]) / self.QUANTUM), round((value[1] - old[1]) / self.QUANTUM))
+                if max(abs(step[0]), abs(step[1])) > 32767:
+                    return None, None
+                if step != (0, 0):
+                    changes[field] = step
+                state[field] = (old[0] + step[0] * self.QUANTUM, old[1] + step[1] * self.QUANTUM)
+            elif field == "battery":
+                if round(value * 10) != round(old * 10):
+                    changes[field] = value
+            elif field == "environment_sensors":
+                if set(old) - set(value):
+                    return None, None  # 传感器被移除，增量无法表达
+                changed = {name: StatusCodec.FIELD_REF if name in packet and packet[name] == v else v
+                           for name, v in value.items() if old.get(name) != v}
+                if changed:
+                    changes[field] = changed
+            elif value != old:
+                changes[field] = value
+        return {"robot_id": packet["robot_id"], "seq": seq, "base_seq": base_seq, "dt_ms": dt_ms,
+                "changes": changes}, state
+    
+    def ack(self, acks: Dict[str, int], lost: Set[str] = ()):
+        # 接收端确认：已确认状态成为新基线；基线丢失的机器人下次发送关键帧
+        for robot_id, seq in acks.items():
+            state = self.sent[robot_id].pop(seq, None)
+            if state is None:
+                continue
+            self.acked[robot_id] = (seq, state)
+            # 早于该序号发送的状态不会再被用作基线
+            self.sent[robot_id] = {s: st for s, st in self.sent[robot_id].items() if (s - seq) & 0xFFFF < 0x8000}
+        self.force_keyframe.update(lost)
+
+# 增量状态接收端：按序号保存最近重建的完整状态，增量包叠加到其基线上还原完整状态
+class DeltaDecoder:
+    def __init__(self, history: int = 16):
+        self.history = history  # 每台机器人保留的最近状态数（发送端基线可能落后于最新状态）
+        self.states: Dict[str, Dict[int, Dict]] = defaultdict(dict)
+    
+    def apply(self, frame: Dict) -> Optional[Dict]:
+        # 返回重建的完整状态，基线缺失时返回None（需要关键帧）
+        robot_id = frame["robot_id"]
+        if "changes" not in frame:
+            state = {k: v for k, v in frame.items() if k != "seq"}
+        else:
+            base = self.states[robot_id].get(frame["base_seq"])
+            if base is None:
+                return None
+            state = dict(base, timestamp=base["timestamp"] + timedelta(milliseconds=frame["dt_ms"]))
+            for field, value in frame["changes"].items():
+                if field == "position":
+                    state[field] = (base[field][0] + value[0] * DeltaEncoder.QUANTUM,
+                                    base[field][1] + value[1] * DeltaEncoder.QUANTUM)
+                elif field != "environment_sensors":
+                    state[field] = value
+            sensors = frame["changes"].get("environment_sensors")
+            if sensors:
+                state["environment_sensors"] = dict(base["environment_sensors"], **{
+                    name: state[name] if value is StatusCodec.FIELD_REF else value for name, value in sensors.items()
+                })
+        states = self.states[robot_id]
+        states.pop(frame["seq"], None)
+        states[frame["seq"]] = state
+        while len(states) > self.history:
+            del states[next(iter(states))]
+        return state
+
+# 令牌桶：按rate个/秒补充令牌，最多积攒burst个
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+    
+    def refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def available(self, now: float, reserve: float = 0.0) -> bool:
+        # 取走一个令牌后余量是否仍不低于reserve
+        self.refill(now)
+        return self.tokens >= 1 + reserve
+    
+    def consume(self):
+        self.tokens -= 1
+    
+    def set_rate(self, rate: float, burst: float, now: float):
+        self.refill(now)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+
+# 上行发送调度：链路令牌桶（有效容量 = link_rate × 带宽% × (1 - 丢包率%)）+ 每台机器人按所属类别通信频率的令牌桶
+# T类可用全部链路令牌；B类只能在链路保留t_reserve比例令牌之外发送，保证T类始终有余量
+# 暂不能发送的消息留在调度器中：B类每台机器人只保留最新一条（合并），T类按序保留（不丢弃），
+# T类持有数达hold_limit时停止从通道读取，剩余消息留在通道中由其背压约束生产端
+class TransmissionScheduler:
+    CLASSES = ("t_bot", "b_bot")
+    
+    def __init__(self, link_rate: float = 100.0, t_reserve: float = 0.3, hold_limit: int = 256):
+        self.link_rate = link_rate  # 带宽100%且无丢包时的链路容量(条/秒)
+        self.t_reserve = t_reserve
+        self.hold_limit = hold_limit
+        self.frequencies = {"t_bot": 10.0, "b_bot": 2.0}  # 每台机器人的发送频率(Hz)
+        self.capacity = link_rate  # 当前有效链路容量(条/秒)
+        self.link: Optional[TokenBucket] = None
+        self.robot_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.held_t: Dict[str, deque] = defaultdict(deque)
+        self.held_b: Dict[str, Dict] = {}
+        self.robots = {cls: set() for cls in self.CLASSES}
+        self.counters = {cls: {"offered": 0, "sent": 0, "coalesced": 0} for cls in self.CLASSES}
+        self.started: Optional[float] = None
+        self.last: Optional[float] = None
+        self._dirty = False
+    
+    def configure(self, strategy: Dict, status: Dict):
+        # 按通信策略与链路状态更新各令牌桶速率（在下次调度时生效）
+        self.frequencies = {"t_bot": strategy["t_bot_frequency"], "b_bot": strategy["b_bot_frequency"]}
+        self.capacity = self.link_rate * status["bandwidth"] / 100 * (1 - status["packet_loss"] / 100)
+        self._dirty = True
+    
+    def _apply(self, now: float):
+        if self.link is None:
+            self.link = TokenBucket(self.capacity, max(1.0, self.capacity), now)
+            self.started = now
+        elif self._dirty:
+            self.link.set_rate(self.capacity, max(1.0, self.capacity), now)
+            for (cls, _), bucket in self.robot_buckets.items():
+                bucket.set_rate(self.frequencies[cls], max(1.0, self.frequencies[cls]), now)
+        self._dirty = False
+        self.last = now
+    
+    def _bucket(self, cls: str, robot_id: str, now: float) -> TokenBucket:
+        key = (cls, robot_id)
+        if key not in self.robot_buckets:
+            rate = self.frequencies[cls]
+            self.robot_buckets[key] = TokenBucket(rate, max(1.0, rate), now)
+            self.robots[cls].add(robot_id)
+        return self.robot_buckets[key]
+    
+    def _send(self, cls: str, robot_id: str, now: float, reserve: float) -> bool:
+        # 机器人令牌与链路令牌都满足时各取一个
+        bucket = self._bucket(cls, robot_id, now)
+        if not (bucket.available(now) and self.link.available(now, reserve)):
+            return False
+        bucket.consume()
+        self.link.consume()
+        self.counters[cls]["sent"] += 1
+        return True
+    
+    def schedule(self, t_channel: "RingChannel", b_channel: "RingChannel", consumer: str,
+                 now: float) -> Tuple[List[Dict], List[Dict]]:
+        # 从通道取消息并按令牌放行，返回本次可发送的(T类消息, B类消息)
+        self._apply(now)
+        for message in b_channel.read(consumer):
+            robot_id = message["robot_id"]
+            self.counters["b_bot"]["offered"] += 1
+            if self.held_b.pop(robot_id, None) is not None:
+                self.counters["b_bot"]["coalesced"] += 1
+            self.held_b[robot_id] = message
+        room = self.hold_limit - sum(len(q) for q in self.held_t.values())
+        if room > 0:
+            for message in t_channel.read(consumer, room):
+                self.held_t[message["robot_id"]].append(message)
+                self.counters["t_bot"]["offered"] += 1
+        
+        # T类：各机器人轮流发送队首消息，直到一轮都发不出
+        t_sent = []
+        while self.held_t:
+            progressed = False
+            for robot_id in list(self.held_t):
+                if self._send("t_bot", robot_id, now, 0.0):
+                    queue = self.held_t[robot_id]
+                    t_sent.append(queue.popleft())
+                    if not queue:
+                        del self.held_t[robot_id]
+                    progressed = True
+            if not progressed:
+                break
+        # B类：只使用链路保留量之外的令牌
+        b_sent = []
+        reserve = self.t_reserve * self.link.burst
+        for robot_id in list(self.held_b):
+            if self._send("b_bot", robot_id, now, reserve):
+                b_sent.append(self.held_b.pop(robot_id))
+        return t_sent, b_sent
+    
+    def metrics(self) -> Dict[str, Dict]:
+        # 各类别的提交/发送/合并计数、积压数，以及实际发送速率与配置频率
+        elapsed = (self.last - self.started) if self.started is not None else 0.0
+        held = {"t_bot": sum(len(q) for q in self.held_t.values()), "b_bot": len(self.held_b)}
+        result = {}
+        for cls in self.CLASSES:
+            sent = self.counters[cls]["sent"]
+            robots = len(self.robots[cls])
+            result[cls] = dict(self.counters[cls], held=held[cls], robots=robots,
+                               configured_hz=self.frequencies[cls],
+                               achieved_rate=sent / elapsed if elapsed else 0.0,
+                               achieved_hz_per_robot=sent / elapsed / robots if elapsed and robots else 0.0)
+        result["link"] = {"capacity": self.capacity, "reserve": self.t_reserve}
+        return result
+
+# 全队连接监测：最后通信时间、位置、超时阈值按机器人存于NumPy列，一次向量运算判定全队是否超时
+# 邻居查找使用边长等于查询半径的空间哈希，每个失联机器人只检查周围3×3个格子内的在线机器人
+class FleetConnectionMonitor:
+    def __init__(self, t_timeout: float = 5.0, b_timeout: float = 15.0, radius: float = 10.0):
+        self.t_timeout = t_timeout  # 与check_robot_connection一致的超时阈值
+        self.b_timeout = b_timeout
+        self.radius = radius  # 邻近距离（严格小于）
+        self.robots: List[Robot] = []
+        self.last_comm = np.zeros(0)  # 最后通信时间（POSIX秒）
+        self.positions = np.zeros((0, 2))
+        self.timeouts = np.zeros(0)
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+    
+    def sync(self, robots: List[Robot]):
+        # 从机器人实例批量读取最后通信时间、位置与类型
+        self.robots = list(robots)
+        n = len(self.robots)
+        self.last_comm = np.fromiter((r.last_comm_time.timestamp() for r in self.robots), dtype=float, count=n)
+        self.positions = np.array([r.position for r in self.robots], dtype=float).reshape(n, 2)
+        is_t_cell = np.fromiter((r.robot_type == RobotType.T_CELL for r in self.robots), dtype=bool, count=n)
+        self.timeouts = np.where(is_t_cell, self.t_timeout, self.b_timeout)
+    
+    def connected_mask(self, current_time: datetime) -> np.ndarray:
+        return (current_time.timestamp() - self.last_comm) < self.timeouts
+    
+    def index(self, mask: np.ndarray):
+        # 把mask中的机器人按所在格子建空间哈希
+        self.grid = defaultdict(list)
+        slots = np.flatnonzero(mask)
+        cells = np.floor(self.positions[slots] / self.radius).astype(int)
+        for slot, (cx, cy) in zip(slots.tolist(), cells.tolist()):
+            self.grid[(cx, cy)].append(slot)
+    
+    def neighbors(self, slot: int) -> List[Robot]:
+        # 距离小于radius的已索引机器人（不含自身）
+        cx, cy = np.floor(self.positions[slot] / self.radius).astype(int).tolist()
+        candidates = [s for dx in (-1, 0, 1) for dy in (-1, 0, 1) for s in self.grid.get((cx + dx, cy + dy), ())]
+        if not candidates:
+            return []
+        candidates = np.array(candidates)
+        offsets = self.positions[candidates] - self.positions[slot]
+        near = candidates[(np.hypot(offsets[:, 0], offsets[:, 1]) < self.radius) & (candidates != slot)]
+        return [self.robots[s] for s in np.sort(near)]
+
+# 机器人状态TTL缓存：条目按robot_id存储，另按到期时刻维护最小堆，读取时惰性弹出已到期条目
+# TTL按机器人类别区分（T类状态变化快，过期更早）；条目为{"data", "timestamp", ...}，与原字典缓存格式一致
+class StatusCache:
+    def __init__(self, t_ttl: float = 10.0, b_ttl: float = 30.0, stale_retention: float = 600.0):
+        self.ttls = {RobotType.T_CELL: t_ttl, RobotType.B_CELL: b_ttl}
+        self.stale_retention = stale_retention  # 过期后仍记为stale的时长（秒），之后按未缓存处理（退役机器人不再占用）
+        self.entries: Dict[str, Dict] = {}  # robot_id -> 缓存条目
+        self.expiry: Dict[str, float] = {}  # robot_id -> 到期时刻（POSIX秒）
+        self.heap: List[Tuple[float, str]] = []  # (到期时刻或stale记录清除时刻, robot_id)，刷新后的旧项在弹出时跳过
+        self.expired: Dict[str, float] = {}  # 因过期被移除、尚未重新写入的robot_id -> stale记录清除时刻
+        self.hits = 0
+        self.stale = 0  # 条目存在过但已过期
+        self.misses = 0  # 从未缓存
+    
+    def put(self, robot_id: str, entry: Dict, robot_type: Optional[str] = None):
+        # 写入条目，按类别TTL计算到期时刻（类别未知时按状态包内容推断）
+        if robot_type is None:
+            robot_type = RobotType.T_CELL if "task_progress" in entry["data"] else RobotType.B_CELL
+        expires_at = entry["timestamp"].timestamp() + self.ttls[robot_type]
+        self.entries[robot_id] = entry
+        self.expiry[robot_id] = expires_at
+        self.expired.pop(robot_id, None)
+        heapq.heappush(self.heap, (expires_at, robot_id))
+        if len(self.heap) > 2 * (len(self.entries) + len(self.expired)) + 64:
+            # 刷新产生的旧项过多时重建堆
+            self.heap = [(t, r) for r, t in self.expiry.items()] + [(t, r) for r, t in self.expired.items()]
+            heapq.heapify(self.heap)
+    
+    def evict(self, current_time: datetime) -> int:
+        # 弹出所有到期条目（转为stale记录，stale_retention秒后随堆清除），返回移除的缓存条目数
+        now = current_time.timestamp()
+        removed = 0
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, robot_id = heapq.heappop(self.heap)
+            if self.expiry.get(robot_id) == expires_at:
+                del self.entries[robot_id]
+                del self.expiry[robot_id]
+                forget_at = expires_at + self.stale_retention
+                self.expired[robot_id] = forget_at
+                heapq.heappush(self.heap, (forget_at, robot_id))
+                removed += 1
+            elif self.expired.get(robot_id) == expires_at:
+                del self.expired[robot_id]
+        return removed
+    
+    def _lookup(self, robot_id: str) -> Optional[Dict]:
+        entry = self.entries.get(robot_id)
+        if entry is not None:
+            self.hits += 1
+            return entry["data"]
+        if robot_id in self.expired:
+            self.stale += 1
+        else:
+            self.misses += 1
+        return None
+    
+    def lookup(self, robot_id: str, current_time: datetime) -> Optional[Dict]:
+        # 未过期的状态数据，过期或未缓存返回None
+        self.evict(current_time)
+        return self._lookup(robot_id)
+    
+    def get_many(self, robot_ids: List[str], current_time: datetime) -> Dict[str, Optional[Dict]]:
+        # 批量读取：只做一次过期清理
+        self.evict(current_time)
+        return {robot_id: self._lookup(robot_id) for robot_id in robot_ids}
+    
+    def stats(self) -> Dict:
+        return {"size": len(self.entries), "expired": len(self.expired), "heap": len(self.heap),
+                "hits": self.hits, "stale": self.stale, "misses": self.misses}
+    
+    # 兼容原字典缓存的只读访问（不做过期判断）
+    def get(self, robot_id: str, default: Any = None) -> Any:
+        return self.entries.get(robot_id, default)
+    
+    def __getitem__(self, robot_id: str) -> Dict:
+        return self.entries[robot_id]
+    
+    def __contains__(self, robot_id: str) -> bool:
+        return robot_id in self.entries
+    
+    def __len__(self):
+        return len(self.entries)
+
+# 失联机器人位置估计：每台机器人一个匀速模型卡尔曼滤波器（状态x, y, vx, vy），状态与协方差按行存于NumPy数组
+# 接收端收到的位置上报批量做预测+更新；预测失联机器人时把滤波器外推到当前时刻，
+# 再以“沿最后已知规划路径按额定速度行驶”得到的位置作为伪观测融合，一次批量给出所有失联机器人的位置与协方差
+class FleetKalmanPredictor:
+    def __init__(self, speed: float = 0.5, accel_noise: float = 0.05, measurement_noise: float = 0.1,
+                 path_noise: float = 0.5, capacity: int = 16):
+        self.speed = speed  # 额定速度（与LLMInterface.predict_robot_status一致），用于路径先验
+        self.accel_noise = accel_noise  # 加速度噪声谱密度
+        self.measurement_noise = measurement_noise  # 位置上报标准差
+        self.path_noise = path_noise  # 路径先验标准差（随外推时长增大）
+        self.slots: Dict[str, int] = {}
+        self.state = np.zeros((capacity, 4))
+        self.cov = np.zeros((capacity, 4, 4))
+        self.updated = np.zeros(capacity)  # 最近一次观测时刻（POSIX秒）
+    
+    def _slot(self, robot_id: str) -> int:
+        if robot_id not in self.slots:
+            if len(self.slots) == len(self.updated):
+                capacity = 2 * len(self.updated)
+                self.state = np.concatenate([self.state, np.zeros_like(self.state)])[:capacity]
+                self.cov = np.concatenate([self.cov, np.zeros_like(self.cov)])[:capacity]
+                self.updated = np.concatenate([self.updated, np.zeros_like(self.updated)])[:capacity]
+            self.slots[robot_id] = len(self.slots)
+        return self.slots[robot_id]
+    
+    def _init(self, slots: np.ndarray, positions: np.ndarray, times: np.ndarray):
+        self.state[slots] = 0.0
+        self.state[slots, :2] = positions
+        self.cov[slots] = np.diag([self.measurement_noise ** 2] * 2 + [self.speed ** 2] * 2)
+        self.updated[slots] = times
+    
+    def _propagate(self, state: np.ndarray, cov: np.ndarray, dt: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # 批量匀速外推：x' = F x，P' = F P Fᵀ + Q(dt)
+        m = len(dt)
+        F = np.tile(np.eye(4), (m, 1, 1))
+        F[:, 0, 2] = F[:, 1, 3] = dt
+        Q = np.zeros((m, 4, 4))
+        q = self.accel_noise
+        for i in range(2):
+            Q[:, i, i] = q * dt ** 3 / 3
+            Q[:, i, i + 2] = Q[:, i + 2, i] = q * dt ** 2 / 2
+            Q[:, i + 2, i + 2] = q * dt
+        return np.einsum("mij,mj->mi", F, state), F @ cov @ F.transpose(0, 2, 1) + Q
+    
+    @staticmethod
+    def _correct(state: np.ndarray, cov: np.ndarray, z: np.ndarray, variance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # 批量位置观测更新（H取状态前两维）
+        S = cov[:, :2, :2] + variance[:, None, None] * np.eye(2)
+        K = cov[:, :, :2] @ np.linalg.inv(S)
+        state = state + np.einsum("mij,mj->mi", K, z - state[:, :2])
+        cov = cov - K @ cov[:, :2, :]
+        return state, cov
+    
+    def observe(self, robot_ids: List[str], times: np.ndarray, positions: np.ndarray):
+        # 批量处理位置上报（同一机器人多条时只取最新一条，早于上次观测的忽略）
+        latest = {}
+        for i, robot_id in enumerate(robot_ids):
+            if robot_id not in latest or times[i] >= times[latest[robot_id]]:
+                latest[robot_id] = i
+        is_new = np.array([robot_id not in self.slots for robot_id in latest])
+        rows = np.array(list(latest.values()), dtype=int)
+        slots = np.array([self._slot(robot_id) for robot_id in latest], dtype=int)
+        if is_new.any():
+            self._init(slots[is_new], positions[rows[is_new]], times[rows[is_new]])
+        keep = ~is_new & (times[rows] > self.updated[slots])
+        slots, rows = slots[keep], rows[keep]
+        if not len(slots):
+            return
+        state, cov = self._propagate(self.state[slots], self.cov[slots], times[rows] - self.updated[slots])
+        variance = np.full(len(slots), self.measurement_noise ** 2)
+        self.state[slots], self.cov[slots] = self._correct(state, cov, positions[rows], variance)
+        self.updated[slots] = times[rows]
+    
+    def _walk_paths(self, starts: np.ndarray, paths: List[List[Tuple[float, float]]],
+                    distances: np.ndarray) -> np.ndarray:
+        # 从各起点沿各自路径行驶给定距离后的位置（路径按最长者补齐，向量化插值）
+        length = max(len(p) for p in paths)
+        points = np.repeat(starts[:, None, :], length + 1, axis=1)
+        for i, path in enumerate(paths):
+            if path:
+                points[i, 1:len(path) + 1] = path
+                points[i, len(path) + 1:] = path[-1]
+        segments = np.hypot(*np.diff(points, axis=1).transpose(2, 0, 1))
+        cumulative = np.concatenate([np.zeros((len(paths), 1)), np.cumsum(segments, axis=1)], axis=1)
+        travelled = np.minimum(distances, cumulative[:, -1])
+        index = np.clip((cumulative[:, 1:] < travelled[:, None]).sum(axis=1), 0, length - 1)
+        rows = np.arange(len(paths))
+        seg = segments[rows, index]
+        frac = np.divide(travelled - cumulative[rows, index], seg, out=np.zeros_like(seg), where=seg > 0)
+        return points[rows, index] + frac[:, None] * (points[rows, index + 1] - points[rows, index])
+    
+    def predict(self, robots: List[Robot], current_time: datetime, use_path: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        # 批量预测：返回(位置均值 (m,2), 位置协方差 (m,2,2))；未观测过的机器人以最后已知位置与通信时刻初始化
+        if not robots:
+            return np.zeros((0, 2)), np.zeros((0, 2, 2))
+        unseen = [r for r in robots if r.robot_id not in self.slots]
+        if unseen:
+            self._init(np.array([self._slot(r.robot_id) for r in unseen]),
+                       np.array([r.position for r in unseen], dtype=float),
+                       np.array([r.last_comm_time.timestamp() for r in unseen]))
+        slots = np.array([self.slots[r.robot_id] for r in robots])
+        dt = np.maximum(current_time.timestamp() - self.updated[slots], 0.0)
+        state, cov = self._propagate(self.state[slots], self.cov[slots], dt)
+        if use_path:
+            has_path = np.array([bool(r.path) for r in robots])
+            if has_path.any():
+                planned = [list(r.path) for r, flag in zip(robots, has_path) if flag]
+                prior = self._walk_paths(self.state[slots[has_path], :2], planned, self.speed * dt[has_path])
+                variance = self.path_noise ** 2 * (1 + dt[has_path] / 10)
+                state[has_path], cov[has_path] = self._correct(state[has_path], cov[has_path], prior, variance)
+        return state[:, :2], cov[:, :2, :2]
+
+# 链路仿真：按当前带宽串行发送（FIFO排队）、叠加单向时延与高斯抖动、按丢包率丢弃
+# 不可靠报文（UDP）排队超过max_queue_delay即尾部丢弃，丢包即丢失；
+# 可靠报文（TCP）丢包表现为重传：多占一次链路时间并多等一个重传超时rto（最多MAX_RETRIES次）
+class LinkEmulator:
+    MAX_RETRIES = 8
+    
+    def __init__(self, capacity: float = 500_000.0, latency: float = 0.02, jitter: float = 0.005,
+                 max_queue_delay: float = 0.5, rto: float = 0.2, seed: int = 0):
+        self.capacity = capacity  # 带宽100%时的链路容量(字节/秒)
+        self.latency = latency  # 单向传播时延(秒)
+        self.jitter = jitter  # 时延抖动标准差(秒)
+        self.max_queue_delay = max_queue_delay
+        self.rto = rto
+        self.rate = capacity  # 当前有效带宽(字节/秒)
+        self.loss = 0.0  # 当前丢包概率
+        self.free_at = 0.0  # 链路空闲时刻
+        self.rng = random.Random(seed)
+    
+    def configure(self, status: Dict):
+        # 按HospitalEnv.communication_status（带宽、丢包率百分比）设置链路
+        self.rate = max(1.0, self.capacity * status["bandwidth"] / 100)
+        self.loss = status["packet_loss"] / 100
+    
+    def transit(self, size: int, now: float, reliable: bool) -> Optional[float]:
+        # 返回报文送达时刻，丢弃时返回None
+        start = max(now, self.free_at)
+        if not reliable and start - now > self.max_queue_delay:
+            return None
+        attempts = 1
+        while self.rng.random() < self.loss:
+            if not reliable:
+                self.free_at = start + size / self.rate
+                return None
+            if attempts > self.MAX_RETRIES:
+                break
+            attempts += 1
+        self.free_at = start + attempts * size / self.rate
+        return self.free_at + (attempts - 1) * self.rto + max(0.0, self.rng.gauss(self.latency, self.jitter))
+
+# 回环上行链路（中央服务器端）：T类通道走TCP（可靠有序，按长度前缀分帧），B类通道走UDP（每个数据报一批B类状态）
+# 链路仿真在接收端入口进行：报文到达即按LinkEmulator排队、计算送达时刻，到期后交给DataTransmissionModule.receive_datagram
+# TCP连接内按到达顺序交付（重传造成队头阻塞）；通信策略变化时经UDP下发给各机器人代理进程
+# 每个帧/数据报独立编码（自带字符串表、均为完整状态），丢包不影响后续报文解码
+class LoopbackUplink(asyncio.DatagramProtocol):
+    FRAME = struct.Struct("<I")  # TCP帧长度前缀
+    HELLO = b"\x00"  # 代理进程登记控制地址用的数据报（不是合法的状态批次）
+    CLASSES = ("t_bot", "b_bot")
+    
+    def __init__(self, module: "DataTransmissionModule", link: LinkEmulator, host: str = "127.0.0.1"):
+        self.module = module
+        self.link = link
+        self.host = host
+        self.sockets: Dict[str, socket.socket] = {}
+        self.udp: Optional[asyncio.DatagramTransport] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.agents: Set[Tuple[str, int]] = set()  # 机器人代理进程的控制地址
+        self.strategy: Optional[Dict] = None
+        self.streams = 0  # 当前TCP连接数
+        self.pending = 0  # 已到达、尚未送达的报文数
+        self.reset_metrics()
+        module.transport = self
+    
+    def bind(self) -> Tuple[int, int]:
+        # 同步绑定监听端口（可在创建代理进程之前调用），返回(T类TCP端口, B类UDP端口)
+        self.sockets["t_bot"] = socket.create_server((self.host, 0))
+        self.sockets["b_bot"] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sockets["b_bot"].bind((self.host, 0))
+        return self.sockets["t_bot"].getsockname()[1], self.sockets["b_bot"].getsockname()[1]
+    
+    async def start(self):
+        if not self.sockets:
+            self.bind()
+        loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._serve_stream, sock=self.sockets["t_bot"])
+        self.udp, _ = await loop.create_datagram_endpoint(lambda: self, sock=self.sockets["b_bot"])
+    
+    async def stop(self, grace: float = 2.0):
+        # 通知代理进程退出，等待其断开连接（最多grace秒）后关闭监听
+        self._broadcast({"stop": True})
+        deadline = asyncio.get_running_loop().time() + grace
+        while self.streams and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.server is not None:
+            self.server.close()
+        if self.udp is not None:
+            self.udp.close()
+    
+    def configure(self, strategy: Dict, status: Dict):
+        # 由adjust_communication_strategy调用：链路按通信状态整形，发送频率变化时下发给代理进程
+        self.link.configure(status)
+        if strategy != self.strategy:
+            self.strategy = dict(strategy)
+            self._broadcast(self.strategy)
+    
+    def _broadcast(self, message: Dict):
+        if self.udp is None:
+            return
+        data = json.dumps(message).encode("utf-8")
+        for addr in self.agents:
+            self.udp.sendto(data, addr)
+    
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        if addr not in self.agents:
+            self.agents.add(addr)
+            if self.strategy is not None:
+                self.udp.sendto(json.dumps(self.strategy).encode("utf-8"), addr)
+        if data != self.HELLO:
+            self._ingress("b_bot", data, None)
+    
+    async def _serve_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        stream = {"last": 0.0}  # 本连接最后一帧的送达时刻
+        self.streams += 1
+        try:
+            while True:
+                size, = self.FRAME.unpack(await reader.readexactly(self.FRAME.size))
+                self._ingress("t_bot", await reader.readexactly(size), stream)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.streams -= 1
+            writer.close()
+    
+    def _ingress(self, cls: str, payload: bytes, stream: Optional[Dict]):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        counters = self.counters[cls]
+        counters["frames"] += 1
+        counters["bytes"] += len(payload)
+        arrival = self.link.transit(len(payload), now, reliable=stream is not None)
+        if arrival is None:
+            counters["dropped"] += 1
+            return
+        if stream is not None:
+            arrival = stream["last"] = max(arrival, stream["last"])
+        self.pending += 1
+        loop.call_at(arrival, self._deliver, cls, payload)
+    
+    def _deliver(self, cls: str, payload: bytes):
+        self.pending -= 1
+        states = self.module.receive_datagram(payload)
+        now = time.time()
+        self.counters[cls]["delivered"] += len(states)
+        self.latencies[cls].extend(now - state["timestamp"].timestamp() for state in states)
+    
+    def reset_metrics(self):
+        self.counters = {cls: {"frames": 0, "bytes": 0, "dropped": 0, "delivered": 0} for cls in self.CLASSES}
+        self.latencies: Dict[str, List[float]] = {cls: [] for cls in self.CLASSES}
+        self.window_start = time.time()
+    
+    def metrics(self, reset: bool = False) -> Dict[str, Dict]:
+        # 各类别自上次重置以来的到达帧数/字节、丢弃帧数、送达状态数与吞吐、端到端时延分位数(毫秒)
+        elapsed = max(time.time() - self.window_start, 1e-9)
+        result = {}
+        for cls in self.CLASSES:
+            latencies = np.array(self.latencies[cls]) * 1000
+            result[cls] = dict(self.counters[cls], throughput=self.counters[cls]["delivered"] / elapsed,
+                               bandwidth=self.counters[cls]["bytes"] / elapsed,
+                               **{f"p{q}_ms": float(np.percentile(latencies, q)) if len(latencies) else None
+                                  for q in (50, 95, 99)})
+        result["link"] = {"rate": self.link.rate, "loss": self.link.loss, "pending": self.pending}
+        if reset:
+            self.reset_metrics()
+        return result
+
+# 机器人代理组（在独立进程中运行）：一个事件循环托管一组机器人，按通信策略频率生成状态，
+# 经本进程的DataTransmissionModule通道汇集后，T类状态写入TCP连接、B类状态按MAX_BATCH条一组发UDP数据报
+# 同一UDP套接字接收中央端下发的通信策略（JSON），收到{"stop": true}或运行满时长后退出
+class RobotAgentGroup(asyncio.DatagramProtocol):
+    MAX_BATCH = 16  # 每个UDP数据报最多携带的B类状态数
+    
+    def __init__(self, robots: List[Robot], host: str, t_port: int, b_port: int, tick: float = 0.01, seed: int = 0):
+        self.robots = robots
+        self.host = host
+        self.t_port = t_port
+        self.b_port = b_port
+        self.tick = tick
+        self.seed = seed
+        self.strategy = {"t_bot_frequency": 10.0, "b_bot_frequency": 2.0}
+        self.stopped = False
+    
+    def run(self, duration: float):
+        # 进程入口
+        asyncio.run(self._main(duration))
+    
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        message = json.loads(data)
+        if message.get("stop"):
+            self.stopped = True
+        else:
+            self.strategy.update(message)
+    
+    async def _connect(self, attempts: int = 50) -> asyncio.StreamWriter:
+        # 中央端可能尚未开始监听，失败时重试
+        for _ in range(attempts - 1):
+            try:
+                return (await asyncio.open_connection(self.host, self.t_port))[1]
+            except OSError:
+                await asyncio.sleep(0.1)
+        return (await asyncio.open_connection(self.host, self.t_port))[1]
+    
+    async def _main(self, duration: float):
+        loop = asyncio.get_running_loop()
+        rng = random.Random(self.seed)
+        module = DataTransmissionModule(LLMInterface())
+        writer = await self._connect()
+        udp, _ = await loop.create_datagram_endpoint(lambda: self, remote_addr=(self.host, self.b_port))
+        udp.sendto(LoopbackUplink.HELLO)  # 登记控制地址
+        start = loop.time()
+        due = {robot.robot_id: start + rng.random() * 0.1 for robot in self.robots}
+        try:
+            while not self.stopped and loop.time() - start < duration:
+                now = loop.time()
+                timestamp = datetime.fromtimestamp(time.time())
+                for robot in self.robots:
+                    if now < due[robot.robot_id]:
+                        continue
+                    x, y = robot.position
+                    robot.update_position((x + rng.uniform(-0.1, 0.1), y + rng.uniform(-0.1, 0.1)))
+                    robot.update_battery(0.001)
+                    if robot.robot_type == RobotType.T_CELL:
+                        module.t_bot_transmit(robot, {"task_id": f"task_{robot.robot_id}",
+                                                      "progress": rng.uniform(0, 100)}, timestamp)
+                        frequency = self.strategy["t_bot_frequency"]
+                    else:
+                        module.b_bot_transmit(robot, {"sensors": {"temperature": 22.0}}, timestamp)
+                        frequency = self.strategy["b_bot_frequency"]
+                    due[robot.robot_id] = max(due[robot.robot_id] + 1 / frequency, now)
+                uplink = module.drain_uplink()
+                if uplink["t_bot"]:
+                    frame = StatusCodec().encode_batch(uplink["t_bot"])
+                    writer.write(LoopbackUplink.FRAME.pack(len(frame)) + frame)
+                for i in range(0, len(uplink["b_bot"]), self.MAX_BATCH):
+                    udp.sendto(bytes(StatusCodec().encode_batch(uplink["b_bot"][i:i + self.MAX_BATCH])))
+                await writer.drain()
+                await asyncio.sleep(self.tick)
+        except ConnectionError:
+            pass  # 中央端已关闭
+        finally:
+            writer.close()
+            udp.close()
+
+# 遥测日志：定长记录（RECORD，32字节）只追加写入分段文件（每段segment_records条），读取时以mmap映射为NumPy结构化数组
+# 字符串（机器人ID、任务ID、状态等）驻留为uint16编号并追加到strings.jsonl；
+# 每block_records条记录为一块，块内时间范围与出现的机器人写入稀疏索引index.jsonl，回放时按索引跳过无关块，块内向量化过滤
+# 各记录类型的字段含义：
+#   类型          robot       subject            state                x, y       value      extra
+#   机器人状态    机器人      当前任务           机器人状态           位置       电量       通信质量
+#   任务状态      执行机器人  任务ID             任务状态             任务位置   优先级     -
+#   通道状态包    机器人      通道(t_bot/b_bot)  任务ID(T)/状态(B)    位置       电量       任务进度(T)
+#   调度结果      分配机器人  任务ID             assigned/unassigned  -          -          -
+#   动作结果      机器人      动作类型           success/failed       目标位置   是否调整   -
+# 任务状态只在状态或执行机器人变化时记录
+class TelemetryLog:
+    KIND_ROBOT, KIND_TASK, KIND_PACKET, KIND_SCHEDULE, KIND_ACTION = 1, 2, 3, 4, 5
+    KIND_NAMES = {1: "robot", 2: "task", 3: "packet", 4: "schedule", 5: "action"}
+    NONE = 0xFFFF  # 空值编号
+    RECORD = np.dtype([("timestamp", "<f8"), ("kind", "u1"), ("robot", "<u2"), ("subject", "<u2"), ("state", "<u2"),
+                       ("x", "<f4"), ("y", "<f4"), ("value", "<f4"), ("extra", "<f4"), ("reserved", "u1")])
+    
+    def __init__(self, directory: str, segment_records: int = 1 << 20, block_records: int = 4096):
+        if segment_records % block_records:
+            raise ValueError("segment_records必须是block_records的整数倍")
+        self.directory = directory
+        self.segment_records = segment_records
+        self.block_records = block_records
+        self.strings: List[str] = []  # 编号 -> 字符串
+        self.codes: Dict[str, int] = {}  # 字符串 -> 编号
+        self.blocks: List[Dict] = []  # 稀疏索引：已写满的块（起始记录号、条数、时间范围、机器人编号集合）
+        self.pending: List[Tuple] = []  # 尚未写入文件的记录
+        self.count = 0  # 已写入文件的记录数
+        self.last_tasks: Dict[str, Tuple] = {}  # 任务最近一次记录的(状态, 执行机器人)
+        self._unsaved_strings: List[str] = []
+        self._maps: Dict[int, Tuple[int, mmap.mmap]] = {}
+        self._retired: List[mmap.mmap] = []  # 重新映射时仍被数组视图引用、暂不能关闭的旧映射
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def _segment_path(self, segment: int) -> str:
+        return self._path(f"segment-{segment:06d}.bin")
+    
+    def _load(self):
+        # 打开已有日志：恢复字符串表、稀疏索引与记录数，之后可继续追加
+        if os.path.exists(self._path("strings.jsonl")):
+            with open(self._path("strings.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    value = json.loads(line)
+                    self.codes[value] = len(self.strings)
+                    self.strings.append(value)
+        if os.path.exists(self._path("index.jsonl")):
+            with open(self._path("index.jsonl"), encoding="utf-8") as f:
+                self.blocks = [dict(entry, robots=set(entry["robots"])) for entry in map(json.loads, f)]
+        segment = 0
+        while os.path.exists(self._segment_path(segment)):
+            self.count += os.path.getsize(self._segment_path(segment)) // self.RECORD.itemsize
+            segment += 1
+    
+    def _intern(self, value: Any) -> int:
+        if value is None:
+            return self.NONE
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            if len(self.strings) >= self.NONE:
+                raise OverflowError("字符串驻留表已满")
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+            self._unsaved_strings.append(value)
+        return code
+    
+    def _string(self, code: int) -> Optional[str]:
+        return None if code == self.NONE else self.strings[code]
+    
+    def append(self, kind: int, timestamp: datetime, robot_id: Optional[str] = None, subject: Any = None,
+               state: Any = None, position: Optional[Tuple[float, float]] = None, value: float = np.nan,
+               extra: float = np.nan):
+        x, y = position if position is not None else (np.nan, np.nan)
+        self.pending.append((timestamp.timestamp(), kind, self._intern(robot_id), self._intern(subject),
+                             self._intern(state), x, y, value, extra, 0))
+    
+    def record_step(self, result: Dict, states: List[Dict] = ()):
+        # 记录IANIFramework.step的返回结果与本步接收端重建的状态包
+        timestamp = result["timestamp"]
+        for robot in result["robot_statuses"]:
+            self.append(self.KIND_ROBOT, timestamp, robot["robot_id"], robot["current_task"], robot["status"],
+                        robot["position"], robot["battery_level"], robot["communication_quality"])
+        for task in result["task_statuses"]:
+            key = (task["status"], task["assigned_robot"])
+            if self.last_tasks.get(task["task_id"]) != key:
+                self.last_tasks[task["task_id"]] = key
+                self.append(self.KIND_TASK, timestamp, task["assigned_robot"], task["task_id"], task["status"],
+                            task["location"], float(task["priority"]))
+        for state in states:
+            is_t = "task_progress" in state
+            self.append(self.KIND_PACKET, state["timestamp"], state["robot_id"], "t_bot" if is_t else "b_bot",
+                        state["task_id"] if is_t else state["status"], state["position"], state["battery"],
+                        state["task_progress"] if is_t else np.nan)
+        for scheduled in result["scheduling_results"]:
+            self.append(self.KIND_SCHEDULE, scheduled["time"], scheduled["robot_id"], scheduled["task_id"],
+                        "assigned" if scheduled["assigned"] else "unassigned")
+        for action in result["action_results"]:
+            self.append(self.KIND_ACTION, timestamp, action["robot_id"], action["action"]["type"],
+                        "success" if action["result"]["success"] else "failed", action["action"].get("target"),
+                        float(action["result"].get("adjusted", False)))
+        if len(self.pending) >= self.block_records:
+            self.flush()
+    
+    def flush(self):
+        # 先写新增字符串再写记录，保证文件中的每条记录都能解码
+        if self._unsaved_strings:
+            with open(self._path("strings.jsonl"), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(s, ensure_ascii=False) + "\n" for s in self._unsaved_strings)
+            self._unsaved_strings = []
+        if not self.pending:
+            return
+        records = np.array(self.pending, dtype=self.RECORD)
+        self.pending = []
+        written = 0
+        while written < len(records):
+            segment, offset = divmod(self.count, self.segment_records)
+            chunk = records[written:written + self.segment_records - offset]
+            with open(self._segment_path(segment), "ab") as f:
+                f.write(chunk.tobytes())
+            written += len(chunk)
+            self.count += len(chunk)
+        self._index_blocks()
+    
+    def _index_blocks(self):
+        # 为新写满的块建立稀疏索引项
+        entries = []
+        for block in range(len(self.blocks), self.count // self.block_records):
+            start = block * self.block_records
+            records = self._records(start, self.block_records)
+            robots = np.unique(records["robot"])
+            entry = {"start": start, "count": self.block_records,
+                     "first": float(records["timestamp"].min()), "last": float(records["timestamp"].max()),
+                     "robots": robots[robots != self.NONE].tolist()}
+            entries.append(entry)
+            self.blocks.append(dict(entry, robots=set(entry["robots"])))
+        if entries:
+            with open(self._path("index.jsonl"), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    
+    def _segment(self, segment: int) -> np.ndarray:
+        # 以mmap只读映射分段文件（文件增长后重新映射），返回零拷贝的结构化数组视图
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        cached = self._maps.get(segment)
+        if cached is None or cached[0] != size:
+            if cached is not None:
+                self._retired.append(cached[1])
+                self._unmap()
+            with open(path, "rb") as f:
+                cached = self._maps[segment] = (size, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return np.frombuffer(cached[1], dtype=self.RECORD)
+    
+    def _unmap(self):
+        # 关闭已替换的旧映射；仍有数组视图引用的（如进行中的回放）留到下次重新映射或close()时再试
+        retired, self._retired = self._retired, []
+        for mapping in retired:
+            try:
+                mapping.close()
+            except BufferError:
+                self._retired.append(mapping)
+    
+    def _records(self, start: int, count: int) -> np.ndarray:
+        # 块不跨分段，可直接在所属分段上切片
+        segment, offset = divmod(start, self.segment_records)
+        return self._segment(segment)[offset:offset + count]
+    
+    def _scan(self, start: Optional[datetime], end: Optional[datetime], robot_id: Optional[str],
+              kinds: Optional[Set[int]]) -> Iterator[np.ndarray]:
+        # 按稀疏索引筛出可能相关的块（未写满的尾块总是检查），逐块返回过滤后的记录
+        self.flush()
+        if robot_id is not None and robot_id not in self.codes:
+            return
+        t0 = start.timestamp() if start is not None else None
+        t1 = end.timestamp() if end is not None else None
+        robot = self.codes.get(robot_id)
+        spans = [(b["start"], b["count"]) for b in self.blocks
+                 if (t0 is None or b["last"] >= t0) and (t1 is None or b["first"] <= t1)
+                 and (robot is None or robot in b["robots"])]
+        tail = len(self.blocks) * self.block_records
+        if tail < self.count:
+            spans.append((tail, self.count - tail))
+        for first, count in spans:
+            records = self._records(first, count)
+            mask = np.ones(len(records), dtype=bool)
+            if t0 is not None:
+                mask &= records["timestamp"] >= t0
+            if t1 is not None:
+                mask &= records["timestamp"] <= t1
+            if robot is not None:
+                mask &= records["robot"] == robot
+            if kinds is not None:
+                mask &= np.isin(records["kind"], list(kinds))
+            if mask.any():
+                yield records[mask]
+    
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None, robot_id: Optional[str] = None,
+              kinds: Optional[Set[int]] = None) -> np.ndarray:
+        # 返回匹配的记录（结构化数组，按写入顺序），供向量化分析
+        parts = list(self._scan(start, end, robot_id, kinds))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=self.RECORD)
+    
+    def replay(self, start: Optional[datetime] = None, end: Optional[datetime] = None, robot_id: Optional[str] = None,
+               kinds: Optional[Set[int]] = None) -> Iterator[Dict]:
+        # 按写入顺序逐条回放匹配的记录（解码字符串与时间戳）
+        for records in self._scan(start, end, robot_id, kinds):
+            for record in records:
+                yield self.decode(record)
+    
+    def decode(self, record: np.void) -> Dict:
+        timestamp, kind, robot, subject, state, x, y, value, extra, _ = record.item()
+        return {
+            "kind": self.KIND_NAMES[kind],
+            "timestamp": datetime.fromtimestamp(timestamp),
+            "robot_id": self._string(robot),
+            "subject": self._string(subject),
+            "state": self._string(state),
+            "position": None if np.isnan(x) else (x, y),
+            "value": value,
+            "extra": extra
+        }
+    
+    def close(self):
+        # 写入缓冲记录并关闭所有映射（调用方仍持有视图的映射在视图释放后由垃圾回收解除）
+        self.flush()
+        self._retired.extend(mapping for _, mapping in self._maps.values())
+        self._maps.clear()
+        self._unmap()
+        self._retired.clear()
+    
+    def __len__(self):
+        return self.count + len(self.pending)
+
 class DataTransmissionModule:
-    def __init__(self, llm: LLMInterface):
+    UPLINK = "uplink"  # 上行链路消费者（向中央服务器发送通道消息）
+    
+    def __init__(self, llm: LLMInterface, t_capacity: int = 4096, b_capacity: int = 1024,
+                 keyframe_interval: int = 50, link_rate: float = 100.0):
         self.llm = llm
-        self.t_bot_channel = []  # T类机器人通信通道
-        self.b_bot_channel = []  # B类机器人通信通道
-        self.bot_status_cache = {}  # 缓存机器人状态
+        # T类通道不丢消息（满时背压），B类通道每台机器人只保留最新摘要
+        self.t_bot_channel = RingChannel(t_capacity, "never")  # T类机器人通信通道
+        self.b_bot_channel = RingChannel(b_capacity, "coalesce")  # B类机器人通信通道
+        for channel in (self.t_bot_channel, self.b_bot_channel):
+            channel.subscribe(self.UPLINK)
+        self.codec = StatusCodec()  # 上行链路二进制编码
+        self.delta_encoder = DeltaEncoder(keyframe_interval)  # 发送端：相对已确认基线的增量编码
+        self.scheduler = TransmissionScheduler(link_rate)  # 按通信频率与链路容量放行上行消息
+        self.connection_monitor = FleetConnectionMonitor()  # 全队超时判定与邻居查找
+        self.predictor = FleetKalmanPredictor()  # 失联机器人位置估计（由接收到的位置上报驱动）
+        self.uplink_bytes = 0  # 上行链路累计发送字节数
+        self.transport: Optional[LoopbackUplink] = None  # 回环网络上行链路（创建LoopbackUplink时挂接）
+        # 接收端（中央服务器）：解码上行批次并重建完整状态
+        self.uplink_decoder = StatusCodec()
+        self.delta_decoder = DeltaDecoder()
+        self.bot_status_cache = StatusCache()  # 缓存机器人状态（接收端重建的完整状态，按类别TTL过期）
         self.communication_strategy = {
             "t_bot_frequency": 10.0,  # Hz
             "b_bot_frequency": 2.0    # Hz
@@ -21,6 +1376,11 @@ class DataTransmissionModule:
         else:
             # 恢复正常频率
             self.communication_strategy["b_bot_frequency"] = min(2.0, self.communication_strategy["b_bot_frequency"] * 1.1)
+        
+        # 发送调度器按新频率与链路状态限速
+        self.scheduler.configure(self.communication_strategy, env.communication_status)
+        if self.transport is not None:
+            self.transport.configure(self.communication_strategy, env.communication_status)
     
     def t_bot_transmit(self, robot: Robot, task_status: Dict, timestamp: datetime) -> Dict:
         # T类机器人通信：简化语义生成
@@ -36,12 +1396,8 @@ class DataTransmissionModule:
             "priority": task_status.get("priority", TaskPriority.HIGH)
         }
         
-        # 加入到T类通道
-        self.t_bot_channel.append(compressed_data)
-        self.bot_status_cache[robot.robot_id] = {
-            "data": compressed_data,
-            "timestamp": timestamp
-        }
+        # 加入到T类通道（通道满时拒绝写入并计入rejected），状态缓存在上行链路接收时更新
+        self.t_bot_channel.put(compressed_data, robot.robot_id)
         
         return compressed_data
     
@@ -58,15 +1414,65 @@ class DataTransmissionModule:
             "environment_sensors": status_summary.get("sensors", {})
         }
         
-        # 加入到B类通道
-        self.b_bot_channel.append(summary_data)
-        self.bot_status_cache[robot.robot_id] = {
-            "data": summary_data,
-            "timestamp": timestamp
-        }
+        # 加入到B类通道（同一机器人未发送的旧摘要被新摘要替换），状态缓存在上行链路接收时更新
+        self.b_bot_channel.put(summary_data, robot.robot_id)
         
         return summary_data
     
+    def drain_uplink(self, max_items: Optional[int] = None) -> Dict[str, List[Dict]]:
+        # 上行链路取走两个通道中未发送的消息
+        return {
+            "t_bot": self.t_bot_channel.read(self.UPLINK, max_items),
+            "b_bot": self.b_bot_channel.read(self.UPLINK, max_items)
+        }
+    
+    def encode_uplink(self, now: Optional[datetime] = None) -> bytearray:
+        # 由发送调度器放行通道中的消息，按已确认基线转为关键帧/增量后编码为一个二进制批次
+        t_sent, b_sent = self.scheduler.schedule(self.t_bot_channel, self.b_bot_channel, self.UPLINK,
+                                                 (now or clock.now()).timestamp())
+        frames = [self.delta_encoder.encode(packet) for packet in t_sent + b_sent]
+        payload = self.codec.encode_batch(frames)
+        self.uplink_bytes += len(payload)
+        return payload
+    
+    def receive_uplink(self, payload) -> List[Dict]:
+        # 接收端：重建完整状态写入bot_status_cache，并向发送端确认（基线缺失的机器人要求关键帧）
+        states, acks, lost = self._accept(self.uplink_decoder.decode_batch(payload))
+        self.delta_encoder.ack(acks, lost)
+        return states
+    
+    def receive_datagram(self, payload) -> List[Dict]:
+        # 接收端：处理经网络传输的独立编码报文（自带字符串表、只含完整状态，无需确认）
+        return self._accept(StatusCodec().decode_batch(payload))[0]
+    
+    def _accept(self, frames: List[Dict]) -> Tuple[List[Dict], Dict[str, int], Set[str]]:
+        # 重建完整状态写入bot_status_cache并更新位置估计，返回(状态, 各机器人确认序号, 基线缺失的机器人)
+        acks, lost, states = {}, set(), []
+        for frame in frames:
+            state = self.delta_decoder.apply(frame)
+            if state is None:
+                lost.add(frame["robot_id"])
+                continue
+            acks[frame["robot_id"]] = frame["seq"]
+            self.bot_status_cache.put(frame["robot_id"], {
+                "data": state,
+                "timestamp": state["timestamp"]
+            })
+            states.append(state)
+        if states:
+            self.predictor.observe([s["robot_id"] for s in states],
+                                   np.array([s["timestamp"].timestamp() for s in states]),
+                                   np.array([s["position"] for s in states], dtype=float))
+        return states, acks, lost
+    
+    def transmission_metrics(self) -> Dict[str, Dict]:
+        # 各类别实际发送速率与积压
+        return self.scheduler.metrics()
+    
+    def channel_stats(self) -> Dict[str, Dict]:
+        # 通道占用与丢弃计数
+        return {"t_bot": self.t_bot_channel.stats(), "b_bot": self.b_bot_channel.stats()}
+    
     def check_robot_connection(self, robot: Robot, current_time: datetime) -> bool:
         # 检查机器人连接状态
         time_since_last_comm = (current_time - robot.last_comm_time).total_seconds()
@@ -79,20 +1485,38 @@ class DataTransmissionModule:
             
         return time_since_last_comm < timeout
     
+    def handle_disconnections(self, robots: List[Robot], current_time: datetime) -> List[Dict]:
+        # 全队一次判定超时，对每个失联机器人按空间哈希找在线邻居（距离小于10单位）并做语义补偿
+        monitor = self.connection_monitor
+        monitor.sync(robots)
+        connected = monitor.connected_mask(current_time)
+        if connected.all():
+            return []
+        monitor.index(connected)
+        slots = np.flatnonzero(~connected).tolist()
+        lost = [monitor.robots[slot] for slot in slots]
+        means, covs = self.predictor.predict(lost, current_time)
+        return [self._compensate(robot, monitor.neighbors(slot), current_time, (mean, cov))
+                for robot, slot, mean, cov in zip(lost, slots, means, covs)]
+    
     def handle_disconnected_robot(self, robot: Robot, all_robots: List[Robot], current_time: datetime) -> Dict:
-        # 处理失联机器人：预测性语义补偿
-        # 找到邻近机器人
-        neighbors = []
-        for r in all_robots:
-            if r.robot_id != robot.robot_id and self.check_robot_connection(r, current_time):
-                dx = robot.position[0] - r.position[0]
-                dy = robot.position[1] - r.position[1]
-                distance = (dx**2 + dy**2)**0.5
-                if distance < 10.0:  # 距离小于10单位视为邻近
-                    neighbors.append(r)
-        
-        # 使用LLM预测状态
+        # 处理单个失联机器人：预测性语义补偿
+        monitor = self.connection_monitor
+        if all(r.robot_id != robot.robot_id for r in all_robots):
+            all_robots = list(all_robots) + [robot]
+        monitor.sync(all_robots)
+        monitor.index(monitor.connected_mask(current_time))
+        slot = next(i for i, r in enumerate(monitor.robots) if r.robot_id == robot.robot_id)
+        means, covs = self.predictor.predict([robot], current_time)
+        return self._compensate(robot, monitor.neighbors(slot), current_time, (means[0], covs[0]))
+    
+    def _compensate(self, robot: Robot, neighbors: List[Robot], current_time: datetime,
+                    estimate: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+        # 使用LLM预测状态，给出滤波器估计时以其位置与不确定度代替邻居均值
         predicted_status = self.llm.predict_robot_status(robot, neighbors, current_time)
+        if estimate is not None:
+            mean, cov = estimate
+            predicted_status["position"] = (float(mean[0]), float(mean[1]))
         
         # 生成替代语义包
         replacement_data = {
@@ -102,24 +1526,24 @@ class DataTransmissionModule:
             "predicted_position": predicted_status["position"],
             "predicted_status": predicted_status["status"],
             "predicted_battery": predicted_status["estimated_battery"],
+            "position_std": float(np.sqrt(np.trace(estimate[1]) / 2)) if estimate is not None else None,
             "last_known_position": robot.position,
             "last_communication": robot.last_comm_time
         }
         
         # 更新缓存
-        self.bot_status_cache[robot.robot_id] = {
+        self.bot_status_cache.put(robot.robot_id, {
             "data": replacement_data,
             "timestamp": current_time,
             "predicted": True
-        }
+        }, robot.robot_type)
         
         return replacement_data
     
     def get_robot_status(self, robot_id: str, current_time: datetime) -> Optional[Dict]:
-        # 获取机器人状态，处理可能的失联情况
-        if robot_id in self.bot_status_cache:
-            status = self.bot_status_cache[robot_id]
-            # 检查数据是否过期
-            if (current_time - status["timestamp"]).total_seconds() < 30:
-                return status["data"]
-        return None
\ No newline at end of file
+        # 获取机器人状态，过期或未缓存返回None
+        return self.bot_status_cache.lookup(robot_id, current_time)
+    
+    def get_many(self, robot_ids: List[str], current_time: datetime) -> Dict[str, Optional[Dict]]:
+        # 批量获取机器人状态（看板、调度用）
+        return self.bot_status_cache.get_many(robot_ids, current_time)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface
+from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface,clock
 
 #此部分负责用大模型翻译人类指令 和 安全检查
 
@@ -163,14 +163,14 @@ class HumanRobotInteractionModule:
                     "success": True,
                     "action": action,
                     "new_position": target_pos,
-                    "timestamp": datetime.now()
+                    "timestamp": clock.now()
                 }
             else:
                 return {
                     "success": False,
                     "action": action,
                     "reason": "缺少目标位置",
-                    "timestamp": datetime.now()
+                    "timestamp": clock.now()
                 }
         
         elif action_type == "perform_task":
@@ -180,7 +180,7 @@ class HumanRobotInteractionModule:
                 "success": True,
                 "action": action,
                 "task_id": task_id,
-                "timestamp": datetime.now()
+                "timestamp": clock.now()
             }
         
         elif action_type == "stop":
@@ -189,7 +189,7 @@ class HumanRobotInteractionModule:
                 "success": True,
                 "action": action,
                 "status": "stopped",
-                "timestamp": datetime.now()
+                "timestamp": clock.now()
             }
         
         else:
@@ -197,7 +197,7 @@ class HumanRobotInteractionModule:
                 "success": False,
                 "action": action,
                 "reason": "未知动作类型",
-                "timestamp": datetime.now()
+                "timestamp": clock.now()
             }
     
     def _distance(self, pos1: Tuple[float, float], pos2: Tuple[float, float]) -> float:
@@ -1,5 +1,8 @@
-from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface
-def run_simulation():
+import asyncio
+import multiprocessing
+import os
+from IANIvic import TaskPriority,RobotType,Task,Robot,HospitalEnv,LMInterface,EventSimulator,clock
+def _build_hospital_env() -> HospitalEnv:
     # 创建医院环境
     rooms = {
         "nurse_station": (10, 10),
@@ -42,9 +45,12 @@ def run_simulation():
     env = HospitalEnv(rooms, obstacles, infection_zones, human_traffic)
     # 设置初始通信状态
     env.update_communication_status(bandwidth=90.0, packet_loss=5.0)
-    
-    # 创建IANI框架
-    iani_system = IANIFramework(env)
+    return env
+
+def _build_iani_system(env: HospitalEnv, telemetry: Optional[TelemetryLog] = None) -> IANIFramework:
+    # 创建IANI框架并添加机器人（2台T细胞、3台B细胞，初始位于护士站）
+    rooms = env.rooms
+    iani_system = IANIFramework(env, telemetry)
     
     # 添加机器人
     iani_system.add_robot(Robot(
@@ -81,6 +87,11 @@ def run_simulation():
         position=rooms["nurse_station"],
         capabilities=["消毒", "清洁", "物资运输"]
     ))
+    return iani_system
+
+def run_simulation():
+    env = _build_hospital_env()
+    iani_system = _build_iani_system(env)
     
     # 打印初始状态
     print("=== 初始系统状态 ===")
@@ -158,7 +169,8 @@ def run_simulation():
     # 模拟B2机器人通信中断
     print("=== 模拟B2机器人通信中断 ===")
     b2 = next(r for r in iani_system.robots if r.robot_id == 'B2')
-    b2.last_comm_time = datetime.now() - timedelta(seconds=40)  # 40秒前最后通信
+    b2.last_comm_time = clock.now() - timedelta(seconds=40)  # 40秒前最后通信
+    iani_system.scheduling_module.eligibility_index.update(b2)  # 通信时间变化，刷新招募资格索引
     print()
     
     # 再运行几步
@@ -178,6 +190,654 @@ def run_simulation():
     print("各机器人状态:")
     for robot in final_status['robot_statuses']:
         print(f"  {robot['robot_id']}: {robot['status']}, 电池: {robot['battery_level']}%")
+    iani_system.close()
+
+def _simulate_makespan(task_specs: List[Dict], lookahead: bool, robot_count: int) -> float:
+    # 用虚拟时钟驱动TaskSchedulingModule，返回全部任务完成时的总工期
+    llm = LLMInterface()
+    scheduling_module = TaskSchedulingModule(llm, DataTransmissionModule(llm), lookahead=lookahead)
+    robots = [
+        Robot(f"B{i + 1}", RobotType.B_CELL, (0, 0), ["消毒", "护理", "物资运输"])
+        for i in range(robot_count)
+    ]
+    for spec in task_specs:
+        scheduling_module.add_task(Task(
+            task_id=spec["task_id"],
+            description=spec["description"],
+            priority=TaskPriority.MEDIUM,
+            location=(0, 0),
+            estimated_duration=spec["duration"],
+            dependencies=spec["dependencies"]
+        ))
+    
+    clock = 0.0
+    finish_times = {}  # robot_id: 当前任务完成的虚拟时刻
+    while any(t.status != "completed" for t in scheduling_module.tasks.values()):
+        scheduling_module.schedule_tasks(robots, None)
+        for robot in robots:
+            if robot.status == "busy" and robot.robot_id not in finish_times:
+                finish_times[robot.robot_id] = clock + robot.current_task.estimated_duration
+        if not finish_times:
+            break  # 剩余任务无法分配
+        robot_id = min(finish_times, key=finish_times.get)
+        clock = finish_times.pop(robot_id)
+        robot = next(r for r in robots if r.robot_id == robot_id)
+        scheduling_module.process_task_feedback(robot_id, {
+            "task_id": robot.current_task.task_id,
+            "status": "completed",
+            "robots": robots
+        })
+    return clock
+
+def benchmark_lookahead_makespan(trials: int = 50, chains: int = 3, fillers: int = 6,
+                                 robot_count: int = 3, seed: int = 0) -> Dict:
+    # 关键路径前瞻调度基准：样本运输链（pick_sample → deliver_sample → lab_analysis）
+    # 与独立消毒任务混合，比较基线拓扑序调度和零松弛优先调度的总工期
+    rng = random.Random(seed)
+    makespans = {False: [], True: []}
+    for trial in range(trials):
+        task_specs = []
+        for c in range(chains):
+            pick_id, deliver_id, analysis_id = f"pick_sample_{c}", f"deliver_sample_{c}", f"lab_analysis_{c}"
+            task_specs.append({"task_id": pick_id, "description": "采集样本",
+                               "duration": rng.uniform(2, 4), "dependencies": []})
+            task_specs.append({"task_id": deliver_id, "description": "运送样本至检验科",
+                               "duration": rng.uniform(3, 6), "dependencies": [pick_id]})
+            task_specs.append({"task_id": analysis_id, "description": "样本检验",
+                               "duration": rng.uniform(2, 5), "dependencies": [deliver_id]})
+        for f in range(fillers):
+            task_specs.append({"task_id": f"disinfect_{f}", "description": "常规消毒",
+                               "duration": rng.uniform(3, 6), "dependencies": []})
+        rng.shuffle(task_specs)
+        for lookahead in (False, True):
+            makespans[lookahead].append(_simulate_makespan(task_specs, lookahead, robot_count))
+    
+    baseline = sum(makespans[False]) / trials
+    lookahead = sum(makespans[True]) / trials
+    improvement = 100 * (baseline - lookahead) / baseline if baseline else 0.0
+    print("=== 关键路径前瞻调度基准 ===")
+    print(f"场景: {trials}组, 每组{chains}条样本运输链 + {fillers}个消毒任务, {robot_count}台机器人")
+    print(f"平均总工期: 基线={baseline:.2f}, 前瞻={lookahead:.2f}, 缩短{improvement:.1f}%")
+    return {"baseline_makespan": baseline, "lookahead_makespan": lookahead, "improvement_percent": improvement}
+
+def _simulate_shift(hours: float, tick: float, command_interval: float, seed: int,
+                    telemetry: Optional[TelemetryLog] = None) -> Tuple[IANIFramework, EventSimulator, float]:
+    # 虚拟时钟驱动一个病区班次（通信节拍与医护指令均为事件），返回(框架, 仿真器, 墙钟耗时)
+    rng = random.Random(seed)
+    env = _build_hospital_env()
+    iani_system = _build_iani_system(env, telemetry)
+    for robot in iani_system.robots:
+        robot.path = [robot.position]  # 静止机器人的路径即当前位置（路径冲突检测按非空路径比较）
+    simulator = EventSimulator()
+    # 指令发往走廊同侧可达的区域（病房位于两道墙之间，当前地图下不可达）
+    commands = [
+        ("请对护士站进行常规消毒", "nurse_station"),
+        ("请对物资室进行清洁", "supply_room"),
+        ("护士站患者情况恶化，需要紧急抢救", "nurse_station"),
+    ]
+    
+    def issue_command():
+        command, location = rng.choice(commands)
+        iani_system.process_human_command(command, {"location": location})
+    
+    iani_system.schedule_ticks(simulator, interval=tick)
+    simulator.every(command_interval, issue_command, delay=rng.uniform(0, command_interval))
+    start = time.perf_counter()
+    try:
+        simulator.run(until=hours * 3600)
+    finally:
+        iani_system.close()
+    return iani_system, simulator, time.perf_counter() - start
+
+def benchmark_event_simulation(hours: float = 8.0, tick: float = 5.0, command_interval: float = 600.0,
+                               seed: int = 0) -> Dict:
+    # 离散事件仿真基准：虚拟时钟驱动一个病区班次，通信节拍与医护指令均为事件，统计仿真速度
+    iani_system, simulator, elapsed = _simulate_shift(hours, tick, command_interval, seed)
+    status = iani_system.get_system_status()
+    simulated_days_per_minute = (hours / 24) / (elapsed / 60) if elapsed else float("inf")
+    print("=== 离散事件仿真基准 ===")
+    print(f"仿真时长: {hours}小时 ({simulator.now()}), 事件数: {simulator.processed}, 节拍间隔: {tick}秒")
+    print(f"任务: 共{status['task_count']}个, 已完成{status['completed_tasks']}个, 待处理{status['pending_tasks']}个")
+    print(f"墙钟耗时: {elapsed:.2f}秒, 约每分钟仿真{simulated_days_per_minute:.1f}天")
+    return {"events": simulator.processed, "wall_seconds": elapsed, "completed_tasks": status["completed_tasks"],
+            "simulated_days_per_minute": simulated_days_per_minute}
+
+def benchmark_channel_memory(days: float = 2.0, robots: int = 10, rate: float = 1.0,
+                             uplink_interval: float = 5.0) -> Dict:
+    # 通道内存基准：虚拟时钟下每台机器人每秒发送rate条状态，上行链路每uplink_interval秒取走一次
+    # 对比原列表通道（只追加不取出）与定长环形通道的内存占用（tracemalloc按小时采样）
+    import tracemalloc
+    class ListChannel(list):
+        # 原实现：只追加、无人取出的列表通道
+        def put(self, message: Dict, key: Any = None) -> bool:
+            self.append(message)
+            return True
+    
+    env = _build_hospital_env()
+    bots = [Robot(f"{'T' if i % 2 == 0 else 'B'}{i + 1}", RobotType.T_CELL if i % 2 == 0 else RobotType.B_CELL,
+                  env.rooms["nurse_station"], []) for i in range(robots)]
+    results = {}
+    for label, hours in [("列表通道", 1.0), ("环形通道", days * 24)]:
+        tracemalloc.start()
+        data_module = DataTransmissionModule(LLMInterface())
+        if label == "列表通道":
+            data_module.t_bot_channel, data_module.b_bot_channel = ListChannel(), ListChannel()
+        simulator = EventSimulator()
+        samples = []
+        
+        def transmit():
+            now = clock.now()
+            for bot in bots:
+                if bot.robot_type == RobotType.T_CELL:
+                    data_module.t_bot_transmit(bot, {"task_id": "task_1", "progress": 50}, now)
+                else:
+                    data_module.b_bot_transmit(bot, {"pending_tasks": ["task_1"]}, now)
+        
+        simulator.every(1.0 / rate, transmit)
+        if label == "环形通道":
+            simulator.every(uplink_interval, data_module.drain_uplink)
+        simulator.every(3600.0, lambda: samples.append(tracemalloc.get_traced_memory()[0]))
+        try:
+            simulator.run(until=hours * 3600)
+        finally:
+            tracemalloc.stop()
+        results[label] = {"hours": hours, "samples": samples,
+                          "stats": data_module.channel_stats() if label == "环形通道" else None}
+    
+    baseline = results["列表通道"]["samples"][-1]
+    ring = results["环形通道"]["samples"]
+    print("=== 通道内存基准 ===")
+    print(f"{robots}台机器人，每台{rate}条/秒，上行链路每{uplink_interval}秒发送一次")
+    print(f"列表通道: 1小时后占用{baseline / 1e6:.1f}MB（线性增长，{days}天约{baseline * days * 24 / 1e9:.1f}GB）")
+    print(f"环形通道: 1小时后{ring[0] / 1e6:.2f}MB，{days}天后{ring[-1] / 1e6:.2f}MB，峰值{max(ring) / 1e6:.2f}MB")
+    for name, stats in results["环形通道"]["stats"].items():
+        print(f"{name}: {stats}")
+    return results
+
+def benchmark_wire_format(n_packets: int = 20000, robots: int = 20, batch_size: int = 200, seed: int = 0) -> Dict:
+    # 状态包编码基准：相同T类/B类状态包分别以JSON与二进制批次编码，比较每包字节数与编解码吞吐
+    rng = random.Random(seed)
+    data_module = DataTransmissionModule(LLMInterface())
+    bots = [Robot(f"{'T' if i % 2 == 0 else 'B'}{i + 1}", RobotType.T_CELL if i % 2 == 0 else RobotType.B_CELL,
+                  (0.0, 0.0), []) for i in range(robots)]
+    start_time = clock.now()
+    packets = []
+    for i in range(n_packets):
+        bot = bots[i % robots]
+        bot.position = (round(rng.uniform(0, 60), 1), round(rng.uniform(0, 40), 1))
+        bot.battery_level = rng.uniform(20, 100)
+        timestamp = start_time + timedelta(seconds=i * 0.1)
+        task_id = f"task_{rng.randint(1, 300)}"
+        if bot.robot_type == RobotType.T_CELL:
+            packets.append(data_module.t_bot_transmit(bot, {"task_id": task_id, "progress": rng.uniform(0, 100),
+                                                             "priority": rng.randint(0, 3)}, timestamp))
+        else:
+            packets.append(data_module.b_bot_transmit(bot, {"pending_tasks": [task_id],
+                                                             "sensors": {"battery": bot.battery_level,
+                                                                         "position": bot.position}}, timestamp))
+    batches = [packets[i:i + batch_size] for i in range(0, n_packets, batch_size)]
+    
+    start = time.perf_counter()
+    json_batches = [json.dumps(batch, default=str, ensure_ascii=False).encode("utf-8") for batch in batches]
+    json_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for payload in json_batches:
+        json.loads(payload)
+    json_decode = time.perf_counter() - start
+    
+    encoder, decoder = StatusCodec(), StatusCodec()
+    start = time.perf_counter()
+    binary_batches = [encoder.encode_batch(batch) for batch in batches]
+    binary_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = [packet for payload in binary_batches for packet in decoder.decode_batch(payload)]
+    binary_decode = time.perf_counter() - start
+    
+    # 解码结果应与原包一致（float32坐标、0.1%电量精度内）
+    lossless = all(
+        a["robot_id"] == b["robot_id"] and a["timestamp"] == b["timestamp"]
+        and abs(a["position"][0] - b["position"][0]) < 1e-4 and abs(a["battery"] - b["battery"]) < 0.051
+        and a.get("task_id") == b.get("task_id") and a.get("pending_tasks") == b.get("pending_tasks")
+        for a, b in zip(packets, decoded)
+    )
+    json_size = sum(map(len, json_batches))
+    binary_size = sum(map(len, binary_batches))
+    print("=== 状态包编码基准 ===")
+    print(f"{n_packets}个状态包（{robots}台机器人），每批{batch_size}个，解码一致: {lossless}")
+    print(f"JSON: 每包{json_size / n_packets:.1f}字节，编码{n_packets / json_encode:,.0f}包/秒，解码{n_packets / json_decode:,.0f}包/秒")
+    print(f"二进制: 每包{binary_size / n_packets:.1f}字节（{json_size / binary_size:.1f}倍压缩），"
+          f"编码{n_packets / binary_encode:,.0f}包/秒，解码{n_packets / binary_decode:,.0f}包/秒")
+    return {"json_bytes": json_size, "binary_bytes": binary_size, "lossless": lossless,
+            "json_encode_pps": n_packets / json_encode, "json_decode_pps": n_packets / json_decode,
+            "binary_encode_pps": n_packets / binary_encode, "binary_decode_pps": n_packets / binary_decode}
+
+def benchmark_delta_updates(robots: int = 10, updates: int = 2000, move_probability: float = 0.7,
+                            loss: float = 0.1, seed: int = 0) -> Dict:
+    # 增量状态基准：B类机器人按限流后频率（0.5Hz）上报状态，每次大多只移动一格、电量略降
+    # 对比JSON完整包、二进制完整包与增量包的B类通道字节数；并在批次丢包率loss下核对接收端重建状态
+    rng = random.Random(seed)
+    bots = [Robot(f"B{i + 1}", RobotType.B_CELL, (float(2 * i), 5.0), []) for i in range(robots)]
+    interval = 1 / 0.5  # 限流后的B类上报周期(秒)
+    start_time = clock.now()
+    rounds = []
+    for step in range(updates // robots):
+        timestamp = start_time + timedelta(seconds=step * interval)
+        snapshot = []
+        for bot in bots:
+            if rng.random() < move_probability:
+                dx, dy = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+                bot.position = (bot.position[0] + dx, bot.position[1] + dy)
+                bot.update_battery(0.5)
+            if rng.random() < 0.02:
+                bot.status = rng.choice(["idle", "busy"])
+            snapshot.append((bot, {"pending_tasks": [f"task_{step // 50}"] if bot.status == "busy" else [],
+                                   "sensors": {"battery": bot.battery_level, "position": bot.position}}, timestamp))
+        rounds.append(snapshot)
+    
+    results = {}
+    for label, keyframe_interval, loss_rate in [("二进制完整包", 0, 0.0), ("增量包", 50, 0.0),
+                                                (f"增量包({loss:.0%}丢包)", 50, loss)]:
+        link = random.Random(seed)
+        data_module = DataTransmissionModule(LLMInterface(), keyframe_interval=keyframe_interval)
+        json_bytes = 0
+        mismatched = 0
+        for snapshot in rounds:
+            for bot, summary, timestamp in snapshot:
+                packet = data_module.b_bot_transmit(bot, summary, timestamp)
+                json_bytes += len(json.dumps(packet, default=str, ensure_ascii=False).encode("utf-8"))
+            payload = data_module.encode_uplink(timestamp)
+            if link.random() >= loss_rate:
+                data_module.receive_uplink(payload)
+            # 接收端状态应与最近一次成功送达的状态一致（坐标误差不超过量化步长的一半）
+        for bot in bots:
+            cached = data_module.bot_status_cache[bot.robot_id]["data"]
+            sent = data_module.delta_encoder.acked[bot.robot_id][1]
+            if (abs(cached["position"][0] - sent["position"][0]) > 0.051
+                    or abs(cached["position"][1] - sent["position"][1]) > 0.051
+                    or cached["pending_tasks"] != sent["pending_tasks"] or cached["status"] != sent["status"]):
+                mismatched += 1
+        results[label] = {"json_bytes": json_bytes, "bytes": data_module.uplink_bytes,
+                          "keyframes": data_module.delta_encoder.keyframes, "deltas": data_module.delta_encoder.deltas,
+                          "mismatched": mismatched}
+    
+    n = len(rounds) * robots
+    json_bytes = results["二进制完整包"]["json_bytes"]
+    print("=== 增量状态基准 ===")
+    print(f"{robots}台B类机器人，{n}次状态上报（每{interval:.0f}秒一次），移动概率{move_probability:.0%}")
+    print(f"JSON完整包: 每次上报{json_bytes / n:.1f}字节")
+    for label, r in results.items():
+        print(f"{label}: 每次上报{r['bytes'] / n:.1f}字节（JSON的1/{json_bytes / r['bytes']:.1f}），"
+              f"关键帧{r['keyframes']}个，增量{r['deltas']}个，接收端状态不一致{r['mismatched']}台")
+    return results
+
+def benchmark_transmission_scheduler(phase_seconds: float = 60.0, tick: float = 0.05, t_robots: int = 2,
+                                     b_robots: int = 20, t_offered_hz: float = 10.0, b_offered_hz: float = 5.0,
+                                     link_rate: float = 100.0) -> Dict:
+    # 发送调度基准：T类按配置频率（10Hz）、B类按高于配置频率的5Hz提交状态，
+    # 先在良好链路、再在降级链路（带宽40%、丢包30%）下各运行phase_seconds秒，统计各类实际发送速率
+    env = _build_hospital_env()
+    env.update_communication_status(bandwidth=100.0, packet_loss=0.0)
+    data_module = DataTransmissionModule(LLMInterface(), link_rate=link_rate)
+    bots = ([Robot(f"T{i + 1}", RobotType.T_CELL, (float(i), 0.0), []) for i in range(t_robots)]
+            + [Robot(f"B{i + 1}", RobotType.B_CELL, (float(i), 5.0), []) for i in range(b_robots)])
+    start_time = clock.now()
+    ticks_per_phase = int(phase_seconds / tick)
+    b_every = max(1, round(1 / (b_offered_hz * tick)))
+    t_every = max(1, round(1 / (t_offered_hz * tick)))
+    
+    phases = {}
+    for phase, (bandwidth, packet_loss) in enumerate([(100.0, 0.0), (40.0, 30.0)]):
+        env.update_communication_status(bandwidth=bandwidth, packet_loss=packet_loss)
+        before = {cls: dict(c) for cls, c in data_module.scheduler.counters.items()}
+        for i in range(ticks_per_phase):
+            n = phase * ticks_per_phase + i
+            now = start_time + timedelta(seconds=n * tick)
+            if n % round(1 / tick) == 0:
+                data_module.adjust_communication_strategy(env)  # 与step相同，每秒调整一次通信策略
+            for bot in bots:
+                if bot.robot_type == RobotType.T_CELL and n % t_every == 0:
+                    data_module.t_bot_transmit(bot, {"task_id": "task_1", "progress": 50}, now)
+                elif bot.robot_type == RobotType.B_CELL and n % b_every == 0:
+                    data_module.b_bot_transmit(bot, {"pending_tasks": ["task_1"]}, now)
+            data_module.receive_uplink(data_module.encode_uplink(now))
+        metrics = data_module.transmission_metrics()
+        phases[f"带宽{bandwidth:.0f}%/丢包{packet_loss:.0f}%"] = {
+            "capacity": metrics["link"]["capacity"],
+            **{cls: {"configured_hz": metrics[cls]["configured_hz"],
+                     "offered_hz": (data_module.scheduler.counters[cls]["offered"] - before[cls]["offered"])
+                                   / phase_seconds / metrics[cls]["robots"],
+                     "achieved_hz": (data_module.scheduler.counters[cls]["sent"] - before[cls]["sent"])
+                                    / phase_seconds / metrics[cls]["robots"],
+                     "coalesced": data_module.scheduler.counters[cls]["coalesced"] - before[cls]["coalesced"],
+                     "held": metrics[cls]["held"]}
+               for cls in ("t_bot", "b_bot")}
+        }
+    
+    print("=== 发送调度基准 ===")
+    print(f"T类{t_robots}台（提交{t_offered_hz:.0f}Hz），B类{b_robots}台（提交{b_offered_hz:.0f}Hz），"
+          f"链路满带宽容量{link_rate:.0f}条/秒，T类保留{data_module.scheduler.t_reserve:.0%}")
+    for label, r in phases.items():
+        sent = sum(r[cls]["achieved_hz"] * n for cls, n in (("t_bot", t_robots), ("b_bot", b_robots)))
+        print(f"{label}: 有效容量{r['capacity']:.0f}条/秒，实际发送{sent:.1f}条/秒")
+        for cls, name in (("t_bot", "T类"), ("b_bot", "B类")):
+            c = r[cls]
+            print(f"  {name}: 配置{c['configured_hz']:.2f}Hz，提交{c['offered_hz']:.1f}Hz，实际{c['achieved_hz']:.2f}Hz/台，"
+                  f"合并{c['coalesced']}条，积压{c['held']}条")
+    channels = data_module.channel_stats()
+    print(f"T类通道拒绝写入{channels['t_bot']['rejected']}条")
+    return phases
+
+def benchmark_disconnect_detection(fleet_sizes: Tuple[int, ...] = (200, 1000, 4000), disconnected: float = 0.2,
+                                   area: float = 300.0, seed: int = 0) -> Dict:
+    # 失联检测基准：逐个检查 + 失联时全队再扫一遍找邻居（原实现）对比向量化超时判定 + 空间哈希邻居查找
+    rng = random.Random(seed)
+    llm = LLMInterface()
+    now = clock.now()
+    results = {}
+    for n in fleet_sizes:
+        data_module = DataTransmissionModule(llm)
+        bots = []
+        for i in range(n):
+            robot_type = RobotType.T_CELL if i % 2 == 0 else RobotType.B_CELL
+            bot = Robot(f"R{i + 1}", robot_type, (rng.uniform(0, area), rng.uniform(0, area)), [])
+            timeout = 5.0 if robot_type == RobotType.T_CELL else 15.0
+            lost = rng.random() < disconnected
+            bot.last_comm_time = now - timedelta(seconds=rng.uniform(timeout, 60) if lost else rng.uniform(0, timeout * 0.9))
+            bots.append(bot)
+        
+        start = time.perf_counter()
+        legacy = []
+        for robot in bots:
+            if not data_module.check_robot_connection(robot, now):
+                neighbors = [r for r in bots if r.robot_id != robot.robot_id
+                             and data_module.check_robot_connection(r, now)
+                             and ((robot.position[0] - r.position[0]) ** 2
+                                  + (robot.position[1] - r.position[1]) ** 2) ** 0.5 < 10.0]
+                means, covs = data_module.predictor.predict([robot], now)
+                legacy.append(data_module._compensate(robot, neighbors, now, (means[0], covs[0])))
+        legacy_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        vectorized = data_module.handle_disconnections(bots, now)
+        vectorized_time = time.perf_counter() - start
+        same = ([p["robot_id"] for p in legacy] == [p["robot_id"] for p in vectorized]
+                and all(np.allclose(a["predicted_position"], b["predicted_position"]) for a, b in zip(legacy, vectorized)))
+        results[n] = {"disconnected": len(vectorized), "legacy_ms": legacy_time * 1000,
+                      "vectorized_ms": vectorized_time * 1000, "same": same}
+    
+    print("=== 失联检测基准 ===")
+    for n, r in results.items():
+        print(f"{n}台机器人（失联{r['disconnected']}台）: 原实现{r['legacy_ms']:.1f}毫秒，"
+              f"向量化+空间哈希{r['vectorized_ms']:.1f}毫秒（{r['legacy_ms'] / r['vectorized_ms']:.0f}倍），结果一致: {r['same']}")
+    return results
+
+def benchmark_status_cache(active: int = 500, ticks: int = 1800, report_share: float = 0.25, churn: int = 1,
+                           seed: int = 0) -> Dict:
+    # 状态缓存基准：机器人持续上下线（每秒churn台退役、churn台加入），在线机器人每秒有report_share比例上报，
+    # 看板每秒批量读取全部在线机器人；对比原字典缓存（逐个判断过期、从不清理）与TTL缓存
+    rng = random.Random(seed)
+    start_time = clock.now()
+    cache = StatusCache(t_ttl=10.0, b_ttl=30.0)
+    legacy: Dict[str, Dict] = {}
+    fleet = [f"R{i}" for i in range(active)]
+    next_id = active
+    legacy_time = cache_time = 0.0
+    legacy_hits = 0
+    for tick in range(ticks):
+        now = start_time + timedelta(seconds=tick)
+        for _ in range(churn):
+            fleet.pop(rng.randrange(len(fleet)))
+            fleet.append(f"R{next_id}")
+            next_id += 1
+        for robot_id in rng.sample(fleet, int(len(fleet) * report_share)):
+            is_t = int(robot_id[1:]) % 2 == 0
+            data = {"robot_id": robot_id, "task_progress": 50} if is_t else {"robot_id": robot_id, "status": "idle"}
+            entry = {"data": data, "timestamp": now}
+            legacy[robot_id] = entry
+            cache.put(robot_id, entry)
+        
+        start = time.perf_counter()
+        view = {}
+        for robot_id in fleet:
+            status = legacy.get(robot_id)
+            view[robot_id] = status["data"] if status and (now - status["timestamp"]).total_seconds() < 30 else None
+        legacy_hits += sum(v is not None for v in view.values())
+        legacy_time += time.perf_counter() - start
+        start = time.perf_counter()
+        cache.get_many(fleet, now)
+        cache_time += time.perf_counter() - start
+    
+    stats = cache.stats()
+    print("=== 状态缓存基准 ===")
+    print(f"在线{active}台，每秒上下线{churn}台、上报{report_share:.0%}，看板每秒读取一次，共{ticks}秒")
+    print(f"原字典缓存: 条目{len(legacy)}个（含已退役机器人），每次看板读取{legacy_time / ticks * 1000:.2f}毫秒，"
+          f"命中{legacy_hits}次")
+    print(f"TTL缓存: 条目{stats['size']}个，过期记录{stats['expired']}个，堆{stats['heap']}项，每次看板读取{cache_time / ticks * 1000:.2f}毫秒，"
+          f"命中{stats['hits']}次、过期{stats['stale']}次、未命中{stats['misses']}次")
+    return {"legacy_entries": len(legacy), "legacy_ms": legacy_time / ticks * 1000,
+            "cache_ms": cache_time / ticks * 1000, **stats}
+
+def benchmark_disconnect_prediction(robots: int = 200, warmup: int = 30, outage: int = 60, lost_share: float = 0.3,
+                                    area: Tuple[float, float] = (60.0, 40.0), seed: int = 0) -> Dict:
+    # 失联位置预测基准：机器人沿随机规划路径以0.5±10%单位/秒行驶，前warmup秒全部在线、每秒上报带噪位置，
+    # 随后lost_share比例失联outage秒；逐秒对比邻居均值（LLMInterface.predict_robot_status）、
+    # 纯匀速卡尔曼、卡尔曼+路径先验三种估计与真实位置的误差，以及每秒预测全部失联机器人的耗时
+    rng = random.Random(seed)
+    llm = LLMInterface()
+    predictor = FleetKalmanPredictor()
+    start_time = clock.now()
+    bots, speeds = [], []
+    for i in range(robots):
+        start = (rng.uniform(0, area[0]), rng.uniform(0, area[1]))
+        path = [(rng.uniform(0, area[0]), rng.uniform(0, area[1])) for _ in range(rng.randint(2, 6))]
+        bot = Robot(f"R{i + 1}", RobotType.T_CELL if i % 2 == 0 else RobotType.B_CELL, start, [])
+        bot.path = path
+        bots.append(bot)
+        speeds.append(0.5 * rng.uniform(0.9, 1.1))
+    truth = {bot.robot_id: np.array(bot.position, dtype=float) for bot in bots}
+    
+    def advance(bot: Robot, speed: float):
+        # 沿剩余路径前进1秒（到达航点即弹出）
+        remaining = speed
+        while bot.path and remaining > 0:
+            target = np.array(bot.path[0], dtype=float)
+            gap = np.linalg.norm(target - truth[bot.robot_id])
+            if gap <= remaining:
+                truth[bot.robot_id] = target
+                bot.path.pop(0)
+                remaining -= gap
+            else:
+                truth[bot.robot_id] = truth[bot.robot_id] + (target - truth[bot.robot_id]) * remaining / gap
+                remaining = 0
+    
+    def report(group: List[Robot], now: datetime):
+        positions = np.array([truth[b.robot_id] + np.array([rng.gauss(0, 0.1), rng.gauss(0, 0.1)]) for b in group])
+        for bot, position in zip(group, positions):
+            bot.position = (float(position[0]), float(position[1]))
+            bot.last_comm_time = now
+        predictor.observe([b.robot_id for b in group], np.full(len(group), now.timestamp()), positions)
+    
+    for second in range(warmup + 1):
+        now = start_time + timedelta(seconds=second)
+        if second:
+            for bot, speed in zip(bots, speeds):
+                advance(bot, speed)
+        report(bots, now)
+    lost = [bot for bot in bots if rng.random() < lost_share]
+    lost_ids = {bot.robot_id for bot in lost}
+    online = [bot for bot in bots if bot.robot_id not in lost_ids]
+    # 失联后中央只知道最后已知位置与规划路径（路径副本），真实运动继续推进
+    plans = {bot.robot_id: Robot(bot.robot_id, bot.robot_type, bot.position, []) for bot in lost}
+    for bot in lost:
+        plans[bot.robot_id].path = list(bot.path)
+        plans[bot.robot_id].last_comm_time = bot.last_comm_time
+        plans[bot.robot_id].battery_level = bot.battery_level
+    known = [plans[bot.robot_id] for bot in lost]
+    
+    errors = {"neighbor_mean": [], "kalman": [], "kalman_path": []}
+    covered = 0
+    legacy_time = batch_time = 0.0
+    for second in range(warmup + 1, warmup + outage + 1):
+        now = start_time + timedelta(seconds=second)
+        for bot, speed in zip(bots, speeds):
+            advance(bot, speed)
+        report(online, now)
+        actual = np.array([truth[bot.robot_id] for bot in lost])
+        
+        start = time.perf_counter()
+        legacy = []
+        for robot in known:
+            neighbors = [r for r in online if ((robot.position[0] - r.position[0]) ** 2
+                                               + (robot.position[1] - r.position[1]) ** 2) ** 0.5 < 10.0]
+            legacy.append(llm.predict_robot_status(robot, neighbors, now)["position"])
+        legacy_time += time.perf_counter() - start
+        start = time.perf_counter()
+        means, covs = predictor.predict(known, now)
+        batch_time += time.perf_counter() - start
+        cv_means, _ = predictor.predict(known, now, use_path=False)
+        
+        errors["neighbor_mean"].extend(np.linalg.norm(np.array(legacy, dtype=float) - actual, axis=1))
+        errors["kalman"].extend(np.linalg.norm(cv_means - actual, axis=1))
+        errors["kalman_path"].extend(np.linalg.norm(means - actual, axis=1))
+        # 2σ覆盖率：真实位置落在预测协方差的2倍马氏距离内
+        residual = actual - means
+        mahalanobis = np.einsum("mi,mij,mj->m", residual, np.linalg.inv(covs), residual)
+        covered += int((mahalanobis <= 4.0).sum())
+    
+    samples = len(lost) * outage
+    results = {name: {"mean": float(np.mean(e)), "p95": float(np.percentile(e, 95))} for name, e in errors.items()}
+    results.update({"lost": len(lost), "coverage_2sigma": covered / samples,
+                    "legacy_ms": legacy_time / outage * 1000, "batch_ms": batch_time / outage * 1000})
+    print("=== 失联位置预测基准 ===")
+    print(f"{robots}台机器人，失联{len(lost)}台，失联时长{outage}秒")
+    for name, label in (("neighbor_mean", "邻居均值"), ("kalman", "匀速卡尔曼"), ("kalman_path", "卡尔曼+路径先验")):
+        print(f"{label}: 平均误差{results[name]['mean']:.2f}，95分位{results[name]['p95']:.2f}")
+    print(f"卡尔曼+路径先验2σ覆盖率: {results['coverage_2sigma']:.1%}")
+    print(f"每秒预测全部失联机器人: 逐个{results['legacy_ms']:.2f}毫秒，批量{results['batch_ms']:.2f}毫秒")
+    return results
+
+def benchmark_loopback_network(robots: int = 1000, processes: int = 8, phase_seconds: float = 5.0,
+                               phases: Tuple[Tuple[float, float], ...] = ((100.0, 0.0), (40.0, 30.0), (100.0, 0.0)),
+                               capacity: float = 1_000_000.0, seed: int = 0) -> Dict:
+    # 回环网络基准：robots台机器人（T/B各半）分布在processes个代理进程中，经本机TCP/UDP向中央端上报状态，
+    # 依次在各链路条件（带宽%、丢包%）下运行phase_seconds秒，每秒按环境通信状态调整策略（同step），
+    # 统计各类状态的送达吞吐、丢弃与端到端时延
+    env = _build_hospital_env()
+    data_module = DataTransmissionModule(LLMInterface())
+    uplink = LoopbackUplink(data_module, LinkEmulator(capacity, seed=seed))
+    t_port, b_port = uplink.bind()
+    fleet = [Robot(f"R{i + 1}", RobotType.T_CELL if i % 2 == 0 else RobotType.B_CELL,
+                   (float(i % 100), float(i // 100)), []) for i in range(robots)]
+    context = multiprocessing.get_context("fork")  # 在启动事件循环之前创建代理进程
+    groups = [fleet[k * robots // processes:(k + 1) * robots // processes] for k in range(processes)]
+    workers = [context.Process(target=RobotAgentGroup(group, uplink.host, t_port, b_port, seed=seed + k).run,
+                               args=(phase_seconds * len(phases) + 10,), daemon=True)
+               for k, group in enumerate(groups)]
+    for worker in workers:
+        worker.start()
+    
+    async def serve() -> Dict:
+        await uplink.start()
+        await asyncio.sleep(1.0)  # 等待代理进程连接
+        results = {}
+        for phase, (bandwidth, packet_loss) in enumerate(phases):
+            env.update_communication_status(bandwidth=bandwidth, packet_loss=packet_loss)
+            uplink.reset_metrics()
+            for _ in range(int(phase_seconds)):
+                data_module.adjust_communication_strategy(env)
+                await asyncio.sleep(1.0)
+            results[f"阶段{phase + 1} 带宽{bandwidth:.0f}%/丢包{packet_loss:.0f}%"] = dict(
+                uplink.metrics(), strategy=dict(data_module.communication_strategy))
+        await uplink.stop()
+        return results
+    
+    try:
+        results = asyncio.run(serve())
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+    
+    print("=== 回环网络基准 ===")
+    print(f"{robots}台机器人（T/B各半），{processes}个代理进程，链路满带宽{capacity / 1000:.0f}KB/秒，"
+          f"每阶段{phase_seconds:.0f}秒")
+    for label, r in results.items():
+        print(f"{label}: 有效带宽{r['link']['rate'] / 1000:.0f}KB/秒，B类频率{r['strategy']['b_bot_frequency']:.2f}Hz")
+        for cls, name in (("t_bot", "T类(TCP)"), ("b_bot", "B类(UDP)")):
+            c = r[cls]
+            latency = (f"时延p50 {c['p50_ms']:.1f}/p95 {c['p95_ms']:.1f}/p99 {c['p99_ms']:.1f}毫秒"
+                       if c["p50_ms"] is not None else "无送达")
+            print(f"  {name}: 到达{c['frames']}帧（{c['bandwidth'] / 1000:.0f}KB/秒），丢弃{c['dropped']}帧，"
+                  f"送达{c['throughput']:.0f}条/秒，{latency}")
+    print(f"中央端缓存机器人状态{len(data_module.bot_status_cache)}条")
+    return results
+
+def benchmark_telemetry_replay(hours: float = 24.0, tick: float = 5.0, command_interval: float = 600.0,
+                               seed: int = 0, robot_id: str = "B1") -> Dict:
+    # 遥测回放基准：仿真一个24小时班次并写遥测日志，之后重新打开日志做事后分析（不重新仿真）：
+    # 按时间与机器人定位一段记录（稀疏索引 vs 全量扫描），以及全班次各机器人的行驶距离、最低电量、失败动作与状态包统计
+    import tempfile
+    _, _, plain_time = _simulate_shift(hours, tick, command_interval, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        telemetry = TelemetryLog(directory, segment_records=1 << 18, block_records=4096)
+        _, simulator, logged_time = _simulate_shift(hours, tick, command_interval, seed, telemetry)  # 结束时随框架关闭
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        shift_start = simulator.now() - timedelta(hours=hours)
+        
+        start = time.perf_counter()
+        log = TelemetryLog(directory, segment_records=1 << 18, block_records=4096)
+        open_time = time.perf_counter() - start
+        
+        # 定位：某台机器人在第13小时内的10分钟记录
+        window = (shift_start + timedelta(hours=13), shift_start + timedelta(hours=13, minutes=10))
+        start = time.perf_counter()
+        seek = list(log.replay(*window, robot_id=robot_id))
+        seek_time = time.perf_counter() - start
+        start = time.perf_counter()
+        everything = np.concatenate([log._segment(s) for s in range(-(-log.count // log.segment_records))])
+        code = log.codes[robot_id]
+        scanned = everything[(everything["timestamp"] >= window[0].timestamp())
+                             & (everything["timestamp"] <= window[1].timestamp()) & (everything["robot"] == code)]
+        scan_time = time.perf_counter() - start
+        
+        # 全班次分析
+        start = time.perf_counter()
+        robots = log.query(kinds={TelemetryLog.KIND_ROBOT})
+        summary = {}
+        for code in np.unique(robots["robot"]).tolist():
+            track = robots[robots["robot"] == code]
+            summary[log.strings[code]] = {
+                "distance": float(np.hypot(np.diff(track["x"]), np.diff(track["y"])).sum()),
+                "min_battery": float(track["value"].min())
+            }
+        actions = log.query(kinds={TelemetryLog.KIND_ACTION})
+        failed = actions[actions["state"] == log.codes.get("failed", TelemetryLog.NONE)]
+        for code, count in zip(*np.unique(failed["robot"], return_counts=True)):
+            summary[log.strings[code]]["failed_actions"] = int(count)
+        packets = log.query(kinds={TelemetryLog.KIND_PACKET})
+        for code, count in zip(*np.unique(packets["robot"], return_counts=True)):
+            summary[log.strings[code]]["packets"] = int(count)
+        tasks = log.query(kinds={TelemetryLog.KIND_TASK})
+        completed = int((tasks["state"] == log.codes.get("completed", TelemetryLog.NONE)).sum())
+        analysis_time = time.perf_counter() - start
+        kinds = {name: int((everything["kind"] == kind).sum()) for kind, name in TelemetryLog.KIND_NAMES.items()}
+        records, blocks = len(log), len(log.blocks)
+        log.close()
+    
+    print("=== 遥测回放基准 ===")
+    print(f"仿真{hours:.0f}小时（节拍{tick:.0f}秒）: 不写日志{plain_time:.2f}秒，写日志{logged_time:.2f}秒")
+    print(f"日志: {records}条记录（{', '.join(f'{k} {v}' for k, v in kinds.items())}），{size / 1e6:.1f}MB，稀疏索引{blocks}块")
+    print(f"打开日志{open_time * 1000:.1f}毫秒")
+    print(f"定位{robot_id}第13小时10分钟内记录{len(seek)}条: 稀疏索引{seek_time * 1000:.2f}毫秒，"
+          f"全量扫描{scan_time * 1000:.2f}毫秒，结果一致: {len(seek) == len(scanned)}")
+    print(f"全班次分析{analysis_time * 1000:.1f}毫秒（完成任务{completed}个）:")
+    for rid, s in sorted(summary.items()):
+        print(f"  {rid}: 行驶{s['distance']:.1f}，最低电量{s['min_battery']:.1f}%，"
+              f"失败动作{s.get('failed_actions', 0)}次，状态包{s.get('packets', 0)}条")
+    return {"records": records, "bytes": size, "plain_seconds": plain_time, "logged_seconds": logged_time,
+            "open_ms": open_time * 1000, "seek_ms": seek_time * 1000, "scan_ms": scan_time * 1000,
+            "analysis_ms": analysis_time * 1000, "summary": summary}
 
 # 运行模拟
 if __name__ == "__main__":